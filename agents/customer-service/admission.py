@@ -0,0 +1,283 @@
+"""Admission control, idle reaping and graceful drain for live sessions.
+
+Every accepted WebSocket used to start a live runner straight away, so a
+traffic spike could exhaust memory or model quota for everyone. Each session
+now takes a lease from SessionAdmission before its runner starts:
+
+- At most `max_sessions` leases are held at once. Further sessions wait in a
+  FIFO queue of up to `max_waiting` for `wait_timeout_secs`; past that, or
+  with a full queue, they are rejected with AdmissionRejected right away.
+- The reaper closes sessions with no user input or agent output for
+  `idle_timeout_secs`. A session in the middle of a turn gets
+  `stuck_turn_timeout_secs` instead: a live turn keeps producing events, so one
+  that has been silent that long is stuck (the model never answered, or the
+  live stream died) and would otherwise hold its slot for good.
+- drain() stops admitting sessions and closes each open session once the turn
+  it is in has finished (right away if it is between turns). It returns when
+  all leases are released or the timeout passes (the rest are closed then).
+- claim() attaches a lease to a stored conversation. Only one lease holds a
+  conversation at a time: a second socket resuming it (the widget reconnects
+  to switch between text and audio) closes the first one and waits for it to
+  let go, so two live runners never write to one session.
+
+A lease is told to close by setting its `closed` event; the WebSocket
+endpoint waits on it next to its messaging tasks. The `activity` passed to
+acquire() is anything with `last_activity` (time.monotonic() seconds),
+`in_turn` and a `turns_finished` count, which SessionTimings provides.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SESSIONS = 100
+DEFAULT_MAX_WAITING = 20
+DEFAULT_WAIT_TIMEOUT_SECS = 10.0
+DEFAULT_IDLE_TIMEOUT_SECS = 300.0
+DEFAULT_STUCK_TURN_TIMEOUT_SECS = 120.0
+DEFAULT_DRAIN_TIMEOUT_SECS = 30.0
+DEFAULT_CLAIM_TIMEOUT_SECS = 5.0
+_DRAIN_POLL_SECS = 0.1
+
+CLOSE_IDLE = "idle"
+CLOSE_DRAINING = "server_draining"
+CLOSE_REPLACED = "resumed_elsewhere"
+
+_STAT_KEYS = (
+    "admitted", "queued", "rejected_queue_full", "rejected_wait_timeout", "rejected_draining",
+    "reaped_idle", "reaped_stuck_turn", "closed_by_drain", "replaced", "rejected_session_in_use", "wait_ms_max",
+)
+
+
+class AdmissionRejected(ConnectionRefusedError):
+    """The session was not admitted; `reason` is queue_full, wait_timeout, server_draining or session_in_use."""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+class SessionLease:
+    """One admitted session. `close()` asks the session's endpoint to shut it down."""
+
+    def __init__(self, session_id: str, activity: Any):
+        self.session_id = session_id
+        self.activity = activity
+        self.closed = asyncio.Event()
+        self.released = asyncio.Event()
+        self.close_reason: Optional[str] = None
+        self.claim: Optional[str] = None  # Stored conversation this lease is attached to
+
+    def close(self, reason: str) -> None:
+        if self.close_reason is None:
+            self.close_reason = reason
+            self.closed.set()
+
+
+class SessionAdmission:
+    """Process-wide session limiter; see the module docstring. `max_sessions=0` admits everyone."""
+
+    def __init__(
+        self,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        max_waiting: int = DEFAULT_MAX_WAITING,
+        wait_timeout_secs: float = DEFAULT_WAIT_TIMEOUT_SECS,
+        idle_timeout_secs: float = DEFAULT_IDLE_TIMEOUT_SECS,
+        stuck_turn_timeout_secs: float = DEFAULT_STUCK_TURN_TIMEOUT_SECS,
+    ):
+        self.max_sessions = max_sessions
+        self.max_waiting = max_waiting
+        self.wait_timeout_secs = wait_timeout_secs
+        self.idle_timeout_secs = idle_timeout_secs
+        self.stuck_turn_timeout_secs = stuck_turn_timeout_secs
+        self.draining = False
+        self._leases: set = set()
+        self._claims: dict = {}  # Stored conversation key -> the lease attached to it
+        self._waiters: deque = deque()  # Futures of sessions waiting for a slot, oldest first
+        self._handed_over = 0  # Slots given to woken waiters that haven't taken their lease yet
+        self._all_released = asyncio.Event()
+        self._all_released.set()
+        self._reaper: Optional[asyncio.Task] = None
+        self.stats = dict.fromkeys(_STAT_KEYS, 0)
+
+    @property
+    def has_capacity(self) -> bool:
+        """Whether a new session would be admitted without waiting (waiting sessions go first)."""
+        if not self.max_sessions:
+            return True
+        return not self._waiters and len(self._leases) + self._handed_over < self.max_sessions
+
+    async def acquire(self, session_id: str, activity: Any) -> SessionLease:
+        """Returns a lease once the session may start; raises AdmissionRejected otherwise."""
+        if self.draining:
+            self._reject("rejected_draining", CLOSE_DRAINING, "The server is restarting; please reconnect.")
+        if not self.has_capacity:
+            if len(self._waiters) >= self.max_waiting:
+                self._reject("rejected_queue_full", "queue_full", "The agent is at capacity; please try again shortly.")
+            await self._wait_for_slot(session_id)
+        lease = SessionLease(session_id, activity)
+        self._leases.add(lease)
+        self._all_released.clear()
+        self.stats["admitted"] += 1
+        return lease
+
+    def release(self, lease: SessionLease) -> None:
+        """Frees the lease's slot, handing it to the oldest waiting session."""
+        if lease not in self._leases:
+            return
+        self._leases.discard(lease)
+        self._unclaim(lease)
+        lease.released.set()
+        self._free_slot()
+
+    async def claim(self, lease: SessionLease, key: str, timeout_secs: float = DEFAULT_CLAIM_TIMEOUT_SECS) -> None:
+        """Attaches `lease` to conversation `key`, closing and waiting out the lease that holds it.
+
+        Raises AdmissionRejected (session_in_use) if the holder doesn't let go within `timeout_secs`.
+        """
+        deadline = time.monotonic() + timeout_secs
+        while (holder := self._claims.get(key)) not in (None, lease):
+            if holder.close_reason is None:
+                self._close(holder, CLOSE_REPLACED, "replaced")
+            try:
+                await asyncio.wait_for(holder.released.wait(), timeout=max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                self._reject("rejected_session_in_use", "session_in_use", "This conversation is open in another window.")
+        self._unclaim(lease)
+        self._claims[key] = lease
+        lease.claim = key
+
+    async def drain(self, timeout_secs: float = DEFAULT_DRAIN_TIMEOUT_SECS) -> None:
+        """Stops admissions and closes every session at its next turn boundary; see the module docstring."""
+        self.draining = True
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_exception(AdmissionRejected(CLOSE_DRAINING, "The server is restarting; please reconnect."))
+        logger.info(f"Draining {len(self._leases)} live sessions (timeout {timeout_secs:.0f}s).")
+        deadline = time.monotonic() + timeout_secs
+        # A client that starts its next turn right after turn_complete is rarely seen between turns,
+        # so a session is also done once the turn it was in when the drain started has finished.
+        turns_at_start = {lease: lease.activity.turns_finished for lease in self._leases}
+        while self._leases and time.monotonic() < deadline:
+            for lease in list(self._leases):
+                activity = lease.activity
+                turn_done = not activity.in_turn or activity.turns_finished > turns_at_start.get(lease, activity.turns_finished)
+                if lease.close_reason is None and turn_done:
+                    self._close(lease, CLOSE_DRAINING, "closed_by_drain")
+            try:
+                await asyncio.wait_for(self._all_released.wait(), timeout=_DRAIN_POLL_SECS)
+            except asyncio.TimeoutError:
+                pass
+        if self._leases:
+            logger.warning(f"Drain timed out; closing {len(self._leases)} sessions mid-turn.")
+            for lease in list(self._leases):
+                if lease.close_reason is None:
+                    self._close(lease, CLOSE_DRAINING, "closed_by_drain")
+            try:
+                await asyncio.wait_for(self._all_released.wait(), timeout=_DRAIN_POLL_SECS * 20)
+            except asyncio.TimeoutError:
+                pass
+        logger.info("Drain finished.")
+
+    def reap_idle(self, now: Optional[float] = None) -> int:
+        """Closes sessions silent for longer than their timeout (idle, or stuck mid-turn); returns how many."""
+        now = time.monotonic() if now is None else now
+        reaped = 0
+        for lease in list(self._leases):
+            if lease.close_reason is not None:
+                continue
+            activity = lease.activity
+            in_turn = activity.in_turn
+            timeout = self.stuck_turn_timeout_secs if in_turn else self.idle_timeout_secs
+            if timeout and now - activity.last_activity > timeout:
+                self._close(lease, CLOSE_IDLE, "reaped_stuck_turn" if in_turn else "reaped_idle")
+                reaped += 1
+        return reaped
+
+    def start_reaper(self) -> None:
+        if (self.idle_timeout_secs or self.stuck_turn_timeout_secs) and self._reaper is None:
+            self._reaper = asyncio.create_task(self._reap_loop(), name="idle-session-reaper")
+
+    async def stop_reaper(self) -> None:
+        if self._reaper is not None:
+            self._reaper.cancel()
+            await asyncio.gather(self._reaper, return_exceptions=True)
+            self._reaper = None
+
+    def snapshot_stats(self) -> dict:
+        return dict(self.stats, active=len(self._leases), waiting=len(self._waiters), claimed=len(self._claims),
+                    max_sessions=self.max_sessions, draining=self.draining)
+
+    # --- Internals ---
+
+    async def _wait_for_slot(self, session_id: str) -> None:
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.stats["queued"] += 1
+        start = time.monotonic()
+        logger.info(f"Session {session_id} queued for admission ({len(self._waiters)} waiting).")
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.wait_timeout_secs)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                self._forget_waiter(waiter)
+                self._reject("rejected_wait_timeout", "wait_timeout", "The agent is at capacity; please try again shortly.")
+            # The slot was handed over just as the wait timed out; take it.
+        except AdmissionRejected:
+            self.stats["rejected_draining"] += 1
+            raise
+        except asyncio.CancelledError:  # The client went away while waiting
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                self._handed_over -= 1
+                self._free_slot()  # Pass on the slot this waiter was given
+            else:
+                self._forget_waiter(waiter)
+            raise
+        self._handed_over -= 1
+        self.stats["wait_ms_max"] = max(self.stats["wait_ms_max"], round((time.monotonic() - start) * 1000))
+
+    def _unclaim(self, lease: SessionLease) -> None:
+        if lease.claim is not None and self._claims.get(lease.claim) is lease:
+            del self._claims[lease.claim]
+        lease.claim = None
+
+    def _forget_waiter(self, waiter: asyncio.Future) -> None:
+        waiter.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def _free_slot(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._handed_over += 1
+                waiter.set_result(None)
+                return
+        if not self._leases and not self._handed_over:
+            self._all_released.set()
+
+    def _reject(self, stat: str, reason: str, message: str) -> None:
+        self.stats[stat] += 1
+        raise AdmissionRejected(reason, message)
+
+    def _close(self, lease: SessionLease, reason: str, stat: str) -> None:
+        self.stats[stat] += 1
+        logger.info(f"Closing session {lease.session_id}: {reason}.")
+        lease.close(reason)
+
+    async def _reap_loop(self) -> None:
+        shortest = min(timeout for timeout in (self.idle_timeout_secs, self.stuck_turn_timeout_secs) if timeout)
+        interval = min(30.0, max(1.0, shortest / 4))
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.reap_idle()
+            except Exception as e:  # Keep reaping on the next tick
+                logger.error(f"Error reaping idle sessions: {e}", exc_info=True)
@@ -0,0 +1,173 @@
+"""Coalesces microphone PCM packets into fixed-duration frames before send_realtime.
+
+Clients may send many small PCM chunks, and each used to become its own Blob
+and send_realtime call. MicAudioCoalescer packs them into `frame_ms` frames
+(40-100 ms):
+
+- Packets are copied once, into a bytearray, through memoryview slices. A
+  packet that is exactly one frame with nothing buffered passes through uncopied
+  (the widget already sends 100 ms chunks).
+- A partial frame is flushed `max_delay_ms` after its first byte arrived, so the
+  tail of an utterance is not held back waiting for more audio.
+- Packets that carry a sequence number (binary frames, see audio_frames.py) are
+  put back in order. Packets that arrive early are held until the gap fills.
+  The gap is given up once `reorder_window` packets are held or the flush timer
+  fires. Packets that arrive after their gap was given up are dropped.
+"""
+
+import asyncio
+import logging
+from typing import Callable, Optional
+
+from audio_frames import SEQUENCE_MODULUS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SAMPLE_RATE = 16000  # 16-bit mono, as recorded by the widget
+DEFAULT_FRAME_MS = 100
+DEFAULT_MAX_DELAY_MS = 150
+DEFAULT_REORDER_WINDOW = 4
+
+MIN_FRAME_MS = 40
+MAX_FRAME_MS = 100
+
+_STAT_KEYS = ("packets_in", "bytes_in", "frames_out", "timer_flushes", "reordered", "late_dropped", "gaps_skipped")
+
+# Process-wide counters across all coalescers, exported on /metrics.
+totals = dict.fromkeys(_STAT_KEYS, 0)
+
+
+class MicAudioCoalescer:
+    """Per-session packer from mic packets to fixed-size PCM frames handed to `emit`; see the module docstring.
+
+    Must be used from the event loop thread: the flush timer runs there.
+    """
+
+    def __init__(
+        self,
+        emit: Callable[[bytes], None],
+        sample_rate: int = DEFAULT_SAMPLE_RATE,
+        frame_ms: int = DEFAULT_FRAME_MS,
+        max_delay_ms: int = DEFAULT_MAX_DELAY_MS,
+        reorder_window: int = DEFAULT_REORDER_WINDOW,
+    ):
+        if not MIN_FRAME_MS <= frame_ms <= MAX_FRAME_MS:
+            raise ValueError(f"frame_ms must be between {MIN_FRAME_MS} and {MAX_FRAME_MS}, got {frame_ms}.")
+        self.emit = emit
+        self.frame_bytes = sample_rate * frame_ms // 1000 * 2
+        self.max_delay_secs = max_delay_ms / 1000
+        self.reorder_window = reorder_window
+
+        self._buffer = bytearray()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._expected: Optional[int] = None  # Next sequence number to append
+        self._held = {}  # sequence -> packet that arrived ahead of a gap
+        self.stats = dict.fromkeys(_STAT_KEYS, 0)
+
+    def push(self, pcm: bytes, sequence: Optional[int] = None) -> None:
+        """Adds a packet; full frames are emitted immediately."""
+        self._count("packets_in", 1)
+        self._count("bytes_in", len(pcm))
+        if sequence is None:
+            self._append(pcm)
+        else:
+            self._push_sequenced(pcm, sequence % SEQUENCE_MODULUS)
+        self._arm_timer()
+
+    def flush(self) -> None:
+        """Gives up on any sequence gap and emits everything buffered, including a partial frame."""
+        self._release_held(skip_gaps=True)
+        if self._buffer:
+            partial = bytes(self._buffer)
+            self._buffer.clear()
+            self._emit(partial)
+        self._cancel_timer()
+
+    def close(self) -> None:
+        """Discards buffered audio and stops the flush timer (the connection is gone)."""
+        self._cancel_timer()
+        self._buffer.clear()
+        self._held.clear()
+
+    # --- Internals ---
+
+    def _push_sequenced(self, pcm: bytes, sequence: int) -> None:
+        if self._expected is None:
+            self._expected = sequence
+        ahead = (sequence - self._expected) % SEQUENCE_MODULUS
+        if ahead == 0:
+            self._append(pcm)
+            self._expected = (sequence + 1) % SEQUENCE_MODULUS
+            self._release_held(skip_gaps=False)
+        elif ahead < SEQUENCE_MODULUS // 2:
+            self._held[sequence] = pcm
+            self._count("reordered", 1)
+            if len(self._held) > self.reorder_window:
+                self._release_held(skip_gaps=True)
+        else:
+            self._count("late_dropped", 1)
+
+    def _release_held(self, skip_gaps: bool) -> None:
+        """Appends held packets that are now in order; with skip_gaps, jumps over missing ones."""
+        while self._held:
+            if self._expected not in self._held:
+                if not skip_gaps:
+                    return
+                self._expected = min(self._held, key=lambda seq: (seq - self._expected) % SEQUENCE_MODULUS)
+                self._count("gaps_skipped", 1)
+            self._append(self._held.pop(self._expected))
+            self._expected = (self._expected + 1) % SEQUENCE_MODULUS
+
+    def _append(self, pcm: bytes) -> None:
+        frame_bytes = self.frame_bytes
+        if not self._buffer and len(pcm) == frame_bytes:
+            self._emit(pcm)
+            return
+        view = memoryview(pcm)
+        offset = 0
+        if self._buffer:
+            offset = min(frame_bytes - len(self._buffer), len(view))
+            self._buffer += view[:offset]
+            if len(self._buffer) < frame_bytes:
+                return
+            frame = bytes(self._buffer)
+            self._buffer.clear()
+            self._emit(frame)
+        while len(view) - offset >= frame_bytes:
+            self._emit(bytes(view[offset:offset + frame_bytes]))
+            offset += frame_bytes
+        if offset < len(view):
+            self._buffer += view[offset:]
+
+    def _emit(self, frame: bytes) -> None:
+        self._count("frames_out", 1)
+        self.emit(frame)
+
+    def _arm_timer(self) -> None:
+        if not self._buffer and not self._held:
+            self._cancel_timer()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay_secs, self._on_timer)
+
+    def _cancel_timer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._count("timer_flushes", 1)
+        try:
+            self.flush()
+        except Exception as e:  # Runs as a loop callback; nothing else would see the error
+            logger.error(f"Error flushing buffered mic audio: {e}", exc_info=True)
+
+    def _count(self, key: str, amount: int) -> None:
+        self.stats[key] += amount
+        totals[key] += amount
+
+
+def audio_coalescer_stats() -> dict:
+    """Process-wide coalescer counters and the average number of packets per emitted frame."""
+    ratio = totals["packets_in"] / totals["frames_out"] if totals["frames_out"] else 0.0
+    return dict(totals, packets_per_frame=round(ratio, 2))
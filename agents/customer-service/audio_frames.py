@@ -0,0 +1,68 @@
+"""Binary WebSocket frames for PCM audio between the widget and the streaming server.
+
+The JSON protocol carries audio as base64 inside text frames, which adds a
+third to every chunk and costs a json + base64 round trip per packet. A client
+can instead offer BINARY_AUDIO_SUBPROTOCOL in the WebSocket handshake; if the
+server selects it, audio in both directions travels as binary frames:
+
+    byte 0    version (FRAME_VERSION)
+    byte 1    frame type (FRAME_TYPE_AUDIO_PCM)
+    bytes 2-3 sequence number, big-endian, wrapping at 65536
+    bytes 4-  raw 16-bit little-endian mono PCM
+
+Control messages, text and images stay JSON text frames in either mode, and a
+client that offers no subprotocol (or only JSON_SUBPROTOCOL) keeps the JSON
+audio path unchanged.
+"""
+
+import struct
+from typing import Iterable, NamedTuple, Optional
+
+BINARY_AUDIO_SUBPROTOCOL = "adk-audio-binary.v1"
+JSON_SUBPROTOCOL = "adk-json.v1"
+
+FRAME_VERSION = 1
+FRAME_TYPE_AUDIO_PCM = 0x01
+
+_HEADER = struct.Struct("!BBH")
+HEADER_SIZE = _HEADER.size
+SEQUENCE_MODULUS = 1 << 16
+
+
+class FrameError(ValueError):
+    """A binary frame is truncated, from another protocol version, or of an unknown type."""
+
+
+class AudioFrame(NamedTuple):
+    sequence: int
+    pcm: bytes
+
+
+def negotiate_subprotocol(offered: Iterable[str]) -> Optional[str]:
+    """Picks the subprotocol to accept from those the client offered, preferring binary audio.
+
+    Returns None when the client offered neither (legacy JSON clients); the
+    connection is then accepted without a subprotocol.
+    """
+    offered = list(offered or ())
+    for candidate in (BINARY_AUDIO_SUBPROTOCOL, JSON_SUBPROTOCOL):
+        if candidate in offered:
+            return candidate
+    return None
+
+
+def encode_audio_frame(pcm: bytes, sequence: int) -> bytes:
+    """Prefixes raw PCM bytes with the frame header."""
+    return _HEADER.pack(FRAME_VERSION, FRAME_TYPE_AUDIO_PCM, sequence % SEQUENCE_MODULUS) + pcm
+
+
+def decode_audio_frame(frame: bytes) -> AudioFrame:
+    """Splits a binary frame into its sequence number and PCM payload; raises FrameError if invalid."""
+    if len(frame) < HEADER_SIZE:
+        raise FrameError(f"Frame of {len(frame)} bytes is shorter than the {HEADER_SIZE}-byte header.")
+    version, frame_type, sequence = _HEADER.unpack_from(frame)
+    if version != FRAME_VERSION:
+        raise FrameError(f"Unsupported frame version {version}.")
+    if frame_type != FRAME_TYPE_AUDIO_PCM:
+        raise FrameError(f"Unknown frame type {frame_type:#04x}.")
+    return AudioFrame(sequence, bytes(frame[HEADER_SIZE:]))
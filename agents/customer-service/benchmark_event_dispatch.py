@@ -0,0 +1,117 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Micro-benchmark: agent_to_client_messaging dispatch cost per event type.
+
+Runs representative live events (audio and text chunks, ui_command text,
+status flags and tool response actions) through the event dispatcher with an
+outbound queue that discards everything, and times the text-part ui_command
+probe against the json.loads-per-chunk check it replaced. Logging is
+disabled so the numbers reflect the dispatch itself.
+
+Usage: python benchmark_event_dispatch.py [--events 20000]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import time
+
+from google.adk.events import Event
+from google.genai import types
+
+from event_dispatch import dispatcher, parse_ui_command
+
+
+class NullOutbound:
+    async def put_control(self, message):
+        pass
+
+    def put_audio(self, pcm):
+        pass
+
+
+def _event(part):
+    return Event(author="agent", content=types.Content(role="model", parts=[part]))
+
+
+def _tool_event(response):
+    return _event(types.Part(function_response=types.FunctionResponse(name="tool", response=response)))
+
+
+SPEECH = "Ferns like bright, indirect light and evenly moist soil; water when the top inch feels dry."
+EVENTS = {
+    "audio chunk": _event(types.Part(inline_data=types.Blob(mime_type="audio/pcm", data=b"\x00" * 4800))),
+    "text chunk": _event(types.Part(text=SPEECH)),
+    "ui_command text": _event(types.Part(text=json.dumps({"type": "ui_command", "command_name": "highlight", "payload": {}}))),
+    "turn_complete": Event(author="agent", turn_complete=True),
+    "set_theme": _tool_event({"action": "set_theme", "theme": "dark"}),
+    "show_checkout_ui": _tool_event({"action": "show_checkout_ui", "cart_data": {"items": [{"id": "p1"}] * 5}}),
+    "display_ui": _tool_event({"action": "display_ui", "ui_element": "care_card", "payload": {"plant": "fern"}}),
+    "unknown tool response": _tool_event({"status": "ok"}),
+}
+
+
+def report(label, timings):
+    print(f"{label:>24}: mean {statistics.fmean(timings):6.2f} us, p50 {statistics.median(timings):6.2f} us, "
+          f"p99 {statistics.quantiles(timings, n=100)[98]:6.2f} us")
+
+
+async def bench_dispatch(events):
+    outbound = NullOutbound()
+    for label, event in EVENTS.items():
+        timings = []
+        for _ in range(events):
+            start = time.perf_counter()
+            await dispatcher.dispatch(event, outbound, "bench-session")
+            timings.append((time.perf_counter() - start) * 1_000_000)
+        report(label, timings)
+
+
+def json_probe(text):
+    """The previous check: json.loads on every text part."""
+    try:
+        command = json.loads(text)
+    except json.JSONDecodeError:
+        return None
+    return command if isinstance(command, dict) and command.get("type") == "ui_command" else None
+
+
+def bench_text_probe(events):
+    for label, probe in (("json.loads probe", json_probe), ("prefix-check probe", parse_ui_command)):
+        timings = []
+        for _ in range(events):
+            start = time.perf_counter()
+            probe(SPEECH)
+            timings.append((time.perf_counter() - start) * 1_000_000)
+        report(label, timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agent event dispatch cost benchmark.")
+    parser.add_argument("--events", type=int, default=20000, help="Dispatches per event type.")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    print("Dispatch cost per event type:")
+    asyncio.run(bench_dispatch(args.events))
+    print("ui_command probe on an ordinary text chunk:")
+    bench_text_probe(args.events)
+
+
+if __name__ == "__main__":
+    main()
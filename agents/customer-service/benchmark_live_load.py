@@ -0,0 +1,239 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""WebSocket load generator for the streaming server.
+
+Opens N concurrent sessions against /ws/agent_stream/{session_id}. Each session
+plays a number of user turns, either as text messages or, with --audio, as one
+second of 16 kHz mic tone per turn in binary audio frames. A turn ends when the
+turn_complete status message arrives. The report covers:
+
+- time from sending a turn to its first event, the gaps between events within
+  a turn, and the full turn time (p50/p95/p99);
+- events and turns per second over the whole run;
+- server memory per session: (peak RSS - RSS before connecting) / N, read from
+  /proc for --server-pid or for the server started by --spawn-server.
+
+--spawn-server starts uvicorn with LIVE_RUNNER=mock (see mock_live_runner.py)
+and a throwaway session database, so no model access is needed; the mock's
+tool calls go to BACKEND_API_BASE_URL, so start the backend API for realistic
+tool latencies. Any MOCK_LIVE_* variables in the environment are passed on.
+
+Usage: python benchmark_live_load.py --spawn-server [--sessions 50] [--turns 5] [--audio]
+       python benchmark_live_load.py --url ws://127.0.0.1:8001 --server-pid 1234
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import shutil
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import Optional
+
+import websockets
+
+from audio_frames import BINARY_AUDIO_SUBPROTOCOL, encode_audio_frame
+
+MIC_SAMPLE_RATE = 16000
+MIC_PACKET_MS = 100
+TEXT_TURNS = (
+    "Hi, what's in my cart?",
+    "Which soil should I use for ferns?",
+    "Can you switch the site to night mode?",
+    "How often should I water them?",
+)
+
+
+def _tone_packets(seconds: float = 1.0, frequency: float = 440.0) -> list:
+    """Mic packets of a 440 Hz tone at -12 dBFS, loud enough to pass the voice activity gate."""
+    samples_per_packet = MIC_SAMPLE_RATE * MIC_PACKET_MS // 1000
+    packets = []
+    for start in range(0, int(MIC_SAMPLE_RATE * seconds), samples_per_packet):
+        samples = (int(8000 * math.sin(2 * math.pi * frequency * (start + i) / MIC_SAMPLE_RATE))
+                   for i in range(samples_per_packet))
+        packets.append(struct.pack(f"<{samples_per_packet}h", *samples))
+    return packets
+
+
+def _percentiles(values: list) -> str:
+    if len(values) < 2:
+        return "n/a" if not values else f"{values[0]:.1f}"
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return f"p50 {cuts[49]:8.1f}  p95 {cuts[94]:8.1f}  p99 {cuts[98]:8.1f}  max {max(values):8.1f}"
+
+
+def _rss_kib(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+class LoadResults:
+    def __init__(self):
+        self.first_event_ms = []
+        self.event_gap_ms = []
+        self.turn_ms = []
+        self.events = 0
+        self.turns = 0
+        self.failed_sessions = 0
+        self.errors = []
+
+
+async def run_session(index: int, args, results: LoadResults, run_id: str) -> None:
+    session_id = f"load-{run_id}-{index}"
+    url = f"{args.url}/ws/agent_stream/{session_id}?is_audio={'true' if args.audio else 'false'}"
+    subprotocols = [BINARY_AUDIO_SUBPROTOCOL] if args.audio else None
+    packets = _tone_packets() if args.audio else None
+    sequence = 0
+    await asyncio.sleep(index * args.ramp_ms / 1000 / max(1, args.sessions))
+    try:
+        async with websockets.connect(url, subprotocols=subprotocols, max_size=None, open_timeout=30) as ws:
+            for turn in range(args.turns):
+                if args.audio:
+                    for pcm in packets:
+                        await ws.send(encode_audio_frame(pcm, sequence))
+                        sequence += 1
+                else:
+                    await ws.send(json.dumps({"mime_type": "text/plain", "data": TEXT_TURNS[turn % len(TEXT_TURNS)]}))
+                sent = last = time.perf_counter()
+                first = None
+                while True:
+                    message = await asyncio.wait_for(ws.recv(), timeout=args.turn_timeout)
+                    if isinstance(message, str) and '"session_resume"' in message:
+                        continue  # Sent once on connect, not part of a turn
+                    now = time.perf_counter()
+                    results.events += 1
+                    if first is None:
+                        first = now
+                        results.first_event_ms.append((now - sent) * 1000)
+                    else:
+                        results.event_gap_ms.append((now - last) * 1000)
+                    last = now
+                    if isinstance(message, str) and "turn_complete" in message and json.loads(message).get("turn_complete"):
+                        break
+                results.turn_ms.append((last - sent) * 1000)
+                results.turns += 1
+                if args.think_ms:
+                    await asyncio.sleep(args.think_ms / 1000)
+    except Exception as e:  # Counted and reported; one failing session shouldn't stop the run
+        results.failed_sessions += 1
+        results.errors.append(f"{session_id}: {type(e).__name__}: {e}")
+
+
+async def sample_peak_rss(pid: int, peak: list, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        rss = _rss_kib(pid)
+        if rss is not None:
+            peak[0] = max(peak[0], rss)
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=0.1)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def wait_for_server(host: str, port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Server on {host}:{port} did not start within {timeout:.0f}s.")
+            await asyncio.sleep(0.2)
+
+
+async def main(args) -> None:
+    server = None
+    db_dir = None
+    pid = args.server_pid
+    if args.spawn_server:
+        db_dir = tempfile.mkdtemp(prefix="live-load-")
+        env = dict(os.environ, LIVE_RUNNER="mock", SESSION_DB_PATH=os.path.join(db_dir, "sessions.db"))
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "streaming_server:app", "--port", str(args.port),
+             "--log-level", "warning", "--ws-max-size", str(1 << 24)],
+            env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+            stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL,
+        )
+        pid = server.pid
+        args.url = f"ws://127.0.0.1:{args.port}"
+        await wait_for_server("127.0.0.1", args.port)
+    try:
+        baseline = _rss_kib(pid) if pid else None
+        peak = [baseline or 0]
+        stop = asyncio.Event()
+        sampler = asyncio.create_task(sample_peak_rss(pid, peak, stop)) if baseline else None
+        results = LoadResults()
+        run_id = uuid.uuid4().hex[:8]
+        start = time.perf_counter()
+        await asyncio.gather(*(run_session(i, args, results, run_id) for i in range(args.sessions)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        if sampler:
+            await sampler
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+        if db_dir is not None:
+            shutil.rmtree(db_dir, ignore_errors=True)
+
+    mode = "audio (binary frames)" if args.audio else "text"
+    print(f"{args.sessions} sessions x {args.turns} turns, {mode}, {elapsed:.2f}s wall")
+    print(f"  completed turns     {results.turns}/{args.sessions * args.turns}"
+          f"   failed sessions {results.failed_sessions}")
+    print(f"  first event (ms)    {_percentiles(results.first_event_ms)}")
+    print(f"  event gap (ms)      {_percentiles(results.event_gap_ms)}")
+    print(f"  turn (ms)           {_percentiles(results.turn_ms)}")
+    print(f"  throughput          {results.events / elapsed:8.1f} events/s  {results.turns / elapsed:8.2f} turns/s")
+    if baseline:
+        per_session = (peak[0] - baseline) / max(1, args.sessions)
+        print(f"  server RSS          baseline {baseline / 1024:.1f} MiB  peak {peak[0] / 1024:.1f} MiB"
+              f"  ~{per_session:.0f} KiB/session")
+    for error in results.errors[:5]:
+        print(f"  error: {error}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="ws://127.0.0.1:8001", help="Server base URL (ignored with --spawn-server).")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=5, help="User turns per session.")
+    parser.add_argument("--audio", action="store_true", help="Speak each turn as binary mic frames and ask for audio replies.")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Pause between a turn_complete and the next turn.")
+    parser.add_argument("--ramp-ms", type=float, default=1000.0, help="Spread session starts over this long.")
+    parser.add_argument("--turn-timeout", type=float, default=30.0, help="Seconds to wait for each event.")
+    parser.add_argument("--server-pid", type=int, help="Server process to sample memory from.")
+    parser.add_argument("--spawn-server", action="store_true", help="Start a LIVE_RUNNER=mock server for the run.")
+    parser.add_argument("--port", type=int, default=8011, help="Port for --spawn-server.")
+    parser.add_argument("--verbose", action="store_true", help="Show the spawned server's log output.")
+    logging.disable(logging.CRITICAL)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,62 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Micro-benchmark: before_tool overhead per tool call that carries a customer_id.
+
+Compares re-parsing the customer_profile JSON on every call (no session id,
+so the profile cache cannot be used) with the per-session parsed profile
+cache. Logging is disabled so the numbers reflect the callback itself.
+
+Usage: python benchmark_tool_callbacks.py [--calls 20000]
+"""
+
+import argparse
+import logging
+import statistics
+import time
+from types import SimpleNamespace
+
+from customer_service.entities.customer import Customer
+from customer_service.shared_libraries import callbacks
+
+
+def run(label, context, calls):
+    tool = SimpleNamespace(name="access_cart_information")
+    callbacks.before_tool(tool, {"customer_id": "123"}, context)  # Loads the profile into state
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        result = callbacks.before_tool(tool, {"customer_id": "123"}, context)
+        timings.append((time.perf_counter() - start) * 1_000_000)
+        assert result is None
+    print(f"{label:>22}: mean {statistics.fmean(timings):7.1f} us, p50 {statistics.median(timings):7.1f} us, "
+          f"p99 {statistics.quantiles(timings, n=100)[98]:7.1f} us per call")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="before_tool callback overhead benchmark.")
+    parser.add_argument("--calls", type=int, default=20000)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    customer = Customer.get_customer("123")
+    print(f"customer_profile state size: indent=4 {len(customer.to_json())} bytes, "
+          f"compact {len(customer.to_json(indent=None))} bytes")
+
+    run("re-parse every call", SimpleNamespace(state={}), args.calls)
+    run("per-session cache", SimpleNamespace(state={}, session=SimpleNamespace(id="bench-session")), args.calls)
+
+
+if __name__ == "__main__":
+    main()
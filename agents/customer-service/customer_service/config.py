@@ -47,3 +47,18 @@ class Config(BaseSettings):
     GENAI_USE_VERTEXAI: str = Field(default="1")
     API_KEY: str | None = Field(default="")
     BACKEND_API_BASE_URL: str = Field(default="http://127.0.0.1:5000/api")
+    # Model request limits (see shared_libraries/rate_limiter.py). One bucket per model is shared
+    # by every session in the process, so set these from the project's model quota divided by
+    # the number of server processes, not per user. 0 (the default) disables limiting.
+    RATE_LIMIT_RPM: int = Field(default=0)
+    RATE_LIMIT_MODEL_RPM: dict[str, int] = Field(default_factory=dict)  # Per-model overrides; 0 = unlimited
+    RATE_LIMIT_BURST: int | None = Field(default=None)  # Defaults to one minute's worth
+    RATE_LIMIT_MAX_WAIT_SECS: float = Field(default=30.0)
+    # Customer profiles (see entities/customer_repository.py); the backend's database by default.
+    CUSTOMER_DB_PATH: str = Field(
+        default=os.path.normpath(
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../ecommerce.db")
+        )
+    )
+    CUSTOMER_CACHE_SIZE: int = Field(default=1024)
+    CUSTOMER_CACHE_TTL_SECS: float = Field(default=300.0)
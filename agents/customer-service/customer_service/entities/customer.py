@@ -13,9 +13,12 @@
 # limitations under the License.
 """Customer entity module."""
 
+import logging
 from typing import List, Dict, Optional
 from pydantic import BaseModel, Field, ConfigDict
 
+logger = logging.getLogger(__name__)
+
 
 class Address(BaseModel):
     """
@@ -97,28 +100,45 @@ class Customer(BaseModel):
     scheduled_appointments: Dict = Field(default_factory=dict)
     model_config = ConfigDict(from_attributes=True)
 
-    def to_json(self) -> str:
+    def to_json(self, indent: Optional[int] = 4) -> str:
         """
         Converts the Customer object to a JSON string.
 
+        Args:
+            indent: Indentation for pretty-printing; None gives compact JSON.
+
         Returns:
             A JSON string representing the Customer object.
         """
-        return self.model_dump_json(indent=4)
+        return self.model_dump_json(indent=indent)
 
     @staticmethod
     def get_customer(current_customer_id: str) -> Optional["Customer"]:
         """
         Retrieves a customer based on their ID.
 
+        Profiles come from the customer repository (the backend's ecommerce.db).
+        If that database has no customer tables yet, the demo profile is returned.
+
         Args:
             customer_id: The ID of the customer to retrieve.
 
         Returns:
             The Customer object if found, None otherwise.
         """
-        # In a real application, this would involve a database lookup.
-        # For this example, we'll just return a dummy customer.
+        from .customer_repository import CustomerStoreUnavailable, get_customer_repository
+
+        try:
+            return get_customer_repository().get(current_customer_id)
+        except CustomerStoreUnavailable as e:
+            logger.warning(f"{e}; using the demo customer profile.")
+            return Customer.demo_customer(current_customer_id)
+
+    @staticmethod
+    def demo_customer(current_customer_id: str) -> "Customer":
+        """
+        Returns the built-in demo profile (Alex Johnson) under the given ID.
+        """
         return Customer(
             customer_id=current_customer_id,
             account_number="428765091",
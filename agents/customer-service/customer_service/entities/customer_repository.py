@@ -0,0 +1,214 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Read-only customer profile store backed by the backend's ecommerce.db.
+
+The tables (customers, addresses, purchases, garden_profile) are created and
+seeded by the backend (customer_store.py, database_setup.py,
+sample_data_importer.py). Each lookup is four indexed point queries; a bounded
+LRU cache with a TTL in front keeps repeat loads at dictionary speed.
+"""
+
+import json
+import logging
+import pathlib
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from .customer import Customer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_SIZE = 1024
+DEFAULT_CACHE_TTL_SECS = 300.0
+
+
+class CustomerStoreUnavailable(Exception):
+    """The customer database or its tables could not be opened."""
+
+
+class _ThreadConnection:
+    """Holds one thread's connection in its thread-local data, which is dropped when the thread exits."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+
+def _close_connection(conn: sqlite3.Connection, connections: set) -> None:
+    connections.discard(conn)
+    conn.close()
+
+
+class CustomerRepository:
+    """Loads Customer models from SQLite, with a bounded, thread-safe LRU cache.
+
+    Each thread gets its own read-only connection, closed when the thread
+    exits (or by close()). Unknown customers are not cached, so a profile
+    added later is found on the next lookup.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        cache_size: int = DEFAULT_CACHE_SIZE,
+        cache_ttl_secs: float = DEFAULT_CACHE_TTL_SECS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.db_path = db_path
+        self.cache_size = cache_size
+        self.cache_ttl_secs = cache_ttl_secs
+        self._clock = clock
+        self._cache = OrderedDict()  # customer_id -> (loaded_at, Customer)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._connections: set = set()  # Open connections of all threads
+        self.stats = {"hits": 0, "misses": 0, "not_found": 0, "evictions": 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        holder = getattr(self._local, "connection", None)
+        if holder is None:
+            uri = pathlib.Path(self.db_path).resolve().as_uri() + "?mode=ro"
+            try:
+                # Only this thread uses it, but it is closed from whichever thread drops it.
+                conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            except sqlite3.OperationalError as e:
+                raise CustomerStoreUnavailable(f"Cannot open customer database {self.db_path}: {e}") from e
+            holder = self._local.connection = _ThreadConnection(conn)
+            self._connections.add(conn)
+            weakref.finalize(holder, _close_connection, conn, self._connections)
+        return holder.conn
+
+    def close(self) -> None:
+        """Closes every thread's connection; later lookups open new ones."""
+        self._local = threading.local()
+        for conn in list(self._connections):
+            _close_connection(conn, self._connections)
+
+    def get(self, customer_id: str) -> Optional[Customer]:
+        """Returns the customer's profile, or None if there is no such customer.
+
+        Raises CustomerStoreUnavailable if the database or tables are missing.
+        """
+        now = self._clock()
+        with self._lock:
+            entry = self._cache.get(customer_id)
+            if entry is not None and now - entry[0] <= self.cache_ttl_secs:
+                self._cache.move_to_end(customer_id)
+                self.stats["hits"] += 1
+                return entry[1]
+            self.stats["misses"] += 1
+
+        customer = self._load(customer_id)
+        with self._lock:
+            if customer is None:
+                self._cache.pop(customer_id, None)
+                self.stats["not_found"] += 1
+                return None
+            self._cache[customer_id] = (now, customer)
+            self._cache.move_to_end(customer_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+                self.stats["evictions"] += 1
+        return customer
+
+    def _load(self, customer_id: str) -> Optional[Customer]:
+        conn = self._connection()
+        try:
+            row = conn.execute(
+                "SELECT customer_id, account_number, first_name, last_name, email, phone_number, "
+                "customer_start_date, years_as_customer, loyalty_points, preferred_store, "
+                "email_opt_in, sms_opt_in, push_opt_in, scheduled_appointments "
+                "FROM customers WHERE customer_id = ?",
+                (customer_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            address = conn.execute(
+                "SELECT street, city, state, zip FROM addresses WHERE customer_id = ? AND address_type = 'billing'",
+                (customer_id,),
+            ).fetchone()
+            purchases = conn.execute(
+                "SELECT purchase_date, items, total_amount FROM purchases "
+                "WHERE customer_id = ? ORDER BY purchase_date, id",
+                (customer_id,),
+            ).fetchall()
+            garden = conn.execute(
+                "SELECT type, size, sun_exposure, soil_type, interests FROM garden_profile WHERE customer_id = ?",
+                (customer_id,),
+            ).fetchone()
+        except sqlite3.OperationalError as e:  # e.g. "no such table" on a database set up before these tables
+            raise CustomerStoreUnavailable(f"Customer tables unavailable in {self.db_path}: {e}") from e
+
+        return Customer.model_validate({
+            "customer_id": row[0],
+            "account_number": row[1],
+            "customer_first_name": row[2],
+            "customer_last_name": row[3],
+            "email": row[4],
+            "phone_number": row[5] or "",
+            "customer_start_date": row[6] or "",
+            "years_as_customer": row[7],
+            "loyalty_points": row[8],
+            "preferred_store": row[9] or "",
+            "communication_preferences": {"email": bool(row[10]), "sms": bool(row[11]), "push_notifications": bool(row[12])},
+            "scheduled_appointments": json.loads(row[13] or "{}"),
+            "billing_address": dict(zip(("street", "city", "state", "zip"), address)) if address else None,
+            "purchase_history": [
+                {"date": date, "items": json.loads(items), "total_amount": total}
+                for date, items, total in purchases
+            ],
+            "garden_profile": {
+                "type": garden[0], "size": garden[1], "sun_exposure": garden[2],
+                "soil_type": garden[3], "interests": json.loads(garden[4] or "[]"),
+            } if garden else None,
+        })
+
+    def invalidate(self, customer_id: Optional[str] = None) -> None:
+        """Drops one cached profile (e.g. after an order changes loyalty points), or all of them."""
+        with self._lock:
+            if customer_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(customer_id, None)
+
+
+_repository: Optional[CustomerRepository] = None
+_repository_lock = threading.Lock()
+
+
+def close_customer_repository() -> None:
+    """Closes the process-wide repository's connections, if it was ever used."""
+    if _repository is not None:
+        _repository.close()
+
+
+def get_customer_repository() -> CustomerRepository:
+    """Returns the process-wide repository for Config.CUSTOMER_DB_PATH."""
+    global _repository
+    if _repository is None:
+        with _repository_lock:
+            if _repository is None:
+                from customer_service.config import Config
+                configs = Config()
+                _repository = CustomerRepository(
+                    configs.CUSTOMER_DB_PATH,
+                    cache_size=configs.CUSTOMER_CACHE_SIZE,
+                    cache_ttl_secs=configs.CUSTOMER_CACHE_TTL_SECS,
+                )
+                logger.info(f"Customer repository using {configs.CUSTOMER_DB_PATH}.")
+    return _repository
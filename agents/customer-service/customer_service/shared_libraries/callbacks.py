@@ -15,30 +15,60 @@
 """Callback functions for FOMC Research Agent."""
 
 import logging
-import time
 
 from google.adk.agents.callback_context import CallbackContext
-from google.adk.models import LlmRequest
+from google.adk.models import LlmRequest, LlmResponse
+from google.genai import types
 from typing import Any, Dict, Optional, Tuple # Added Optional, Tuple
 from google.adk.tools import BaseTool
 from google.adk.agents.invocation_context import InvocationContext
 from google.adk.sessions.state import State # Added State
 from google.adk.tools.tool_context import ToolContext # Added ToolContext
 from jsonschema import ValidationError # Added ValidationError
+from customer_service.config import Config
 from customer_service.entities.customer import Customer
+from customer_service.shared_libraries.profile_cache import (
+    PROFILE_VERSION_STATE_KEY,
+    customer_profile_cache,
+    session_id_of,
+)
+from customer_service.shared_libraries.rate_limiter import ModelRateLimiter
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
-RATE_LIMIT_SECS = 60
-RPM_QUOTA = 10
+_configs = Config()
+# Shared by all sessions in the process, so the limit tracks real quota use.
+model_rate_limiter = ModelRateLimiter(
+    default_rpm=_configs.RATE_LIMIT_RPM,
+    model_rpm=_configs.RATE_LIMIT_MODEL_RPM,
+    burst=_configs.RATE_LIMIT_BURST,
+    max_wait_secs=_configs.RATE_LIMIT_MAX_WAIT_SECS,
+)
+RATE_LIMITED_MESSAGE = "I'm handling a lot of requests right now. Please try again in a moment."
+DEFAULT_CUSTOMER_ID = "123"
+
+
+def _load_customer_profile(context: Any, caller: str) -> None:
+    """Loads the session's customer (state 'customer_id', else the default) into state."""
+    customer_id = context.state.get("customer_id") or DEFAULT_CUSTOMER_ID
+    customer = Customer.get_customer(customer_id)
+    if customer is None:
+        logger.warning(f"{caller}: no customer profile found for customer_id {customer_id}.")
+        return
+    customer_profile_cache.store(session_id_of(context), context.state, customer)
+    logger.info(f"{caller}: 'customer_profile' for customer {customer_id} successfully loaded and set in state.")
 
 
-def rate_limit_callback(
+async def rate_limit_callback(
     callback_context: CallbackContext, llm_request: LlmRequest
-) -> None:
+) -> Optional[LlmResponse]:
     """Callback function that implements a query rate limit.
 
+    Waits for a slot from the process-wide model_rate_limiter without blocking
+    the event loop. If the wait would be too long, the model call is skipped and
+    a short "try again" response is returned instead.
+
     Args:
       callback_context: A CallbackContext obj representing the active callback
         context.
@@ -84,38 +114,6 @@ def rate_limit_callback(
     
     
 
-    now = time.time()
-    if "timer_start" not in callback_context.state:
-
-        callback_context.state["timer_start"] = now
-        callback_context.state["request_count"] = 1
-        logger.debug(
-            "rate_limit_callback [timestamp: %i, "
-            "req_count: 1, elapsed_secs: 0]",
-            now,
-        )
-        return
-
-    request_count = callback_context.state["request_count"] + 1
-    elapsed_secs = now - callback_context.state["timer_start"]
-    logger.debug(
-        "rate_limit_callback [timestamp: %i, request_count: %i,"
-        " elapsed_secs: %i]",
-        now,
-        request_count,
-        elapsed_secs,
-    )
-
-    if request_count > RPM_QUOTA:
-        delay = RATE_LIMIT_SECS - elapsed_secs + 1
-        if delay > 0:
-            logger.debug("Sleeping for %i seconds", delay)
-            time.sleep(delay)
-        callback_context.state["timer_start"] = now
-        callback_context.state["request_count"] = 1
-    else:
-        callback_context.state["request_count"] = request_count
-
     # Check for a pending UI command and set it in the current turn's state_delta
     if 'current_ui_command_for_frontend' in callback_context.state:
         ui_command = callback_context.state.pop('current_ui_command_for_frontend')
@@ -128,17 +126,24 @@ def rate_limit_callback(
             # Optionally, put it back if it couldn't be set, though this might cause loops if not handled.
             # callback_context.state['current_ui_command_for_frontend'] = ui_command
 
-    return
+    model = llm_request.model or _configs.agent_settings.model
+    if not await model_rate_limiter.acquire(model):
+        return LlmResponse(
+            content=types.Content(role="model", parts=[types.Part(text=RATE_LIMITED_MESSAGE)])
+        )
+    return None
 
 
 # New function: validate_customer_id
-def validate_customer_id(customer_id: str, session_state: State) -> Tuple[bool, Optional[str]]:
+def validate_customer_id(customer_id: str, session_state: State, session_id: Optional[str] = None) -> Tuple[bool, Optional[str]]:
     """
         Validates the customer ID against the customer profile in the session state.
         
         Args:
             customer_id (str): The ID of the customer to validate.
             session_state (State): The session state containing the customer profile.
+            session_id (str, optional): The session's ID; when given, the parsed
+                profile is reused from customer_profile_cache instead of re-parsed.
         
         Returns:
             A tuple containing a bool (True/False) and an Optional String.
@@ -153,7 +158,7 @@ def validate_customer_id(customer_id: str, session_state: State) -> Tuple[bool,
     try:
         # We read the profile from the state, where it is set deterministically
         # at the beginning of the session.
-        c = Customer.model_validate_json(session_state['customer_profile'])
+        c = customer_profile_cache.get(session_id, session_state)
         logger.debug(f"Customer profile loaded from state: {c.customer_id}")
         if customer_id == c.customer_id:
             logger.info(f"Customer ID {customer_id} validated successfully.")
@@ -194,17 +199,13 @@ def before_tool(
     if "customer_profile" not in tool_context.state:
         logger.info("before_tool: 'customer_profile' not found in state. Attempting to load.")
         try:
-            customer_profile_json = Customer.get_customer("123").to_json()
-            tool_context.state["customer_profile"] = customer_profile_json
-            logger.info("before_tool: 'customer_profile' successfully loaded and set in state.")
-            logger.debug(f"before_tool: Loaded customer_profile data: {customer_profile_json}")
+            _load_customer_profile(tool_context, "before_tool")
         except Exception as e:
             logger.error(f"before_tool: Failed to load or set 'customer_profile'. Error: {e}", exc_info=True)
             # Optionally, return an error if profile loading is critical for all tools
             # return {"error": "Failed to load critical customer profile."}
     else:
-        logger.info("before_tool: 'customer_profile' already exists in state.")
-        logger.debug(f"before_tool: Existing customer_profile data: {tool_context.state['customer_profile']}")
+        logger.info(f"before_tool: 'customer_profile' already exists in state (version {tool_context.state.get(PROFILE_VERSION_STATE_KEY)}).")
 
     # i make sure all values that the agent is sending to tools are lowercase
     # Note: The original lowercase_value function returns a generator for dicts,
@@ -219,7 +220,7 @@ def before_tool(
     # Alternative: tools can fetch the customer_id from the state directly.
     if 'customer_id' in args:
         logger.info(f"Customer ID '{args['customer_id']}' found in tool arguments. Validating...")
-        valid, err = validate_customer_id(args['customer_id'], tool_context.state)
+        valid, err = validate_customer_id(args['customer_id'], tool_context.state, session_id_of(tool_context))
         if not valid:
             logger.warning(f"Customer ID validation failed for '{args['customer_id']}': {err}")
             return {"error": err} # Return error to the agent
@@ -319,14 +320,10 @@ def before_agent(callback_context: InvocationContext):
     if "customer_profile" not in callback_context.state:
         logger.info("before_agent: 'customer_profile' not found in state. Attempting to load.")
         try:
-            customer_profile_json = Customer.get_customer("123").to_json()
-            callback_context.state["customer_profile"] = customer_profile_json
-            logger.info("before_agent: 'customer_profile' successfully loaded and set in state.")
-            logger.debug(f"before_agent: Loaded customer_profile data: {customer_profile_json}")
+            _load_customer_profile(callback_context, "before_agent")
         except Exception as e:
             logger.error(f"before_agent: Failed to load or set 'customer_profile'. Error: {e}", exc_info=True)
     else:
-        logger.info("before_agent: 'customer_profile' already exists in state.")
-        logger.debug(f"before_agent: Existing customer_profile data: {callback_context.state['customer_profile']}")
+        logger.info(f"before_agent: 'customer_profile' already exists in state (version {callback_context.state.get(PROFILE_VERSION_STATE_KEY)}).")
 
     # logger.info(callback_context.state["customer_profile"])
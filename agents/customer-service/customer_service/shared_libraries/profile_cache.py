@@ -0,0 +1,93 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Per-session cache of the parsed Customer profile kept in session state."""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Mapping, MutableMapping, Optional
+
+from customer_service.entities.customer import Customer
+
+PROFILE_STATE_KEY = "customer_profile"
+PROFILE_VERSION_STATE_KEY = "customer_profile_version"
+MAX_CACHED_SESSIONS = 1024
+
+
+def session_id_of(context: Any) -> Optional[str]:
+    """Returns the session id of an ADK callback/tool context, or None if unavailable."""
+    session = getattr(context, "session", None)
+    if session is None:
+        invocation_context = getattr(context, "_invocation_context", None)
+        session = getattr(invocation_context, "session", None)
+    return getattr(session, "id", None)
+
+
+class CustomerProfileCache:
+    """Parsed Customer models per session, keyed on the profile's state version.
+
+    The profile lives in session state as compact JSON (state must stay
+    serialisable). store() writes it and bumps PROFILE_VERSION_STATE_KEY; get()
+    parses it only when the session has no entry for the current version, or
+    when the JSON itself was replaced behind the cache's back.
+    """
+
+    def __init__(self, max_sessions: int = MAX_CACHED_SESSIONS):
+        self.max_sessions = max_sessions
+        self._entries = OrderedDict()  # session_id -> (version, profile_json, customer)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def store(self, session_id: Optional[str], state: MutableMapping[str, Any], customer: Customer) -> str:
+        """Writes `customer` to state and caches it; returns the stored JSON."""
+        profile_json = customer.to_json(indent=None)
+        version = (state.get(PROFILE_VERSION_STATE_KEY) or 0) + 1
+        state[PROFILE_STATE_KEY] = profile_json
+        state[PROFILE_VERSION_STATE_KEY] = version
+        if session_id is not None:
+            self._put(session_id, (version, profile_json, customer))
+        return profile_json
+
+    def get(self, session_id: Optional[str], state: Mapping[str, Any]) -> Customer:
+        """Returns the session's Customer; raises KeyError if none is stored and
+        pydantic.ValidationError if the stored JSON is invalid."""
+        profile_json = state[PROFILE_STATE_KEY]
+        version = state.get(PROFILE_VERSION_STATE_KEY)
+        if session_id is not None:
+            with self._lock:
+                entry = self._entries.get(session_id)
+                if entry is not None and entry[0] == version and (entry[1] is profile_json or entry[1] == profile_json):
+                    self._entries.move_to_end(session_id)
+                    self.stats["hits"] += 1
+                    return entry[2]
+        customer = Customer.model_validate_json(profile_json)
+        with self._lock:
+            self.stats["misses"] += 1
+        if session_id is not None:
+            self._put(session_id, (version, profile_json, customer))
+        return customer
+
+    def _put(self, session_id: str, entry: tuple) -> None:
+        with self._lock:
+            self._entries[session_id] = entry
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_sessions:
+                self._entries.popitem(last=False)
+
+    def discard(self, session_id: str) -> None:
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+
+customer_profile_cache = CustomerProfileCache()
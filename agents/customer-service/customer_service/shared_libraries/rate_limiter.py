@@ -0,0 +1,135 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Process-wide token-bucket rate limiting for model calls."""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RPM = 0  # Unlimited; set from the project's model quota to enable
+DEFAULT_MAX_WAIT_SECS = 30.0
+
+
+class TokenBucket:
+    """Token bucket that hands out reservations instead of blocking.
+
+    `reserve()` takes a token immediately if one is available. Otherwise it
+    books the next free token (the balance goes negative, which queues callers
+    in arrival order) and returns how long the caller must wait for it. If that
+    wait would exceed `max_wait`, nothing is booked and None is returned (shed).
+    A caller that gives up on its reservation hands the token back with `refund()`.
+    """
+
+    def __init__(self, rate_per_sec: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        if rate_per_sec <= 0 or capacity < 1:
+            raise ValueError("rate_per_sec must be positive and capacity at least 1")
+        self.rate_per_sec = rate_per_sec
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = float(capacity)
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait: float) -> Optional[float]:
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate_per_sec)
+            self._updated_at = now
+            wait = max(0.0, (1 - self._tokens) / self.rate_per_sec)
+            if wait > max_wait:
+                return None
+            self._tokens -= 1
+            return wait
+
+    def refund(self) -> None:
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + 1)
+
+
+class ModelRateLimiter:
+    """One TokenBucket per model, shared by every session in the process.
+
+    A model's bucket refills at `rpm` requests per minute (from `model_rpm`,
+    else `default_rpm`) and holds up to `burst` tokens (default: one minute's
+    worth). `acquire()` waits for a token with asyncio.sleep, so other sessions
+    keep running; a request whose wait would exceed `max_wait_secs` is shed.
+    A model whose rpm is 0 (the default) is not limited.
+    """
+
+    def __init__(
+        self,
+        default_rpm: int = DEFAULT_RPM,
+        model_rpm: Optional[dict[str, int]] = None,
+        burst: Optional[int] = None,
+        max_wait_secs: float = DEFAULT_MAX_WAIT_SECS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.default_rpm = default_rpm
+        self.model_rpm = dict(model_rpm or {})
+        self.burst = burst
+        self.max_wait_secs = max_wait_secs
+        self._clock = clock
+        self._buckets = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def bucket_for(self, model: str) -> Optional[TokenBucket]:
+        """The model's bucket, or None if the model is not limited."""
+        with self._lock:
+            if model not in self._stats:
+                rpm = self.model_rpm.get(model, self.default_rpm)
+                if rpm > 0:
+                    self._buckets[model] = TokenBucket(rpm / 60.0, self.burst or rpm, clock=self._clock)
+                self._stats[model] = {
+                    "admitted": 0, "delayed": 0, "shed": 0, "cancelled": 0, "wait_secs_total": 0.0, "wait_secs_max": 0.0,
+                }
+            return self._buckets.get(model)
+
+    async def acquire(self, model: str) -> bool:
+        """Waits (without blocking the loop) for a request slot; False if the request was shed."""
+        bucket = self.bucket_for(model)
+        wait = bucket.reserve(self.max_wait_secs) if bucket is not None else 0.0
+        with self._lock:
+            stats = self._stats[model]
+            if wait is None:
+                stats["shed"] += 1
+            else:
+                stats["admitted"] += 1
+                if wait > 0:
+                    stats["delayed"] += 1
+                    stats["wait_secs_total"] += wait
+                    stats["wait_secs_max"] = max(stats["wait_secs_max"], wait)
+        if wait is None:
+            logger.warning(f"Rate limit for model {model} exceeded; shedding request (wait would exceed {self.max_wait_secs}s).")
+            return False
+        if wait > 0:
+            logger.info(f"Rate limit for model {model} reached; delaying request by {wait:.2f}s.")
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:  # e.g. the client disconnected; don't leave the bucket in debt
+                bucket.refund()
+                with self._lock:
+                    self._stats[model]["admitted"] -= 1
+                    self._stats[model]["cancelled"] += 1
+                raise
+        return True
+
+    def snapshot_stats(self) -> dict:
+        with self._lock:
+            return {model: dict(stats) for model, stats in self._stats.items()}
@@ -0,0 +1,253 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Async variants of the backend-calling tools for the live (asyncio) runner.
+
+The tools in tools.py use blocking `requests` calls; run inside the streaming
+server's event loop, one slow backend response stalls every voice session in
+the process. These coroutines have the same names, docstrings, arguments and
+return values, but do their I/O through backend_client.arequest (one shared
+httpx.AsyncClient with keep-alive, retried GETs and latency metrics). ADK
+awaits async tools.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Optional
+
+import httpx
+
+from . import backend_client, tools
+from .backend_client import SLOW_CALL_TIMEOUT_SECS
+from .tools import (
+    BACKEND_API_BASE_URL,
+    RECOMMENDATION_CARD_FIELDS,
+    _added_item_details,
+    _modify_cart_result,
+    _order_submission_result,
+    _product_id_batches,
+    _recommendations_result,
+    _search_result,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _mirrors(sync_tool):
+    """Gives an async tool the sync tool's docstring, which ADK uses as the tool description."""
+    def decorator(async_tool):
+        async_tool.__doc__ = sync_tool.__doc__
+        return async_tool
+    return decorator
+
+
+@_mirrors(tools.access_cart_information)
+async def access_cart_information(customer_id: str) -> dict:
+    logger.info("Accessing cart information for customer ID: %s", customer_id)
+    api_url = f"{BACKEND_API_BASE_URL}/cart/{customer_id}"
+    response = None
+    try:
+        response = await backend_client.arequest("GET", api_url, endpoint="cart")
+        response.raise_for_status()
+        cart_data = response.json()
+        logger.info("Successfully retrieved cart data for customer %s: %s", customer_id, cart_data)
+        return cart_data
+    except httpx.HTTPStatusError as http_err:
+        logger.error(f"HTTP error occurred while accessing cart for {customer_id}: {http_err} - Response: {response.text}")
+        return {"items": [], "subtotal": 0.0, "error": f"Failed to retrieve cart: {response.status_code}"}
+    except httpx.RequestError as req_err:
+        logger.error(f"Request exception occurred while accessing cart for {customer_id}: {req_err}")
+        return {"items": [], "subtotal": 0.0, "error": "Failed to connect to cart service."}
+    except json.JSONDecodeError as json_err:
+        logger.error(f"Failed to decode JSON response from cart API for {customer_id}: {json_err} - Response: {response.text}")
+        return {"items": [], "subtotal": 0.0, "error": "Invalid response from cart service."}
+
+
+async def _fetch_added_item_details(product_id: str) -> Optional[dict]:
+    product_api_url = f"{BACKEND_API_BASE_URL}/products/{product_id}"
+    product_response = None
+    try:
+        product_response = await backend_client.arequest("GET", product_api_url, endpoint="product_detail")
+        product_response.raise_for_status()
+        details = _added_item_details(product_response.json())
+        logger.info(f"Successfully fetched details for added item for refresh_cart: {details}")
+        return details
+    except httpx.HTTPStatusError as http_err_prod:
+        logger.error(f"HTTP error fetching product details for {product_id} (for refresh_cart): {http_err_prod} - Response: {product_response.text}")
+    except httpx.RequestError as req_err_prod:
+        logger.error(f"Request exception fetching product details for {product_id} (for refresh_cart): {req_err_prod}")
+    except json.JSONDecodeError as json_err_prod:
+        logger.error(f"Failed to decode JSON for product details {product_id} (for refresh_cart): {json_err_prod} - Response: {product_response.text}")
+    return None
+
+
+@_mirrors(tools.modify_cart)
+async def modify_cart(
+    customer_id: str, items_to_add: list[dict], items_to_remove: list[dict]
+) -> dict:
+    logger.info("Modifying cart for customer ID: %s", customer_id)
+    logger.info("Adding items: %s", items_to_add)
+    logger.info("Removing items: %s", items_to_remove)
+
+    api_url = f"{BACKEND_API_BASE_URL}/cart/modify/{customer_id}"
+    payload = {
+        "items_to_add": items_to_add if items_to_add is not None else [],
+        "items_to_remove": items_to_remove if items_to_remove is not None else []
+    }
+    response = None
+    try:
+        response = await backend_client.arequest("POST", api_url, endpoint="cart_modify", json=payload)
+        response.raise_for_status()
+        modification_status = response.json()
+    except httpx.HTTPStatusError as http_err:
+        logger.error(f"HTTP error occurred while modifying cart for {customer_id}: {http_err} - Response: {response.text}")
+        return {"status": "error", "message": f"Failed to modify cart: {response.status_code}", "items_added": False, "items_removed": False}
+    except httpx.RequestError as req_err:
+        logger.error(f"Request exception occurred while modifying cart for {customer_id}: {req_err}")
+        return {"status": "error", "message": "Failed to connect to cart modification service.", "items_added": False, "items_removed": False}
+    except json.JSONDecodeError as json_err:
+        logger.error(f"Failed to decode JSON response from cart modification API for {customer_id}: {json_err} - Response: {response.text}")
+        return {"status": "error", "message": "Invalid response from cart modification service.", "items_added": False, "items_removed": False}
+
+    logger.info("Successfully modified cart for customer %s: %s", customer_id, modification_status)
+    added_item_details = None
+    # The frontend animates the first added item, so fetch its name/image.
+    if items_to_add and modification_status.get("items_added") is True:
+        product_id_to_fetch = items_to_add[0].get("product_id")
+        if product_id_to_fetch:
+            logger.info(f"Attempting to fetch details for added product ID: {product_id_to_fetch} for refresh_cart payload.")
+            added_item_details = await _fetch_added_item_details(product_id_to_fetch)
+    return _modify_cart_result(modification_status, added_item_details)
+
+
+@_mirrors(tools.get_product_recommendations)
+async def get_product_recommendations(product_ids: list[str], customer_id: str) -> dict:
+    logger.info(
+        "Getting and formatting product details for recommendation cards for IDs: %s for customer %s",
+        product_ids,
+        customer_id,
+    )
+    if not product_ids:
+        logger.info("No product IDs provided for recommendations.")
+        return {"recommendations": []}
+
+    errors = []
+    batches = _product_id_batches(product_ids)
+    results = await asyncio.gather(*(_fetch_product_batch(batch, errors) for batch in batches))
+    return _recommendations_result(list(zip(batches, results)), errors)
+
+
+async def _fetch_product_batch(product_ids: list[str], errors: list[dict]) -> Optional[list]:
+    api_url = f"{BACKEND_API_BASE_URL}/products"
+    params = {"ids": ",".join(product_ids), "fields": ",".join(RECOMMENDATION_CARD_FIELDS)}
+    response = None
+    try:
+        response = await backend_client.arequest("GET", api_url, endpoint="product_batch", params=params)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as http_err:
+        logger.error(f"HTTP error for batch product lookup {product_ids}: {http_err} - Response: {response.text}")
+        errors.extend({"product_id": product_id, "error": str(http_err), "status_code": response.status_code} for product_id in product_ids)
+    except httpx.RequestError as req_err:
+        logger.error(f"Request exception for batch product lookup {product_ids}: {req_err}")
+        errors.extend({"product_id": product_id, "error": str(req_err)} for product_id in product_ids)
+    except json.JSONDecodeError as json_err:
+        logger.error(f"Failed to decode JSON for batch product lookup {product_ids}: {json_err} - Response: {response.text}")
+        errors.extend({"product_id": product_id, "error": "Invalid JSON response from product details API."} for product_id in product_ids)
+    return None
+
+
+@_mirrors(tools.check_product_availability)
+async def check_product_availability(product_id: str, store_id: str) -> dict:
+    logger.info("Checking availability of product ID: %s at store: %s", product_id, store_id)
+    api_url = f"{BACKEND_API_BASE_URL}/products/availability/{product_id}/{store_id}"
+    response = None
+    try:
+        response = await backend_client.arequest("GET", api_url, endpoint="product_availability")
+        response.raise_for_status()
+        availability_data = response.json()
+        logger.info("Successfully retrieved availability for product %s at store %s: %s", product_id, store_id, availability_data)
+        return availability_data
+    except httpx.HTTPStatusError as http_err:
+        logger.error(f"HTTP error occurred while checking availability for product {product_id} at store {store_id}: {http_err} - Response: {response.text}")
+        # For a 404, the API already returns a specific error. For other errors, a generic one.
+        if response.status_code == 404:
+            try:
+                return response.json() # Return the API's 404 error structure
+            except json.JSONDecodeError: # If 404 response is not JSON
+                return {"available": False, "quantity": 0, "store": store_id, "error": "Product not found and error response unparseable."}
+        return {"available": False, "quantity": 0, "store": store_id, "error": f"Failed to check availability: {response.status_code}"}
+    except httpx.RequestError as req_err:
+        logger.error(f"Request exception occurred while checking availability for product {product_id} at store {store_id}: {req_err}")
+        return {"available": False, "quantity": 0, "store": store_id, "error": "Failed to connect to availability service."}
+    except json.JSONDecodeError as json_err:
+        logger.error(f"Failed to decode JSON response from availability API for {product_id} at store {store_id}: {json_err} - Response: {response.text}")
+        return {"available": False, "quantity": 0, "store": store_id, "error": "Invalid response from availability service."}
+
+
+@_mirrors(tools.search_products)
+async def search_products(query: str, customer_id: str) -> dict:
+    logger.info(f"Searching products with query: '{query}' for customer_id (visitor_id): {customer_id}")
+    api_url = f"{BACKEND_API_BASE_URL}/retail/search-products"
+    payload = {"query": query, "visitor_id": customer_id}
+    response = None
+    try:
+        response = await backend_client.arequest("POST", api_url, endpoint="search", json=payload,
+                                                timeout=SLOW_CALL_TIMEOUT_SECS)
+        response.raise_for_status()
+        search_results = _search_result(response.json())
+        logger.info(f"Successfully retrieved search results for query '{query}': {search_results}")
+        return search_results
+    except httpx.HTTPStatusError as http_err:
+        logger.error(f"HTTP error occurred during product search for query '{query}': {http_err} - Response: {response.text}")
+        # Try to return the error from the backend if possible
+        try:
+            error_details = response.json()
+        except json.JSONDecodeError:
+            error_details = {"error": f"Failed to search products: {response.status_code}"}
+        return {"results": [], **error_details} # Combine results and error
+    except httpx.RequestError as req_err:
+        logger.error(f"Request exception occurred during product search for query '{query}': {req_err}")
+        return {"results": [], "error": "Failed to connect to product search service."}
+    except json.JSONDecodeError as json_err:
+        logger.error(f"Failed to decode JSON response from product search API for query '{query}': {json_err} - Response: {response.text}")
+        return {"results": [], "error": "Invalid response from product search service."}
+
+
+@_mirrors(tools.submit_order_and_clear_cart)
+async def submit_order_and_clear_cart(customer_id: str, cart_items: list[dict], shipping_details: dict, total_amount: float) -> dict:
+    logger.info(f"Submitting order for customer ID: {customer_id}")
+    api_url = f"{BACKEND_API_BASE_URL}/checkout/place_order"
+    payload = {
+        "customer_id": customer_id,
+        "items": cart_items,
+        "shipping_details": shipping_details,
+        "total_amount": total_amount
+    }
+    logger.info(f"Order submission payload: {json.dumps(payload, indent=2)}")
+    response = None
+    try:
+        response = await backend_client.arequest("POST", api_url, endpoint="place_order", json=payload,
+                                                timeout=SLOW_CALL_TIMEOUT_SECS)
+        response.raise_for_status()
+        return _order_submission_result(customer_id, response.json())
+    except httpx.HTTPStatusError as http_err:
+        logger.error(f"HTTP error occurred while submitting order for {customer_id}: {http_err} - Response: {response.text}")
+        return {"status": "error", "message": f"Failed to submit order due to HTTP error: {response.status_code}"}
+    except httpx.RequestError as req_err:
+        logger.error(f"Request exception occurred while submitting order for {customer_id}: {req_err}")
+        return {"status": "error", "message": "Failed to connect to order submission service."}
+    except json.JSONDecodeError as json_err:
+        logger.error(f"Failed to decode JSON response from order submission API for {customer_id}: {json_err} - Response: {response.text}")
+        return {"status": "error", "message": "Invalid response from order submission service."}
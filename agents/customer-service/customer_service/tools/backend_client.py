@@ -0,0 +1,254 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Shared HTTP client for the tools' calls to the Cymbal Home & Garden backend.
+
+All tool traffic to BACKEND_API_BASE_URL goes through `request` (sync tools,
+one pooled keep-alive requests.Session) or `arequest` (async tools, one
+httpx.AsyncClient per event loop). Idempotent GETs are retried a bounded
+number of times with full-jitter exponential backoff on connection errors,
+timeouts and 502/503/504; POSTs (cart changes, orders) are never retried.
+Every call is timed into `metrics`, keyed by a short endpoint label.
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT_SECS = 5.0
+SLOW_CALL_TIMEOUT_SECS = 10.0  # Search and order submission
+MAX_CONNECTIONS = 50
+MAX_KEEPALIVE_CONNECTIONS = 20
+MAX_GET_RETRIES = 2
+RETRY_BACKOFF_BASE_SECS = 0.1
+RETRY_BACKOFF_MAX_SECS = 1.0
+RETRYABLE_STATUS_CODES = frozenset({502, 503, 504})
+LATENCY_SAMPLES_PER_ENDPOINT = 512
+
+
+class LatencyMetrics:
+    """Thread-safe per-endpoint call counters and latency percentiles.
+
+    A call is timed from the first attempt until a response is returned or the
+    last error is raised, so retries and backoff count towards its latency.
+    Percentiles are computed over the most recent LATENCY_SAMPLES_PER_ENDPOINT calls.
+    """
+
+    def __init__(self, max_samples: int = LATENCY_SAMPLES_PER_ENDPOINT):
+        self._max_samples = max_samples
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint: str, elapsed_ms: float, *, error: bool = False, retries: int = 0) -> None:
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = {
+                    "calls": 0, "errors": 0, "retries": 0, "total_ms": 0.0,
+                    "samples": deque(maxlen=self._max_samples),
+                }
+            stats["calls"] += 1
+            stats["errors"] += int(error)
+            stats["retries"] += retries
+            stats["total_ms"] += elapsed_ms
+            stats["samples"].append(elapsed_ms)
+
+    def snapshot(self) -> dict:
+        """Returns {endpoint: {calls, errors, retries, mean_ms, p50_ms, p95_ms, max_ms}}."""
+        with self._lock:
+            endpoints = {name: (dict(stats), sorted(stats["samples"])) for name, stats in self._endpoints.items()}
+        result = {}
+        for name, (stats, samples) in endpoints.items():
+            result[name] = {
+                "calls": stats["calls"],
+                "errors": stats["errors"],
+                "retries": stats["retries"],
+                "mean_ms": round(stats["total_ms"] / stats["calls"], 2),
+                "p50_ms": round(_percentile(samples, 0.50), 2),
+                "p95_ms": round(_percentile(samples, 0.95), 2),
+                "max_ms": round(samples[-1], 2),
+            }
+        return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._endpoints.clear()
+
+
+def _percentile(sorted_samples: list, fraction: float) -> float:
+    index = min(len(sorted_samples) - 1, int(round(fraction * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+metrics = LatencyMetrics()
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+_async_client: Optional[httpx.AsyncClient] = None
+_async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_async_client_closer: Optional[asyncio.Task] = None
+
+
+def get_session() -> requests.Session:
+    """Returns the process-wide requests.Session (connection pool with keep-alive)."""
+    global _session
+    session = _session
+    if session is not None:
+        return session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            # Retries are handled in request() so that they are jittered and counted.
+            adapter = HTTPAdapter(pool_maxsize=MAX_KEEPALIVE_CONNECTIONS, max_retries=0)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+            logger.info("Created shared HTTP session for backend tools.")
+        return _session
+
+
+def close_session() -> None:
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Returns the process-wide AsyncClient, creating it for the running event loop.
+
+    httpx connections belong to the loop that opened them, so a new client is
+    created if the loop changed (e.g. between asyncio.run() calls in scripts/tests).
+    Each client is closed on its own loop: when it is replaced, or when that
+    loop shuts down (asyncio.run() cancels leftover tasks before closing it).
+    """
+    global _async_client, _async_client_loop, _async_client_closer
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client.is_closed or _async_client_loop is not loop:
+        _retire_async_client()
+        _async_client = httpx.AsyncClient(
+            timeout=DEFAULT_TIMEOUT_SECS,
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS),
+        )
+        _async_client_loop = loop
+        _async_client_closer = loop.create_task(_close_when_cancelled(_async_client), name="backend-http-client-closer")
+        logger.info("Created shared async HTTP client for backend tools.")
+    return _async_client
+
+
+async def _close_when_cancelled(client: httpx.AsyncClient) -> None:
+    try:
+        await asyncio.get_running_loop().create_future()  # Parked until cancelled
+    finally:
+        await client.aclose()
+
+
+def _retire_async_client() -> None:
+    """Has the current client closed on its loop (a no-op if that loop is gone, having closed it already)."""
+    closer, loop = _async_client_closer, _async_client_loop
+    if closer is not None and not closer.done() and loop is not None and not loop.is_closed():
+        loop.call_soon_threadsafe(closer.cancel)
+
+
+async def close_async_client() -> None:
+    """Closes the shared async client (call on server shutdown)."""
+    global _async_client, _async_client_loop, _async_client_closer
+    if _async_client is not None and not _async_client.is_closed:
+        await _async_client.aclose()
+    _retire_async_client()
+    _async_client, _async_client_loop, _async_client_closer = None, None, None
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff before retry number `attempt` (0-based)."""
+    return random.uniform(0, min(RETRY_BACKOFF_MAX_SECS, RETRY_BACKOFF_BASE_SECS * 2 ** attempt))
+
+
+def _max_retries(method: str) -> int:
+    return MAX_GET_RETRIES if method.upper() == "GET" else 0
+
+
+def request(method: str, url: str, *, endpoint: str, timeout: float = DEFAULT_TIMEOUT_SECS, **kwargs) -> requests.Response:
+    """Sends a request on the shared session; GETs are retried (see module docstring).
+
+    Returns the last response (whatever its status) or raises the last
+    requests.exceptions.RequestException, so callers keep their usual
+    raise_for_status()/except handling.
+    """
+    max_retries = _max_retries(method)
+    start_time = time.perf_counter()
+    attempt = 0
+    while True:
+        try:
+            response = get_session().request(method, url, timeout=timeout, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as err:
+            if attempt < max_retries:
+                logger.warning(f"{endpoint}: {err}; retrying ({attempt + 1}/{max_retries}).")
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+                continue
+            metrics.record(endpoint, (time.perf_counter() - start_time) * 1000, error=True, retries=attempt)
+            raise
+        except requests.exceptions.RequestException:
+            metrics.record(endpoint, (time.perf_counter() - start_time) * 1000, error=True, retries=attempt)
+            raise
+        if response.status_code in RETRYABLE_STATUS_CODES and attempt < max_retries:
+            logger.warning(f"{endpoint}: HTTP {response.status_code}; retrying ({attempt + 1}/{max_retries}).")
+            response.close()
+            time.sleep(backoff_delay(attempt))
+            attempt += 1
+            continue
+        metrics.record(endpoint, (time.perf_counter() - start_time) * 1000,
+                       error=response.status_code >= 500, retries=attempt)
+        return response
+
+
+async def arequest(method: str, url: str, *, endpoint: str, timeout: float = DEFAULT_TIMEOUT_SECS, **kwargs) -> httpx.Response:
+    """Async counterpart of request() on the shared httpx.AsyncClient; raises httpx.RequestError."""
+    max_retries = _max_retries(method)
+    start_time = time.perf_counter()
+    attempt = 0
+    while True:
+        try:
+            response = await get_async_client().request(method, url, timeout=timeout, **kwargs)
+        except httpx.TransportError as err:
+            if attempt < max_retries:
+                logger.warning(f"{endpoint}: {err!r}; retrying ({attempt + 1}/{max_retries}).")
+                await asyncio.sleep(backoff_delay(attempt))
+                attempt += 1
+                continue
+            metrics.record(endpoint, (time.perf_counter() - start_time) * 1000, error=True, retries=attempt)
+            raise
+        except httpx.RequestError:
+            metrics.record(endpoint, (time.perf_counter() - start_time) * 1000, error=True, retries=attempt)
+            raise
+        if response.status_code in RETRYABLE_STATUS_CODES and attempt < max_retries:
+            logger.warning(f"{endpoint}: HTTP {response.status_code}; retrying ({attempt + 1}/{max_retries}).")
+            await response.aclose()
+            await asyncio.sleep(backoff_delay(attempt))
+            attempt += 1
+            continue
+        metrics.record(endpoint, (time.perf_counter() - start_time) * 1000,
+                       error=response.status_code >= 500, retries=attempt)
+        return response
@@ -21,6 +21,8 @@ from typing import Optional # Added import for Optional
 import requests # Added for making HTTP requests
 import json # Added for parsing JSON responses
 
+from . import backend_client
+
 logger = logging.getLogger(__name__)
 
 # Import Config and instantiate it to access settings
@@ -147,7 +149,7 @@ def access_cart_information(customer_id: str) -> dict:
     
     api_url = f"{BACKEND_API_BASE_URL}/cart/{customer_id}"
     try:
-        response = requests.get(api_url, timeout=5) # Added timeout
+        response = backend_client.request("GET", api_url, endpoint="cart")
         response.raise_for_status() # Raises an HTTPError for bad responses (4XX or 5XX)
         cart_data = response.json()
         logger.info("Successfully retrieved cart data for customer %s: %s", customer_id, cart_data)
@@ -192,7 +194,7 @@ def modify_cart(
     }
     
     try:
-        response = requests.post(api_url, json=payload, timeout=5)
+        response = backend_client.request("POST", api_url, endpoint="cart_modify", json=payload)
         response.raise_for_status()
         modification_status = response.json()
         logger.info("Successfully modified cart for customer %s: %s", customer_id, modification_status)
@@ -209,20 +211,10 @@ def modify_cart(
                 logger.info(f"Attempting to fetch details for added product ID: {product_id_to_fetch} for refresh_cart payload.")
                 product_api_url = f"{BACKEND_API_BASE_URL}/products/{product_id_to_fetch}"
                 try:
-                    product_response = requests.get(product_api_url, timeout=5)
+                    product_response = backend_client.request("GET", product_api_url, endpoint="product_detail")
                     product_response.raise_for_status()
                     product_data = product_response.json()
-                    
-                    # Ensure the image_url is correctly formed if needed.
-                    # For now, assuming product_data.get("image_url") is sufficient as per get_product_recommendations
-                    # and the task scope (not fixing 404s here).
-                    image_url = product_data.get("image_url")
-                    
-                    added_item_details_for_payload = {
-                        "product_id": product_data.get("id"), # or product_id_to_fetch
-                        "name": product_data.get("name"),
-                        "image_url": image_url
-                    }
+                    added_item_details_for_payload = _added_item_details(product_data)
                     logger.info(f"Successfully fetched details for added item for refresh_cart: {added_item_details_for_payload}")
                 except requests.exceptions.HTTPError as http_err_prod:
                     logger.error(f"HTTP error fetching product details for {product_id_to_fetch} (for refresh_cart): {http_err_prod} - Response: {product_response.text if 'product_response' in locals() and hasattr(product_response, 'text') else 'N/A'}")
@@ -231,12 +223,7 @@ def modify_cart(
                 except json.JSONDecodeError as json_err_prod:
                     logger.error(f"Failed to decode JSON for product details {product_id_to_fetch} (for refresh_cart): {json_err_prod} - Response: {product_response.text if 'product_response' in locals() and hasattr(product_response, 'text') else 'N/A'}")
         
-        return_value = {"action": "refresh_cart", **modification_status}
-        if added_item_details_for_payload:
-            return_value["added_item"] = added_item_details_for_payload
-        
-        logger.info(f"modify_cart returning: {return_value}")
-        return return_value
+        return _modify_cart_result(modification_status, added_item_details_for_payload)
     except requests.exceptions.HTTPError as http_err:
         logger.error(f"HTTP error occurred while modifying cart for {customer_id}: {http_err} - Response: {response.text}")
         # Return an error structure consistent with what the agent might expect or can handle
@@ -249,6 +236,66 @@ def modify_cart(
         return {"status": "error", "message": "Invalid response from cart modification service.", "items_added": False, "items_removed": False}
 
 
+def _modify_cart_result(modification_status: dict, added_item_details: Optional[dict]) -> dict:
+    """Adds the frontend refresh action (and the animated item, if any) to a cart modification result."""
+    return_value = {"action": "refresh_cart", **modification_status}
+    if added_item_details:
+        return_value["added_item"] = added_item_details
+    
+    logger.info(f"modify_cart returning: {return_value}")
+    return return_value
+
+
+def _added_item_details(product_data: dict) -> dict:
+    """Details of the first added product, used by the frontend's add-to-cart animation."""
+    # Ensure the image_url is correctly formed if needed.
+    # For now, assuming product_data.get("image_url") is sufficient as per get_product_recommendations
+    # and the task scope (not fixing 404s here).
+    return {
+        "product_id": product_data.get("id"), # or product_id_to_fetch
+        "name": product_data.get("name"),
+        "image_url": product_data.get("image_url")
+    }
+
+
+# Fields the recommendation cards need; requested via the batch endpoint's projection.
+RECOMMENDATION_CARD_FIELDS = ("id", "name", "price", "image_url")
+# The backend's cap on ids per GET /api/products?ids=... (MAX_BATCH_PRODUCT_IDS in app.py); longer lists are chunked.
+MAX_BATCH_PRODUCT_IDS = 100
+
+
+def _format_recommendation_card(product_id: str, product_data: dict) -> dict:
+    """Builds one recommendation card (id, name, formatted_price, image_url, product_url)."""
+    # Ensure price is a float or int for formatting
+    price_value = product_data.get("price")
+    formatted_price_str = "N/A" # Default if price is missing or not a number
+    if isinstance(price_value, (int, float)):
+        formatted_price_str = f"${price_value:.2f}"
+    elif isinstance(price_value, str):
+        try:
+            price_value_float = float(price_value)
+            formatted_price_str = f"${price_value_float:.2f}"
+        except ValueError:
+            logger.warning(f"Could not convert price string '{price_value}' to float for product ID {product_id}")
+    else:
+         logger.warning(f"Price for product ID {product_id} is missing or not a number: {price_value}")
+
+    formatted_product = {
+        "id": product_data.get("id"),
+        "name": product_data.get("name"),
+        "formatted_price": formatted_price_str,
+        "image_url": product_data.get("image_url"),
+    }
+    product_id_for_url = product_data.get("id")
+    if product_id_for_url:
+        formatted_product["product_url"] = f"/products/{product_id_for_url}"
+    else:
+        formatted_product["product_url"] = "#" # Fallback if ID is missing
+
+    logger.info(f"Product ID {product_id} generated product_url: {formatted_product.get('product_url')}")
+    return formatted_product
+
+
 def get_product_recommendations(product_ids: list[str], customer_id: str) -> dict:
     """Retrieves and formats specific product details for a list of product IDs for recommendation cards.
 
@@ -274,62 +321,56 @@ def get_product_recommendations(product_ids: list[str], customer_id: str) -> dic
         logger.info("No product IDs provided for recommendations.")
         return {"recommendations": []}
 
-    formatted_products_details = []
+    # Batched requests (one per MAX_BATCH_PRODUCT_IDS ids) instead of one round trip per product.
     errors = []
+    batches = [(batch, _fetch_product_batch(batch, errors)) for batch in _product_id_batches(product_ids)]
+    return _recommendations_result(batches, errors)
 
-    for product_id in product_ids:
-        api_url = f"{BACKEND_API_BASE_URL}/products/{product_id}"
-        try:
-            response = requests.get(api_url, timeout=5)
-            response.raise_for_status()
-            product_data = response.json()
-            
-            # Ensure price is a float or int for formatting
-            price_value = product_data.get("price")
-            formatted_price_str = "N/A" # Default if price is missing or not a number
-            if isinstance(price_value, (int, float)):
-                formatted_price_str = f"${price_value:.2f}"
-            elif isinstance(price_value, str):
-                try:
-                    price_value_float = float(price_value)
-                    formatted_price_str = f"${price_value_float:.2f}"
-                except ValueError:
-                    logger.warning(f"Could not convert price string '{price_value}' to float for product ID {product_id}")
-            else:
-                 logger.warning(f"Price for product ID {product_id} is missing or not a number: {price_value}")
-
-
-            formatted_product = {
-                "id": product_data.get("id"),
-                "name": product_data.get("name"),
-                "formatted_price": formatted_price_str,
-                "image_url": product_data.get("image_url"),
-                "image_url": product_data.get("image_url"),
-                # Construct the new product_url
-            }
-            product_id_for_url = product_data.get("id")
-            if product_id_for_url:
-                formatted_product["product_url"] = f"/products/{product_id_for_url}"
-            else:
-                formatted_product["product_url"] = "#" # Fallback if ID is missing
-            
-            logger.info(f"Product ID {product_id} generated product_url: {formatted_product.get('product_url')}")
-            formatted_products_details.append(formatted_product)
+
+def _product_id_batches(product_ids: list[str]) -> list[list[str]]:
+    return [product_ids[start:start + MAX_BATCH_PRODUCT_IDS] for start in range(0, len(product_ids), MAX_BATCH_PRODUCT_IDS)]
+
+
+def _fetch_product_batch(product_ids: list[str], errors: list[dict]) -> Optional[list]:
+    """One GET /products?ids=... call; on failure, records an error per id and returns None."""
+    api_url = f"{BACKEND_API_BASE_URL}/products"
+    params = {"ids": ",".join(product_ids), "fields": ",".join(RECOMMENDATION_CARD_FIELDS)}
+    response = None
+    try:
+        response = backend_client.request("GET", api_url, endpoint="product_batch", params=params)
+        response.raise_for_status()
+        return response.json()
+    except requests.exceptions.HTTPError as http_err:
+        logger.error(f"HTTP error for batch product lookup {product_ids}: {http_err} - Response: {response.text}")
+        errors.extend({"product_id": product_id, "error": str(http_err), "status_code": response.status_code} for product_id in product_ids)
+    except requests.exceptions.RequestException as req_err:
+        logger.error(f"Request exception for batch product lookup {product_ids}: {req_err}")
+        errors.extend({"product_id": product_id, "error": str(req_err)} for product_id in product_ids)
+    except json.JSONDecodeError as json_err:
+        logger.error(f"Failed to decode JSON for batch product lookup {product_ids}: {json_err} - Response: {response.text if response else 'No response'}")
+        errors.extend({"product_id": product_id, "error": "Invalid JSON response from product details API."} for product_id in product_ids)
+    return None
+
+
+def _recommendations_result(batches: list[tuple[list[str], Optional[list]]], errors: list[dict]) -> dict:
+    """Turns (ids, batch /products response) pairs into recommendation cards (shared by the sync and async tools).
+
+    Batches whose request failed (None) already have their errors recorded.
+    """
+    formatted_products_details = []
+    for product_ids, products_data in batches:
+        if products_data is None:
+            continue
+        products_by_id = {product.get("id"): product for product in products_data if isinstance(product, dict)}
+        for product_id in product_ids:
+            product_data = products_by_id.get(product_id)
+            if product_data is None:
+                logger.error(f"Product ID {product_id} not found in batch product lookup.")
+                errors.append({"product_id": product_id, "error": "Product not found", "status_code": 404})
+                continue
+            formatted_products_details.append(_format_recommendation_card(product_id, product_data))
             logger.info(f"Successfully retrieved and formatted details for product ID {product_id}")
 
-        except requests.exceptions.HTTPError as http_err:
-            error_msg = f"HTTP error for product ID {product_id}: {http_err} - Response: {response.text}"
-            logger.error(error_msg)
-            errors.append({"product_id": product_id, "error": str(http_err), "status_code": response.status_code if response else "N/A"})
-        except requests.exceptions.RequestException as req_err:
-            error_msg = f"Request exception for product ID {product_id}: {req_err}"
-            logger.error(error_msg)
-            errors.append({"product_id": product_id, "error": str(req_err)})
-        except json.JSONDecodeError as json_err:
-            error_msg = f"Failed to decode JSON for product ID {product_id}: {json_err} - Response: {response.text if response else 'No response'}"
-            logger.error(error_msg)
-            errors.append({"product_id": product_id, "error": "Invalid JSON response from product details API."})
-            
     if errors:
         logger.warning(f"Encountered errors while fetching details for some products: {errors}")
         
@@ -359,7 +400,7 @@ def check_product_availability(product_id: str, store_id: str) -> dict:
     )
     api_url = f"{BACKEND_API_BASE_URL}/products/availability/{product_id}/{store_id}"
     try:
-        response = requests.get(api_url, timeout=5)
+        response = backend_client.request("GET", api_url, endpoint="product_availability")
         response.raise_for_status()
         availability_data = response.json()
         logger.info("Successfully retrieved availability for product %s at store %s: %s", product_id, store_id, availability_data)
@@ -380,6 +421,13 @@ def check_product_availability(product_id: str, store_id: str) -> dict:
         logger.error(f"Failed to decode JSON response from availability API for {product_id} at store {store_id}: {json_err} - Response: {response.text}")
         return {"available": False, "quantity": 0, "store": store_id, "error": "Invalid response from availability service."}
 
+def _search_result(search_results: dict) -> dict:
+    """The backend endpoint returns {'recommendations': [...]}, let's rename to 'results' for clarity."""
+    if "recommendations" in search_results:
+         search_results["results"] = search_results.pop("recommendations")
+    return search_results
+
+
 def search_products(query: str, customer_id: str) -> dict:
     """Searches for products based on a query string using the retail search backend.
 
@@ -403,13 +451,10 @@ def search_products(query: str, customer_id: str) -> dict:
     payload = {"query": query, "visitor_id": customer_id}
 
     try:
-        response = requests.post(api_url, json=payload, timeout=10) # Increased timeout for search
+        response = backend_client.request("POST", api_url, endpoint="search", json=payload,
+                                          timeout=backend_client.SLOW_CALL_TIMEOUT_SECS) # Increased timeout for search
         response.raise_for_status()
-        search_results = response.json()
-        # The backend endpoint returns {'recommendations': [...]}, let's rename to 'results' for clarity
-        if "recommendations" in search_results:
-             search_results["results"] = search_results.pop("recommendations")
-
+        search_results = _search_result(response.json())
         logger.info(f"Successfully retrieved search results for query '{query}': {search_results}")
         return search_results
     except requests.exceptions.HTTPError as http_err:
@@ -690,6 +735,25 @@ def set_website_theme(theme: str) -> dict:
     return action_result
 
 
+def _order_submission_result(customer_id: str, order_status: dict) -> dict:
+    """Maps the place_order API response to the tool result (adds the UI action on success)."""
+    if order_status.get("status") == "success":
+        logger.info(f"Order successfully submitted for customer {customer_id}: {order_status}")
+        return {
+            "status": "success",
+            "message": order_status.get("message", "Order submitted and cart cleared."),
+            "order_id": order_status.get("order_id"),
+            "action": "refresh_cart_and_show_confirmation" # Action for UI
+        }
+    else:
+        logger.error(f"Order submission reported failure by API for customer {customer_id}: {order_status}")
+        return {
+            "status": "error",
+            "message": order_status.get("message", "Order submission failed at API level."),
+            "details": order_status
+        }
+
+
 def submit_order_and_clear_cart(customer_id: str, cart_items: list[dict], shipping_details: dict, total_amount: float) -> dict:
     """
     Submits the order to the backend, which includes clearing the cart.
@@ -717,25 +781,11 @@ def submit_order_and_clear_cart(customer_id: str, cart_items: list[dict], shippi
     logger.info(f"Order submission payload: {json.dumps(payload, indent=2)}")
 
     try:
-        response = requests.post(api_url, json=payload, timeout=10)
+        response = backend_client.request("POST", api_url, endpoint="place_order", json=payload,
+                                          timeout=backend_client.SLOW_CALL_TIMEOUT_SECS)
         response.raise_for_status()
         order_status = response.json() # Expected: {"status": "success", "message": "...", "order_id": "..."}
-        
-        if order_status.get("status") == "success":
-            logger.info(f"Order successfully submitted for customer {customer_id}: {order_status}")
-            return {
-                "status": "success",
-                "message": order_status.get("message", "Order submitted and cart cleared."),
-                "order_id": order_status.get("order_id"),
-                "action": "refresh_cart_and_show_confirmation" # Action for UI
-            }
-        else:
-            logger.error(f"Order submission reported failure by API for customer {customer_id}: {order_status}")
-            return {
-                "status": "error",
-                "message": order_status.get("message", "Order submission failed at API level."),
-                "details": order_status
-            }
+        return _order_submission_result(customer_id, order_status)
 
     except requests.exceptions.HTTPError as http_err:
         logger.error(f"HTTP error occurred while submitting order for {customer_id}: {http_err} - Response: {response.text if 'response' in locals() else 'N/A'}")
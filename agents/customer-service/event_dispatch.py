@@ -0,0 +1,281 @@
+"""Routes live agent events to the messages the widget expects.
+
+Each event is classified once:
+
+- status:  turn_complete / interrupted / interaction_completed flags
+- action:  a tool response dict whose "action" has a registered handler
+- type:    a tool response dict whose "type" has a registered handler
+           (product_recommendations)
+- ui_command, text, audio:  the first content part
+
+Tool response handlers are looked up in dicts instead of re-probing
+`parts[0].function_response.response` once per action, and text parts are
+only JSON-parsed when they look like a ui_command object (start with "{" and
+mention "ui_command"), so plain speech and audio chunks take the short path.
+
+Handlers receive (outbound, session_id, payload), send through the session's
+OutboundQueue, and return False to fall through to the content part.
+"""
+
+import json
+import logging
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Any, str, Any], Awaitable[bool]]
+
+_UI_COMMAND_MARKER = "ui_command"
+_MISSING = object()
+_absent_fields = set()  # (pydantic model class, attribute name) known not to exist
+
+
+def _attr(obj: Any, name: str, default: Any = None) -> Any:
+    """getattr with a per-class cache of missing fields on pydantic models.
+
+    ADK's Event has no `server_content` or `interaction_completed`, and a failed
+    getattr on a pydantic model costs microseconds per probe on every chunk.
+    """
+    cls = type(obj)
+    if (cls, name) in _absent_fields:
+        return default
+    value = getattr(obj, name, _MISSING)
+    if value is _MISSING:
+        config = getattr(cls, "model_config", None)
+        if isinstance(config, dict) and config.get("extra") != "allow":  # Fields are fixed per class
+            _absent_fields.add((cls, name))
+        return default
+    return value
+
+
+def _content_of(event: Any) -> Any:
+    return _attr(event, "server_content") or _attr(event, "content")
+
+
+def _tool_response(content: Any) -> Optional[dict]:
+    """The function_response dict of the first part (or a bare dict content), else None."""
+    if isinstance(content, dict):
+        return content
+    parts = getattr(content, "parts", None)
+    if not parts:
+        return None
+    function_response = getattr(parts[0], "function_response", None)
+    response = getattr(function_response, "response", None) if function_response is not None else None
+    return response if isinstance(response, dict) else None
+
+
+def parse_ui_command(text: str) -> Optional[dict]:
+    """Returns the ui_command dict encoded in `text`, or None; skips json.loads for ordinary text."""
+    if text[:32].lstrip()[:1] != "{" or _UI_COMMAND_MARKER not in text:
+        return None
+    try:
+        command = json.loads(text)
+    except json.JSONDecodeError:
+        return None
+    if isinstance(command, dict) and command.get("type") == _UI_COMMAND_MARKER:
+        return command
+    return None
+
+
+class AgentEventDispatcher:
+    """Registry of tool response handlers plus the fixed status/text/audio routes."""
+
+    def __init__(self):
+        self._actions: dict = {}  # response["action"] -> Handler
+        self._types: dict = {}  # response["type"] -> Handler
+        self.counts: dict = {}  # kind -> events dispatched
+
+    def action(self, *names: str) -> Callable[[Handler], Handler]:
+        """Registers a handler for tool responses whose "action" is one of `names`."""
+        def register(handler: Handler) -> Handler:
+            for name in names:
+                self._actions[name] = handler
+            return handler
+        return register
+
+    def response_type(self, *names: str) -> Callable[[Handler], Handler]:
+        """Registers a handler for tool responses whose "type" is one of `names`."""
+        def register(handler: Handler) -> Handler:
+            for name in names:
+                self._types[name] = handler
+            return handler
+        return register
+
+    async def dispatch(self, event: Any, outbound: Any, session_id: str) -> str:
+        """Sends whatever `event` maps to and returns the kind it was classified as."""
+        kind = await self._dispatch(event, outbound, session_id)
+        self.counts[kind] = self.counts.get(kind, 0) + 1
+        return kind
+
+    async def _dispatch(self, event: Any, outbound: Any, session_id: str) -> str:
+        is_turn_complete = _attr(event, "turn_complete", False)
+        is_interrupted = _attr(event, "interrupted", False)
+        is_interaction_completed = _attr(event, "interaction_completed", False)
+        if is_turn_complete or is_interrupted or is_interaction_completed:
+            status_message = {
+                "turn_complete": is_turn_complete,
+                "interrupted": is_interrupted,
+                "interaction_completed": is_interaction_completed,
+            }
+            if is_interrupted:  # Barge-in: speech still queued for the client belongs to the abandoned answer
+                cleared = outbound.clear_audio()
+                if cleared:
+                    logger.info(f"[DIAG_LOG S2C {session_id}] Discarded {cleared} bytes of queued agent audio.")
+            logger.info(f"[DIAG_LOG S2C {session_id}] Sending status: {status_message}")
+            await outbound.put_control(status_message)
+            return "status"
+
+        content = _content_of(event)
+        if not content:
+            logger.info(f"[DIAG_LOG S2C {session_id}] Event has no server_content. Skipping.")
+            return "empty"
+
+        response = _tool_response(content)
+        if response is not None:
+            action = response.get("action")
+            handler = self._actions.get(action) if action is not None else None
+            if handler is not None and await handler(outbound, session_id, response):
+                return f"action:{action}"
+            response_type = response.get("type")
+            handler = self._types.get(response_type) if response_type is not None else None
+            if handler is not None and await handler(outbound, session_id, response):
+                return f"type:{response_type}"
+
+        parts = getattr(content, "parts", None)
+        if not parts:
+            logger.info(f"[DIAG_LOG S2C {session_id}] No parts in server_content. Skipping.")
+            return "empty"
+        part = parts[0]
+
+        if part.text:
+            ui_command = parse_ui_command(part.text)
+            if ui_command is not None:
+                logger.info(f"[DIAG_LOG S2C {session_id}] Handling 'ui_command' from text: {ui_command.get('command_name', 'Unknown UI Command')}")
+                await outbound.put_control(ui_command)
+                return "ui_command"
+            logger.info(f"[DIAG_LOG S2C {session_id}] Sending text: '{part.text[:70]}...'")
+            await outbound.put_control({"mime_type": "text/plain", "data": part.text})
+            return "text"
+
+        if part.inline_data and part.inline_data.mime_type == "audio/pcm":
+            if part.inline_data.data:
+                outbound.put_audio(part.inline_data.data)  # Encoded (binary frame or base64 JSON) by the writer
+                return "audio"
+            logger.info(f"[DIAG_LOG S2C {session_id}] Audio part present but data is empty.")
+            return "empty"
+
+        logger.info(f"[DIAG_LOG S2C {session_id}] No text or audio/pcm data in part to send.")
+        return "unhandled"
+
+
+dispatcher = AgentEventDispatcher()
+
+
+async def _send_speech(outbound: Any, session_id: str, speech: Optional[str], reason: str) -> None:
+    if speech:
+        logger.info(f"[DIAG_LOG S2C {session_id}] Sending agent speech for '{reason}': '{speech[:70]}...'")
+        await outbound.put_control({"mime_type": "text/plain", "data": speech})
+
+
+@dispatcher.action("set_theme")
+async def _set_theme(outbound, session_id, response):
+    theme_value = response.get("theme")
+    if theme_value:
+        logger.info(f"[DIAG_LOG S2C {session_id}] Handling 'set_theme': {theme_value}")
+        await outbound.put_control({"type": "command", "command_name": "set_theme", "payload": {"theme": theme_value}})
+    else:
+        logger.warning(f"[DIAG_LOG S2C {session_id}] 'set_theme' action missing value.")
+    return True
+
+
+@dispatcher.action("refresh_cart")
+async def _refresh_cart(outbound, session_id, response):
+    logger.info(f"[DIAG_LOG S2C {session_id}] Handling 'refresh_cart'")
+    await outbound.put_control({"type": "command", "command_name": "refresh_cart"})
+    return True
+
+
+@dispatcher.response_type("product_recommendations")
+async def _product_recommendations(outbound, session_id, response):
+    logger.info(f"[DIAG_LOG S2C {session_id}] Handling 'product_recommendations'")
+    await outbound.put_control(json.dumps(response))  # Client expects raw JSON string for this
+    return True
+
+
+@dispatcher.action("show_checkout_ui")
+async def _show_checkout_ui(outbound, session_id, response):
+    cart_data = response.get("cart_data")
+    if cart_data is None:
+        logger.warning(f"[DIAG_LOG S2C {session_id}] 'show_checkout_ui' action received, but 'cart_data' is missing or None. Payload: {response}")
+        return True
+    logger.info(f"[DIAG_LOG S2C {session_id}] Handling 'show_checkout_ui'. Cart data present.")
+    # Speech parts that came before this tool response in the stream were already queued.
+    await outbound.put_control({"type": "command", "command_name": "display_checkout_modal", "data": cart_data})
+    logger.info(f"[DIAG_LOG S2C {session_id}] Sent 'display_checkout_modal' command with cart data.")
+    return True
+
+
+@dispatcher.action("show_shipping_ui_requested")
+async def _show_shipping_ui(outbound, session_id, response):
+    logger.info(f"[DIAG_LOG S2C {session_id}] Handling 'show_shipping_ui_requested'.")
+    await outbound.put_control({"type": "command", "command_name": "display_shipping_modal"})
+    return True
+
+
+@dispatcher.action("show_payment_ui_requested")
+async def _show_payment_ui(outbound, session_id, response):
+    logger.info(f"[DIAG_LOG S2C {session_id}] Handling 'show_payment_ui_requested'.")
+    await outbound.put_control({"type": "command", "command_name": "display_payment_modal"})  # Client will listen for this
+    return True
+
+
+_CONFIRM_ACTION_SELECTION_TYPES = {
+    "confirm_ui_home_delivery": "home_delivery",
+    "confirm_ui_pickup_initiated": "pickup_initiated",
+    "confirm_ui_pickup_address": "pickup_address",
+}
+
+
+@dispatcher.action(*_CONFIRM_ACTION_SELECTION_TYPES)
+async def _confirm_selection(outbound, session_id, response):
+    tool_action = response["action"]
+    selection_type = _CONFIRM_ACTION_SELECTION_TYPES[tool_action]
+    command_payload = {"type": "command", "command_name": "agent_confirm_selection", "selection_type": selection_type}
+    if selection_type == "pickup_address":
+        command_payload["address_index"] = response.get("address_index")
+    await _send_speech(outbound, session_id, response.get("speak"), tool_action)  # Speech goes before the command
+    logger.info(f"[DIAG_LOG S2C {session_id}] Handling '{tool_action}'. Sending command: {command_payload}")
+    await outbound.put_control(command_payload)
+    return True
+
+
+@dispatcher.action("no_ui_change_needed")
+async def _no_ui_change_needed(outbound, session_id, response):
+    if not response.get("speak"):
+        logger.info(f"[DIAG_LOG S2C {session_id}] Handling 'no_ui_change_needed' but no speech provided.")
+    await _send_speech(outbound, session_id, response.get("speak"), "no_ui_change_needed")
+    return True
+
+
+@dispatcher.action("refresh_cart_and_show_confirmation")
+async def _order_confirmed(outbound, session_id, response):
+    logger.info(f"[DIAG_LOG S2C {session_id}] Handling 'refresh_cart_and_show_confirmation'.")
+    message = response.get("message")  # Tool returns message from API
+    await _send_speech(outbound, session_id, message, "refresh_cart_and_show_confirmation")
+    await outbound.put_control({
+        "type": "command",
+        "command_name": "order_confirmed_refresh_cart",  # Client will listen for this
+        "data": {"order_id": response.get("order_id"), "message": message},
+    })
+    logger.info(f"[DIAG_LOG S2C {session_id}] Sent 'order_confirmed_refresh_cart' command.")
+    return True
+
+
+@dispatcher.action("display_ui")
+async def _display_ui(outbound, session_id, response):
+    if "ui_element" not in response or "payload" not in response:
+        return False  # Not a complete UI command; fall through to the content part
+    command = {"type": "ui_command", "command_name": response.get("ui_element"), "payload": response.get("payload")}
+    logger.info(f"[DIAG_LOG S2C {session_id}] Handling direct 'display_ui' tool response: {command['command_name']}")
+    await outbound.put_control(command)
+    return True
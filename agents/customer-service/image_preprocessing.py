@@ -0,0 +1,144 @@
+"""Downscales and recompresses uploaded images before they reach the model.
+
+Phone photos of plants are often several MB, and the model sees little more
+than ~1000px of them. ImagePreprocessor runs each image through Pillow on a
+small thread pool (Pillow releases the GIL while decoding, resizing and
+encoding, and threads avoid pickling multi-MB payloads to a process pool):
+
+- EXIF orientation is applied, then all metadata (EXIF, GPS, ICC, comments) is
+  dropped by re-encoding.
+- The longest side is capped at `max_dimension`; JPEG sources are decoded
+  straight at a reduced scale (Image.draft) when they are far larger.
+- The result is a baseline JPEG; transparency is flattened onto white and only
+  the first frame of an animation is kept.
+- An image that needed no downscaling and carries no metadata is sent as
+  uploaded when re-encoding would not make it smaller (e.g. an already
+  well-compressed JPEG), rather than recompressing it and losing quality again.
+
+Images Pillow cannot decode are passed through unchanged so the model can
+still try; decompression bombs are rejected with ImageRejected.
+"""
+
+import asyncio
+import io
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_DIMENSION = 1024
+DEFAULT_JPEG_QUALITY = 85
+DEFAULT_MAX_WORKERS = 2
+MAX_INPUT_PIXELS = 50_000_000  # Larger images are refused outright (decompression bomb guard)
+OUTPUT_MIME_TYPE = "image/jpeg"
+
+_METADATA_KEYS = ("exif", "icc_profile", "comment", "xmp", "XML:com.adobe.xmp")
+_STAT_KEYS = (
+    "images", "reduced", "kept_original", "passthrough", "rejected", "bytes_in", "bytes_out", "processing_ms",
+)
+
+
+class ImageRejected(ValueError):
+    """The image is too large to decode safely."""
+
+
+def preprocess_image(
+    data: bytes,
+    max_dimension: int = DEFAULT_MAX_DIMENSION,
+    quality: int = DEFAULT_JPEG_QUALITY,
+) -> Optional[bytes]:
+    """Returns `data` as a downscaled, metadata-free JPEG, or None if Pillow cannot decode it.
+
+    Returns `data` itself when the image needed no downscaling, has no metadata
+    to strip and the JPEG would not be smaller. Raises ImageRejected for images
+    over MAX_INPUT_PIXELS.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            width, height = image.size
+            if width * height > MAX_INPUT_PIXELS:
+                raise ImageRejected(f"Image of {width}x{height} pixels exceeds the {MAX_INPUT_PIXELS} pixel limit.")
+            has_metadata = any(key in image.info for key in _METADATA_KEYS)
+            if image.format == "JPEG":
+                image.draft("RGB", (max_dimension, max_dimension))  # Decodes at 1/2, 1/4 or 1/8 scale when possible
+            image = ImageOps.exif_transpose(image)
+            if image.mode in ("RGBA", "LA", "P"):
+                image = image.convert("RGBA")
+                background = Image.new("RGB", image.size, (255, 255, 255))
+                background.paste(image, mask=image.getchannel("A"))
+                image = background
+            elif image.mode != "RGB":
+                image = image.convert("RGB")
+            image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+            output = io.BytesIO()
+            image.save(output, format="JPEG", quality=quality, optimize=True)
+            if not has_metadata and image.size == (width, height) and output.tell() >= len(data):
+                return data
+            return output.getvalue()
+    except ImageRejected:
+        raise
+    except Image.DecompressionBombError as e:
+        raise ImageRejected(str(e)) from e
+    except (UnidentifiedImageError, OSError, SyntaxError, ValueError) as e:  # Unknown, truncated or unconvertible
+        logger.warning(f"Cannot decode uploaded image ({len(data)} bytes), passing it through: {e}")
+        return None
+
+
+class ImagePreprocessor:
+    """Runs preprocess_image on a thread pool and keeps process-wide stats."""
+
+    def __init__(
+        self,
+        max_dimension: int = DEFAULT_MAX_DIMENSION,
+        quality: int = DEFAULT_JPEG_QUALITY,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+    ):
+        self.max_dimension = max_dimension
+        self.quality = quality
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.stats = dict.fromkeys(_STAT_KEYS, 0)
+
+    async def process(self, data: bytes, mime_type: str) -> tuple:
+        """Returns (bytes, mime_type) to send to the model; raises ImageRejected for oversized images."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="image-preprocess")
+        start = time.perf_counter()
+        try:
+            processed = await asyncio.get_running_loop().run_in_executor(
+                self._executor, preprocess_image, data, self.max_dimension, self.quality,
+            )
+        except ImageRejected:
+            self.stats["rejected"] += 1
+            raise
+        self.stats["images"] += 1
+        self.stats["bytes_in"] += len(data)
+        self.stats["processing_ms"] += round((time.perf_counter() - start) * 1000)
+        if processed is None:
+            self.stats["passthrough"] += 1
+            self.stats["bytes_out"] += len(data)
+            return data, mime_type
+        if processed is data:
+            self.stats["kept_original"] += 1
+            self.stats["bytes_out"] += len(data)
+            return data, mime_type
+        self.stats["bytes_out"] += len(processed)
+        if len(processed) < len(data):
+            self.stats["reduced"] += 1
+        return processed, OUTPUT_MIME_TYPE
+
+    def snapshot_stats(self) -> dict:
+        saved = 1 - self.stats["bytes_out"] / self.stats["bytes_in"] if self.stats["bytes_in"] else 0.0
+        return dict(self.stats, bytes_saved_ratio=round(saved, 4))
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+image_preprocessor = ImagePreprocessor()
@@ -0,0 +1,175 @@
+"""Deterministic stand-in for Runner.run_live, for load-testing the streaming server offline.
+
+Start the server with LIVE_RUNNER=mock and every session is driven by a
+MockLiveRunner instead of Gemini Live. It reads the session's LiveRequestQueue
+like the real runner and answers each user turn with scripted events:
+
+- A user turn is a text/content message, an activity_end signal, or
+  `audio_turn_bytes` of realtime mic audio (1 s at 16 kHz by default).
+- After `first_token_latency_ms` (± `latency_jitter_ms`, from a seeded RNG) it
+  streams `text_chunks` partial text events, or `audio_chunks` PCM chunks when
+  the session asked for AUDIO, one every `chunk_interval_ms`.
+- Every `tool_every_n_turns` turns it first calls a real tool (cycling through
+  the cart lookup, which goes to the local backend at BACKEND_API_BASE_URL, and
+  set_website_theme) and emits the function call and response events.
+- Each turn ends with a turn_complete event. User content, the full answer
+  text and tool events are appended to the session service as the real runner
+  does, so the session store is exercised too.
+
+Script settings come from the constructor or MOCK_LIVE_* environment variables
+(see MockLiveScript.from_env).
+"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+import uuid
+from typing import Any, AsyncGenerator, Optional
+
+from google.adk.events import Event
+from google.genai import types
+
+logger = logging.getLogger(__name__)
+
+_SENTENCE = "Ferns like bright, indirect light and evenly moist soil, so water when the top inch feels dry."
+
+
+class MockLiveScript:
+    """Rates, latencies and content of the scripted turns."""
+
+    def __init__(
+        self,
+        first_token_latency_ms: float = 300.0,
+        latency_jitter_ms: float = 50.0,
+        chunk_interval_ms: float = 100.0,
+        text_chunks: int = 4,
+        audio_chunks: int = 10,
+        audio_chunk_bytes: int = 4800,  # 100 ms of 24 kHz 16-bit mono
+        audio_turn_bytes: int = 32000,  # 1 s of 16 kHz 16-bit mono mic audio
+        tool_every_n_turns: int = 2,
+        customer_id: str = "123",
+        seed: int = 0,
+    ):
+        self.first_token_latency_ms = first_token_latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.chunk_interval_ms = chunk_interval_ms
+        self.text_chunks = text_chunks
+        self.audio_chunks = audio_chunks
+        self.audio_chunk_bytes = audio_chunk_bytes
+        self.audio_turn_bytes = audio_turn_bytes
+        self.tool_every_n_turns = tool_every_n_turns
+        self.customer_id = customer_id
+        self.seed = seed
+
+    @classmethod
+    def from_env(cls) -> "MockLiveScript":
+        env = os.environ
+        return cls(
+            first_token_latency_ms=float(env.get("MOCK_LIVE_FIRST_TOKEN_MS", 300.0)),
+            latency_jitter_ms=float(env.get("MOCK_LIVE_JITTER_MS", 50.0)),
+            chunk_interval_ms=float(env.get("MOCK_LIVE_CHUNK_INTERVAL_MS", 100.0)),
+            text_chunks=int(env.get("MOCK_LIVE_TEXT_CHUNKS", 4)),
+            audio_chunks=int(env.get("MOCK_LIVE_AUDIO_CHUNKS", 10)),
+            tool_every_n_turns=int(env.get("MOCK_LIVE_TOOL_EVERY_N_TURNS", 2)),
+            customer_id=env.get("MOCK_LIVE_CUSTOMER_ID", "123"),
+            seed=int(env.get("MOCK_LIVE_SEED", 0)),
+        )
+
+
+def _cart_tool(script: MockLiveScript) -> tuple:
+    """Returns (tool name, args, coroutine function that runs the tool)."""
+    from customer_service.tools import async_tools
+    args = {"customer_id": script.customer_id}
+    return "access_cart_information", args, lambda: async_tools.access_cart_information(**args)
+
+
+def _theme_tool(script: MockLiveScript) -> tuple:
+    from customer_service.tools import tools
+    args = {"theme": "night"}
+    return "set_website_theme", args, lambda: asyncio.to_thread(tools.set_website_theme, **args)
+
+
+_TOOL_CYCLE = (_cart_tool, _theme_tool)
+
+
+class MockLiveRunner:
+    """Drop-in for google.adk.runners.Runner in streaming_server's start_agent_session."""
+
+    def __init__(self, agent: Any = None, app_name: str = "", session_service: Any = None,
+                 script: Optional[MockLiveScript] = None):
+        self.agent_name = getattr(agent, "name", None) or "mock_live_agent"
+        self.app_name = app_name
+        self.session_service = session_service
+        self.script = script or MockLiveScript.from_env()
+
+    async def run_live(self, *, session: Any, live_request_queue: Any, run_config: Any = None,
+                       **kwargs) -> AsyncGenerator[Event, None]:
+        modalities = [str(m).upper() for m in (getattr(run_config, "response_modalities", None) or ["TEXT"])]
+        audio_out = any("AUDIO" in m for m in modalities)
+        rng = random.Random(f"{self.script.seed}:{session.id}")  # Same script per session id on every run
+        audio_chunk = random.Random(self.script.seed).randbytes(self.script.audio_chunk_bytes)
+        pending_audio_bytes = 0
+        turn = 0
+        while True:
+            request = await live_request_queue.get()
+            if request.close:
+                return
+            if request.blob is not None:
+                pending_audio_bytes += len(request.blob.data or b"")
+                if pending_audio_bytes < self.script.audio_turn_bytes:
+                    continue
+                pending_audio_bytes = 0
+            elif request.content is not None:
+                await self._append(session, Event(author="user", invocation_id=f"mock-{uuid.uuid4().hex[:8]}",
+                                                  content=request.content))
+            elif request.activity_end is None:
+                continue
+            turn += 1
+            async for event in self._turn(session, turn, rng, audio_out, audio_chunk):
+                yield event
+
+    async def _turn(self, session, turn, rng, audio_out, audio_chunk) -> AsyncGenerator[Event, None]:
+        script = self.script
+        invocation_id = f"mock-{uuid.uuid4().hex[:8]}"
+        jitter = rng.uniform(-script.latency_jitter_ms, script.latency_jitter_ms)
+        await asyncio.sleep(max(0.0, script.first_token_latency_ms + jitter) / 1000)
+
+        if script.tool_every_n_turns and turn % script.tool_every_n_turns == 0:
+            name, args, run_tool = _TOOL_CYCLE[(turn // script.tool_every_n_turns - 1) % len(_TOOL_CYCLE)](script)
+            call_event = self._event(invocation_id, types.Part(function_call=types.FunctionCall(name=name, args=args)))
+            await self._append(session, call_event)
+            yield call_event  # Like the real runner, the call is emitted before the tool runs
+            start = time.perf_counter()
+            result = await run_tool()
+            logger.debug(f"Mock tool {name} for session {session.id} took {(time.perf_counter() - start) * 1000:.1f} ms")
+            response_event = self._event(
+                invocation_id, types.Part(function_response=types.FunctionResponse(name=name, response=result)))
+            await self._append(session, response_event)
+            yield response_event
+
+        words = _SENTENCE.split(" ")
+        if audio_out:
+            for index in range(script.audio_chunks):
+                if index:
+                    await asyncio.sleep(script.chunk_interval_ms / 1000)
+                yield self._event(invocation_id, types.Part(inline_data=types.Blob(mime_type="audio/pcm", data=audio_chunk)),
+                                  partial=True)
+        else:
+            per_chunk = max(1, -(-len(words) // max(1, script.text_chunks)))
+            for index in range(0, len(words), per_chunk):
+                if index:
+                    await asyncio.sleep(script.chunk_interval_ms / 1000)
+                text = " ".join(words[index:index + per_chunk]) + " "
+                yield self._event(invocation_id, types.Part(text=text), partial=True)
+        await self._append(session, self._event(invocation_id, types.Part(text=_SENTENCE)))
+        yield Event(author=self.agent_name, invocation_id=invocation_id, turn_complete=True, interrupted=False)
+
+    def _event(self, invocation_id: str, part: types.Part, partial: bool = False) -> Event:
+        return Event(author=self.agent_name, invocation_id=invocation_id, partial=partial,
+                     content=types.Content(role="model", parts=[part]))
+
+    async def _append(self, session, event: Event) -> None:
+        if self.session_service is not None:
+            await self.session_service.append_event(session, event)
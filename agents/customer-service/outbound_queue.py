@@ -0,0 +1,225 @@
+"""Bounded per-session send queue between the live event loop and the WebSocket.
+
+agent_to_client_messaging used to await every send inline, so a slow client
+stalled reading from the live event iterator and upstream buffering grew
+without limit. Events now go into an OutboundQueue that a dedicated writer
+task drains:
+
+- Control messages (commands, status, text) are never dropped. When
+  `max_control_messages` are waiting, put_control() blocks until the writer
+  catches up, which pushes back on the event loop instead of buffering more.
+- Audio never blocks the producer. Once more than `max_audio_bytes` of audio is
+  waiting, the oldest audio chunks are dropped: a client that far behind would
+  hear stale speech. Consecutive audio chunks waiting in the queue are sent as
+  one frame (up to `max_coalesced_audio_bytes`).
+- When the user barges in, clear_audio() discards all agent audio still
+  waiting, so the client stops hearing the interrupted answer right away.
+- Messages leave in the order they were queued, apart from dropped audio.
+"""
+
+import asyncio
+import base64
+import logging
+from collections import deque
+from typing import Any, Optional, Union
+
+from audio_frames import encode_audio_frame
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONTROL_MESSAGES = 256
+DEFAULT_MAX_AUDIO_BYTES = 96_000  # ~2s of 24kHz 16-bit mono agent speech
+DEFAULT_MAX_COALESCED_AUDIO_BYTES = 24_000  # ~0.5s per frame
+DEFAULT_DRAIN_TIMEOUT_SECS = 2.0
+
+_CONTROL = "control"
+_AUDIO = "audio"
+_STAT_KEYS = (
+    "control_enqueued", "audio_enqueued", "messages_sent",
+    "audio_dropped", "audio_bytes_dropped", "audio_cleared", "audio_bytes_cleared", "audio_coalesced", "max_depth",
+)
+
+
+class OutboundQueueClosed(ConnectionError):
+    """The queue was closed, or its writer stopped because the WebSocket failed."""
+
+
+class OutboundQueue:
+    """Ordered, bounded send queue for one WebSocket, drained by its own writer task."""
+
+    def __init__(
+        self,
+        ws: Any,
+        session_id: str,
+        binary_audio: bool = False,
+        max_control_messages: int = DEFAULT_MAX_CONTROL_MESSAGES,
+        max_audio_bytes: int = DEFAULT_MAX_AUDIO_BYTES,
+        max_coalesced_audio_bytes: int = DEFAULT_MAX_COALESCED_AUDIO_BYTES,
+    ):
+        self.ws = ws
+        self.session_id = session_id
+        self.binary_audio = binary_audio
+        self.max_control_messages = max_control_messages
+        self.max_audio_bytes = max_audio_bytes
+        self.max_coalesced_audio_bytes = max_coalesced_audio_bytes
+
+        self._items = deque()  # (kind, payload) in send order
+        self._control_count = 0
+        self._audio_count = 0
+        self._audio_bytes = 0
+        self._audio_sequence = 0
+        self._closed = False
+        self._not_empty = asyncio.Event()
+        self._space = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+        self.stats = dict.fromkeys(_STAT_KEYS, 0)
+
+    @property
+    def depth(self) -> int:
+        return len(self._items)
+
+    def start(self) -> asyncio.Task:
+        """Starts the writer task; the caller should treat its completion as the end of the connection."""
+        if self._writer is None:
+            self._writer = asyncio.get_running_loop().create_task(self._run(), name=f"outbound_writer_{self.session_id}")
+            _active_queues.add(self)
+        return self._writer
+
+    async def put_control(self, message: Union[dict, str]) -> None:
+        """Queues a JSON message (dict) or pre-serialised text; waits while the control backlog is full."""
+        while self._control_count >= self.max_control_messages and not self._closed:
+            self._space.clear()
+            await self._space.wait()
+        self._check_open()
+        self._items.append((_CONTROL, message))
+        self._control_count += 1
+        self.stats["control_enqueued"] += 1
+        self._enqueued()
+
+    def put_audio(self, pcm: bytes) -> None:
+        """Queues a PCM chunk without waiting, dropping the oldest queued audio if over the byte limit."""
+        self._check_open()
+        self._items.append((_AUDIO, pcm))
+        self._audio_count += 1
+        self._audio_bytes += len(pcm)
+        self.stats["audio_enqueued"] += 1
+        while self._audio_bytes > self.max_audio_bytes and self._audio_count > 1:
+            self._drop_oldest_audio()
+        self._enqueued()
+
+    def clear_audio(self) -> int:
+        """Discards every queued audio chunk (control messages stay queued); returns the bytes discarded."""
+        if not self._audio_count:
+            return 0
+        cleared = self._audio_bytes
+        self.stats["audio_cleared"] += self._audio_count
+        self.stats["audio_bytes_cleared"] += cleared
+        self._items = deque(item for item in self._items if item[0] is not _AUDIO)
+        self._audio_count = 0
+        self._audio_bytes = 0
+        return cleared
+
+    async def close(self, timeout: float = DEFAULT_DRAIN_TIMEOUT_SECS) -> None:
+        """Stops accepting messages and waits up to `timeout` for the writer to send what is queued."""
+        self._closed = True
+        self._not_empty.set()
+        self._space.set()
+        if self._writer is None:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(self._writer), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Outbound queue for session {self.session_id} not drained after {timeout}s; "
+                           f"discarding {self.depth} messages.")
+            self._writer.cancel()
+            await asyncio.gather(self._writer, return_exceptions=True)
+        except Exception:
+            pass  # The endpoint reports how the writer task ended
+
+    def snapshot_stats(self) -> dict:
+        return dict(self.stats, session_id=self.session_id, depth=self.depth, buffered_audio_bytes=self._audio_bytes)
+
+    # --- Internals ---
+
+    def _check_open(self) -> None:
+        if self._closed:
+            raise OutboundQueueClosed(f"Outbound queue for session {self.session_id} is closed.")
+
+    def _enqueued(self) -> None:
+        self.stats["max_depth"] = max(self.stats["max_depth"], len(self._items))
+        self._not_empty.set()
+
+    def _drop_oldest_audio(self) -> None:
+        for index, (kind, payload) in enumerate(self._items):
+            if kind is _AUDIO:
+                del self._items[index]
+                self._audio_count -= 1
+                self._audio_bytes -= len(payload)
+                self.stats["audio_dropped"] += 1
+                self.stats["audio_bytes_dropped"] += len(payload)
+                return
+
+    def _take_audio(self, first: bytes) -> bytes:
+        """Merges the audio chunks queued right behind `first` into one frame."""
+        chunks, size = [first], len(first)
+        while self._items and self._items[0][0] is _AUDIO and size + len(self._items[0][1]) <= self.max_coalesced_audio_bytes:
+            chunk = self._items.popleft()[1]
+            self._audio_count -= 1
+            self._audio_bytes -= len(chunk)
+            chunks.append(chunk)
+            size += len(chunk)
+        self.stats["audio_coalesced"] += len(chunks) - 1
+        return first if len(chunks) == 1 else b"".join(chunks)
+
+    async def _send_audio(self, pcm: bytes) -> None:
+        if self.binary_audio:
+            await self.ws.send_bytes(encode_audio_frame(pcm, self._audio_sequence))
+            self._audio_sequence += 1
+        else:
+            await self.ws.send_json({"mime_type": "audio/pcm", "data": base64.b64encode(pcm).decode("ascii")})
+
+    async def _run(self) -> None:
+        try:
+            while True:
+                if not self._items:
+                    if self._closed:
+                        return
+                    self._not_empty.clear()
+                    await self._not_empty.wait()
+                    continue
+                kind, payload = self._items.popleft()
+                if kind is _CONTROL:
+                    self._control_count -= 1
+                    self._space.set()
+                    if isinstance(payload, str):
+                        await self.ws.send_text(payload)
+                    else:
+                        await self.ws.send_json(payload)
+                else:
+                    self._audio_count -= 1
+                    self._audio_bytes -= len(payload)
+                    await self._send_audio(self._take_audio(payload))
+                self.stats["messages_sent"] += 1
+        finally:
+            self._closed = True
+            self._space.set()  # Wake producers so they see the queue is closed
+            _active_queues.discard(self)
+            for key in _finished_totals:
+                if key == "max_depth":
+                    _finished_totals[key] = max(_finished_totals[key], self.stats[key])
+                else:
+                    _finished_totals[key] += self.stats[key]
+
+
+_active_queues: set = set()
+_finished_totals = dict.fromkeys(_STAT_KEYS, 0)
+
+
+def outbound_queue_stats() -> dict:
+    """Process-wide totals (finished and active connections) plus the current depth of each active queue."""
+    sessions = [queue.snapshot_stats() for queue in list(_active_queues)]
+    totals = dict(_finished_totals)
+    for snapshot in sessions:
+        for key in totals:
+            totals[key] = max(totals[key], snapshot[key]) if key == "max_depth" else totals[key] + snapshot[key]
+    return {"active_sessions": len(sessions), "totals": totals, "sessions": sessions}
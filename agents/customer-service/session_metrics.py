@@ -0,0 +1,261 @@
+"""Per-session turn timings and the Prometheus text behind the /metrics endpoint.
+
+Each WebSocket session gets a SessionTimings that the client and agent
+messaging tasks report into:
+
+- client_input(): a user message, or a mic frame the voice activity gate
+  judged voiced. The latest one before the agent answers marks the end of the
+  user's utterance, and the first one after a turn_complete starts the turn.
+- agent_event(): every dispatched live event. The first model output of a turn
+  (text, audio, a command or a function call) gives model_first_token_seconds,
+  the first audio chunk handed to the send queue gives first_audio_out_seconds,
+  both measured from the end of the utterance. Function call and function
+  response events bracket tool_duration_seconds, and turn_complete or
+  interrupted closes turn_duration_seconds.
+
+Every finished turn is also logged as one JSON record ([TIMING <session>]).
+
+Histograms use fixed cumulative buckets and live in this module, like the
+other process-wide counters. Existing stats (send queues, VAD, coalescer,
+tool backend, ...) are registered with register_stats() and exported next to
+them as gauges, so one scrape covers everything.
+"""
+
+import bisect
+import json
+import logging
+import time
+from collections import deque
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = "customer_service"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0, 30.0)
+TURN_BUCKETS = (0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 13.0, 20.0, 30.0, 60.0, 120.0)
+
+_HISTOGRAMS = {
+    "model_first_token_seconds": ("End of the user's input to the first model output of the turn.", LATENCY_BUCKETS),
+    "first_audio_out_seconds": ("End of the user's input to the first agent audio chunk queued for the client.", LATENCY_BUCKETS),
+    "tool_duration_seconds": ("Function call event to its function response event, per tool.", LATENCY_BUCKETS),
+    "turn_duration_seconds": ("First user input of a turn to turn_complete or interrupted.", TURN_BUCKETS),
+}
+_COUNTERS = {
+    "client_inputs_total": "User messages and voiced mic frames received, per kind.",
+    "agent_events_total": "Live events dispatched to the client, per dispatch kind.",
+    "turns_total": "Finished turns, per outcome (complete or interrupted).",
+}
+
+_MODEL_OUTPUT_KINDS = frozenset(("text", "audio", "ui_command"))
+
+
+class Histogram:
+    """Cumulative-bucket histogram of float observations (Prometheus semantics)."""
+
+    def __init__(self, buckets: tuple):
+        self.buckets = tuple(sorted(buckets))
+        self.bucket_counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+_histograms: dict = {name: {} for name in _HISTOGRAMS}  # name -> {label items: Histogram}
+_counters: dict = {name: {} for name in _COUNTERS}  # name -> {label items: count}
+_stats_providers: dict = {}  # group -> (callable returning a stats dict, label name for nested dicts)
+
+
+def observe(name: str, seconds: float, **labels: str) -> None:
+    series = _histograms[name]
+    key = tuple(sorted(labels.items()))
+    histogram = series.get(key)
+    if histogram is None:
+        histogram = series[key] = Histogram(_HISTOGRAMS[name][1])
+    histogram.observe(seconds)
+
+
+def count(name: str, amount: int = 1, **labels: str) -> None:
+    series = _counters[name]
+    key = tuple(sorted(labels.items()))
+    series[key] = series.get(key, 0) + amount
+
+
+def reset() -> None:
+    """Clears all histograms and counters (registered stats providers are kept)."""
+    for series in (*_histograms.values(), *_counters.values()):
+        series.clear()
+
+
+def register_stats(group: str, provider: Callable[[], dict], label: Optional[str] = None) -> None:
+    """Exports provider()'s numeric values as `<prefix>_<group>_<key>` gauges on every scrape.
+
+    Nested dicts become `<group>_<key>_<subkey>`, or, when `label` is given,
+    `<group>_<subkey>{<label>="<key>"}` (e.g. per endpoint or per model).
+    Lists are skipped.
+    """
+    _stats_providers[group] = (provider, label)
+
+
+class SessionTimings:
+    """Turn timing state for one session; see the module docstring."""
+
+    def __init__(self, session_id: str, clock: Callable[[], float] = time.monotonic):
+        self.session_id = session_id
+        self.clock = clock
+        self._turn_started: Optional[float] = None
+        self._input_ended: Optional[float] = None
+        self._first_output: Optional[float] = None
+        self._first_audio: Optional[float] = None
+        self._tool_starts: dict = {}  # tool name -> deque of start times
+        self._tools: list = []  # (tool name, seconds) finished this turn
+        self._events = 0
+        self.last_activity = clock()  # Last user input or agent output, for idle reaping
+        self.turns_finished = 0
+
+    @property
+    def in_turn(self) -> bool:
+        """Whether the user has spoken or the agent is answering and the turn hasn't completed yet."""
+        return self._turn_started is not None or self._first_output is not None
+
+    def client_input(self, kind: str) -> None:
+        count("client_inputs_total", kind=kind)
+        now = self.last_activity = self.clock()
+        if self._first_output is not None:
+            return  # The agent is already answering; this input belongs to a barge-in or the next turn
+        if self._turn_started is None:
+            self._turn_started = now
+        self._input_ended = now
+
+    def agent_event(self, event: Any, kind: str) -> None:
+        count("agent_events_total", kind=kind)
+        now = self.last_activity = self.clock()
+        if kind == "status":
+            if getattr(event, "interrupted", False):
+                self._finish_turn("interrupted")
+            elif getattr(event, "turn_complete", False):
+                self._finish_turn("complete")
+            return
+        self._events += 1
+        function_call, function_response = _function_parts(event)
+        if function_response is not None:
+            self._tool_ended(function_response.name or "unknown", now)
+            return
+        if function_call is None and kind not in _MODEL_OUTPUT_KINDS and not kind.startswith(("action:", "type:")):
+            return
+        if self._first_output is None:
+            self._first_output = now
+            if self._input_ended is not None:
+                observe("model_first_token_seconds", now - self._input_ended)
+        if function_call is not None:
+            self._tool_starts.setdefault(function_call.name or "unknown", deque()).append(now)
+        elif kind == "audio" and self._first_audio is None:
+            self._first_audio = now
+            if self._input_ended is not None:
+                observe("first_audio_out_seconds", now - self._input_ended)
+
+    def _tool_ended(self, name: str, now: float) -> None:
+        starts = self._tool_starts.get(name)
+        if not starts:
+            return
+        seconds = now - starts.popleft()
+        observe("tool_duration_seconds", seconds, tool=name)
+        self._tools.append((name, seconds))
+
+    def _finish_turn(self, outcome: str) -> None:
+        now = self.last_activity
+        count("turns_total", outcome=outcome)
+        self.turns_finished += 1
+        if self._turn_started is not None:
+            observe("turn_duration_seconds", now - self._turn_started)
+        record = {
+            "outcome": outcome,
+            "turn_ms": _ms(now, self._turn_started),
+            "first_token_ms": _ms(self._first_output, self._input_ended),
+            "first_audio_ms": _ms(self._first_audio, self._input_ended),
+            "tools": [{"name": name, "ms": round(seconds * 1000, 1)} for name, seconds in self._tools],
+            "events": self._events,
+        }
+        logger.info(f"[TIMING {self.session_id}] {json.dumps(record)}")
+        self._turn_started = self._input_ended = self._first_output = self._first_audio = None
+        self._tool_starts.clear()
+        self._tools = []
+        self._events = 0
+
+
+def _function_parts(event: Any) -> tuple:
+    content = getattr(event, "content", None)
+    parts = getattr(content, "parts", None)
+    if not parts:
+        return None, None
+    return getattr(parts[0], "function_call", None), getattr(parts[0], "function_response", None)
+
+
+def _ms(end: Optional[float], start: Optional[float]) -> Optional[float]:
+    return round((end - start) * 1000, 1) if end is not None and start is not None else None
+
+
+# --- Prometheus text exposition ---
+
+def _labels(items, extra: tuple = ()) -> str:
+    pairs = list(items) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _stats_samples(name: str, stats: dict, label: Optional[str], labels: tuple = ()):
+    for key, value in stats.items():
+        if isinstance(value, bool):
+            yield f"{name}_{key}", labels, int(value)
+        elif isinstance(value, (int, float)):
+            yield f"{name}_{key}", labels, value
+        elif isinstance(value, dict):
+            if label is not None and not labels:
+                yield from _stats_samples(name, value, None, ((label, key),))
+            else:
+                yield from _stats_samples(f"{name}_{key}", value, label, labels)
+
+
+def render_metrics() -> str:
+    """All histograms, counters and registered stats in the Prometheus text format."""
+    lines = []
+    for name, (help_text, buckets) in _HISTOGRAMS.items():
+        full_name = f"{METRIC_PREFIX}_{name}"
+        lines += [f"# HELP {full_name} {help_text}", f"# TYPE {full_name} histogram"]
+        for key, histogram in sorted(_histograms[name].items()):
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets + (float("inf"),), histogram.bucket_counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                lines.append(f"{full_name}_bucket{_labels(key, (('le', le),))} {cumulative}")
+            lines.append(f"{full_name}_sum{_labels(key)} {_number(histogram.sum)}")
+            lines.append(f"{full_name}_count{_labels(key)} {histogram.count}")
+    for name, help_text in _COUNTERS.items():
+        full_name = f"{METRIC_PREFIX}_{name}"
+        lines += [f"# HELP {full_name} {help_text}", f"# TYPE {full_name} counter"]
+        for key, value in sorted(_counters[name].items()):
+            lines.append(f"{full_name}{_labels(key)} {value}")
+    for group, (provider, label) in _stats_providers.items():
+        try:
+            stats = provider()
+        except Exception as e:  # One broken provider shouldn't fail the whole scrape
+            logger.warning(f"Stats provider '{group}' failed: {e}")
+            continue
+        families = {}  # Samples of one metric must be contiguous; labelled stats arrive grouped by label
+        for name, labels, value in _stats_samples(f"{METRIC_PREFIX}_{group}", stats, label):
+            families.setdefault(name, []).append(f"{name}{_labels(labels)} {_number(value)}")
+        for name, samples in families.items():
+            lines.append(f"# TYPE {name} gauge")
+            lines += samples
+    return "\n".join(lines) + "\n"
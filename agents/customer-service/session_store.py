@@ -0,0 +1,350 @@
+"""Durable ADK session service for the streaming server (SQLite, batched writes).
+
+Sessions used to live in a per-connection InMemorySessionService, so a
+reconnect started from scratch. SqliteSessionService keeps every session in
+one SQLite file: a client that reconnects with its session's id gets its
+state and recent history back. The streaming server issues those ids as
+random resume tokens, so a client cannot open a conversation it wasn't given.
+
+- Writes are batched. append_event only updates memory and queues the event;
+  a background task (or a full batch) writes queued events and the latest
+  state of each dirty session in one transaction, off the event loop.
+- Memory is bounded. At most `max_cached_sessions` sessions stay in an LRU
+  cache (the rest are reloaded from disk on demand), and each cached session
+  keeps only its last `max_events_in_memory` events (older ones stay on disk).
+- Disk is bounded too. Sessions not updated for `retention_secs` are deleted
+  with their events by purge_expired(), which start_retention_sweep() runs
+  periodically. Sessions still in the cache are kept.
+- `app:`/`user:` scoped state is stored per session, not shared between
+  sessions; this agent doesn't use scoped state.
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Optional
+
+from google.adk.events import Event
+from google.adk.sessions import Session, State
+from google.adk.sessions.base_session_service import (
+    BaseSessionService,
+    GetSessionConfig,
+    ListSessionsResponse,
+)
+
+try:
+    from google.adk.errors.already_exists_error import AlreadyExistsError
+except ImportError:  # Older ADK releases
+    AlreadyExistsError = ValueError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CACHED_SESSIONS = 256
+DEFAULT_MAX_EVENTS_IN_MEMORY = 500
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_FLUSH_INTERVAL_SECS = 0.5
+DEFAULT_RETENTION_SECS = 30 * 24 * 3600.0
+DEFAULT_SWEEP_INTERVAL_SECS = 3600.0
+
+SESSION_STORE_DDL = (
+    '''
+    CREATE TABLE IF NOT EXISTS sessions (
+        app_name TEXT NOT NULL,
+        user_id TEXT NOT NULL,
+        session_id TEXT NOT NULL,
+        state TEXT NOT NULL,                  -- JSON object
+        last_update_time REAL NOT NULL,
+        PRIMARY KEY (app_name, user_id, session_id)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS session_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        app_name TEXT NOT NULL,
+        user_id TEXT NOT NULL,
+        session_id TEXT NOT NULL,
+        event TEXT NOT NULL                   -- Event.model_dump_json()
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_session_events_session ON session_events (app_name, user_id, session_id, id)",
+    "CREATE INDEX IF NOT EXISTS idx_sessions_last_update ON sessions (last_update_time)",
+)
+
+_UPSERT_SESSION_SQL = (
+    "INSERT INTO sessions (app_name, user_id, session_id, state, last_update_time) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT(app_name, user_id, session_id) DO UPDATE SET "
+    "state = excluded.state, last_update_time = excluded.last_update_time"
+)
+_INSERT_EVENT_SQL = "INSERT INTO session_events (app_name, user_id, session_id, event) VALUES (?, ?, ?, ?)"
+_DELETE_SESSION_SQL = "DELETE FROM sessions WHERE app_name = ? AND user_id = ? AND session_id = ?"
+_DELETE_EVENTS_SQL = "DELETE FROM session_events WHERE app_name = ? AND user_id = ? AND session_id = ?"
+
+
+def _filter_events(events: list, config: Optional[GetSessionConfig]) -> list:
+    """Applies GetSessionConfig the same way InMemorySessionService does."""
+    if not config:
+        return events
+    if config.num_recent_events is not None:
+        events = events[-config.num_recent_events:] if config.num_recent_events else []
+    if config.after_timestamp is not None:
+        events = [event for event in events if event.timestamp >= config.after_timestamp]
+    return events
+
+
+class SqliteSessionService(BaseSessionService):
+    """ADK session service persisted to SQLite, with batched writes and a bounded cache."""
+
+    def __init__(
+        self,
+        db_path: str,
+        max_cached_sessions: int = DEFAULT_MAX_CACHED_SESSIONS,
+        max_events_in_memory: int = DEFAULT_MAX_EVENTS_IN_MEMORY,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        flush_interval_secs: float = DEFAULT_FLUSH_INTERVAL_SECS,
+        retention_secs: float = DEFAULT_RETENTION_SECS,
+    ):
+        self.db_path = db_path
+        self.max_cached_sessions = max_cached_sessions
+        self.max_events_in_memory = max_events_in_memory
+        self.batch_size = batch_size
+        self.flush_interval_secs = flush_interval_secs
+        self.retention_secs = retention_secs  # 0 keeps sessions forever
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in SESSION_STORE_DDL:
+            self._conn.execute(statement)
+        self._conn.commit()
+        self._db_lock = threading.Lock()  # The connection is used from worker threads
+
+        self._cache = OrderedDict()  # (app_name, user_id, session_id) -> Session
+        self._dirty = {}  # key -> Session whose state must be written
+        self._pending_events = []  # (key, event_json), in append order
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._sweeper: Optional[asyncio.Task] = None
+        self.stats = {
+            "cache_hits": 0, "disk_loads": 0, "evictions": 0, "flushes": 0, "events_written": 0, "sessions_expired": 0,
+        }
+
+    # --- BaseSessionService ---
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        session_id = session_id.strip() if session_id and session_id.strip() else str(uuid.uuid4())
+        if await self.get_session(app_name=app_name, user_id=user_id, session_id=session_id) is not None:
+            raise AlreadyExistsError(f"Session with id {session_id} already exists.")
+        session = Session(
+            app_name=app_name, user_id=user_id, id=session_id,
+            state=dict(state or {}), last_update_time=time.time(),
+        )
+        key = (app_name, user_id, session_id)
+        self._cache_put(key, session)
+        self._dirty[key] = session
+        self._schedule_flush()
+        return session
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        key = (app_name, user_id, session_id)
+        session = self._cache.get(key)
+        if session is not None:
+            self._cache.move_to_end(key)
+            self.stats["cache_hits"] += 1
+        else:
+            if self._pending_events or self._dirty:
+                await self.flush()  # An evicted session may still have queued writes
+            session = await asyncio.to_thread(self._load_session, key)
+            if session is None:
+                return None
+            self.stats["disk_loads"] += 1
+            self._cache_put(key, session)
+        events = _filter_events(session.events, config)
+        if events is session.events:
+            return session
+        return session.model_copy(update={"events": events})
+
+    async def list_sessions(self, *, app_name: str, user_id: Optional[str] = None) -> ListSessionsResponse:
+        await self.flush()
+
+        def query():
+            sql = "SELECT user_id, session_id, state, last_update_time FROM sessions WHERE app_name = ?"
+            params = [app_name]
+            if user_id is not None:
+                sql += " AND user_id = ?"
+                params.append(user_id)
+            with self._db_lock:
+                return self._conn.execute(sql + " ORDER BY last_update_time", params).fetchall()
+
+        rows = await asyncio.to_thread(query)
+        return ListSessionsResponse(sessions=[
+            Session(app_name=app_name, user_id=row_user, id=row_session, state=json.loads(state), last_update_time=updated)
+            for row_user, row_session, state, updated in rows
+        ])
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        key = (app_name, user_id, session_id)
+        self._cache.pop(key, None)
+        await self.flush()
+
+        await asyncio.to_thread(self._delete_sessions, [key])
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        event = await super().append_event(session=session, event=event)
+        if event.partial:
+            return event
+        session.last_update_time = event.timestamp
+        if len(session.events) > self.max_events_in_memory:
+            del session.events[:-self.max_events_in_memory]  # Older events stay on disk
+
+        key = (session.app_name, session.user_id, session.id)
+        self._cache_put(key, session)  # The caller's object is the most recent copy
+        self._dirty[key] = session
+        self._pending_events.append((key, event.model_dump_json(exclude_none=True)))
+        if len(self._pending_events) >= self.batch_size:
+            await self.flush()
+        else:
+            self._schedule_flush()
+        return event
+
+    async def flush(self) -> None:
+        """Writes all queued events and dirty session states in one transaction."""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            if not self._pending_events and not self._dirty:
+                return
+            events, self._pending_events = self._pending_events, []
+            dirty, self._dirty = self._dirty, {}
+            # Serialise on the loop thread so sessions aren't read while being mutated.
+            session_rows = [
+                (*key, json.dumps({k: v for k, v in session.state.items() if not k.startswith(State.TEMP_PREFIX)},
+                                  default=str), session.last_update_time)
+                for key, session in dirty.items()
+            ]
+            event_rows = [(*key, event_json) for key, event_json in events]
+            try:
+                await asyncio.to_thread(self._write_batch, session_rows, event_rows)
+            except Exception:
+                # Requeue so nothing is lost; newer appends stay after the failed batch.
+                self._pending_events[:0] = events
+                self._dirty = {**dirty, **self._dirty}
+                raise
+            self.stats["flushes"] += 1
+            self.stats["events_written"] += len(event_rows)
+
+    async def purge_expired(self, now: Optional[float] = None) -> int:
+        """Deletes sessions not updated for `retention_secs`, except cached ones; returns how many."""
+        if not self.retention_secs:
+            return 0
+        await self.flush()
+        cutoff = (time.time() if now is None else now) - self.retention_secs
+
+        def query():
+            with self._db_lock:
+                return self._conn.execute(
+                    "SELECT app_name, user_id, session_id FROM sessions WHERE last_update_time < ?", (cutoff,)
+                ).fetchall()
+
+        expired = [key for key in await asyncio.to_thread(query) if key not in self._cache]
+        if expired:
+            await asyncio.to_thread(self._delete_sessions, expired)
+            self.stats["sessions_expired"] += len(expired)
+            logger.info(f"Deleted {len(expired)} sessions idle for over {self.retention_secs / 86400:.0f} days.")
+        return len(expired)
+
+    def start_retention_sweep(self, interval_secs: float = DEFAULT_SWEEP_INTERVAL_SECS) -> None:
+        if self.retention_secs and self._sweeper is None:
+            self._sweeper = asyncio.get_running_loop().create_task(self._sweep_loop(interval_secs))
+
+    async def close(self) -> None:
+        """Stops the background tasks, writes everything queued and closes the database."""
+        for task in (self._flusher, self._sweeper):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._sweeper = None
+        await self.flush()
+        with self._db_lock:
+            self._conn.close()
+
+    def snapshot_stats(self) -> dict:
+        return dict(self.stats, cached_sessions=len(self._cache), pending_events=len(self._pending_events))
+
+    # --- Internals ---
+
+    def _cache_put(self, key: tuple, session: Session) -> None:
+        self._cache[key] = session
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_cached_sessions:
+            self._cache.popitem(last=False)  # Pending writes keep their own reference
+            self.stats["evictions"] += 1
+
+    def _schedule_flush(self) -> None:
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._delayed_flush())
+
+    async def _delayed_flush(self) -> None:
+        await asyncio.sleep(self.flush_interval_secs)
+        try:
+            await self.flush()
+        except Exception as e:  # Keep the queue; the next append or flush retries
+            logger.error(f"Failed to flush session store {self.db_path}: {e}", exc_info=True)
+
+    async def _sweep_loop(self, interval_secs: float) -> None:
+        while True:
+            try:
+                await self.purge_expired()
+            except Exception as e:  # Retry on the next tick
+                logger.error(f"Failed to purge expired sessions from {self.db_path}: {e}", exc_info=True)
+            await asyncio.sleep(interval_secs)
+
+    def _delete_sessions(self, keys: list) -> None:
+        with self._db_lock, self._conn:
+            self._conn.executemany(_DELETE_SESSION_SQL, keys)
+            self._conn.executemany(_DELETE_EVENTS_SQL, keys)
+
+    def _write_batch(self, session_rows: list, event_rows: list) -> None:
+        with self._db_lock, self._conn:
+            self._conn.executemany(_UPSERT_SESSION_SQL, session_rows)
+            self._conn.executemany(_INSERT_EVENT_SQL, event_rows)
+
+    def _load_session(self, key: tuple) -> Optional[Session]:
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT state, last_update_time FROM sessions WHERE app_name = ? AND user_id = ? AND session_id = ?", key
+            ).fetchone()
+            if row is None:
+                return None
+            event_rows = self._conn.execute(
+                "SELECT event FROM session_events WHERE app_name = ? AND user_id = ? AND session_id = ? "
+                "ORDER BY id DESC LIMIT ?",
+                (*key, self.max_events_in_memory),
+            ).fetchall()
+        app_name, user_id, session_id = key
+        return Session(
+            app_name=app_name, user_id=user_id, id=session_id,
+            state=json.loads(row[0]), last_update_time=row[1],
+            events=[Event.model_validate_json(event_json) for (event_json,) in reversed(event_rows)],
+        )
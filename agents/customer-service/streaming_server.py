@@ -2,11 +2,15 @@ import asyncio
 import logging
 import os
 import base64 
+import secrets
+import signal
+import threading
 import json
-from typing import Optional, TYPE_CHECKING
+from typing import Optional
 
 from dotenv import load_dotenv
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.websockets import WebSocketState
 
@@ -22,15 +26,11 @@ logging.getLogger("google.auth").setLevel(logging.WARNING)
 logging.getLogger("urllib3").setLevel(logging.WARNING)
 
 # Updated ADK Imports
-from google.adk.sessions import InMemorySessionService, Session as ADKSessionType
+from google.adk.sessions import Session as ADKSessionType
 from google.adk.runners import Runner
 from google.adk.agents.run_config import RunConfig
 from google.adk.agents import LiveRequestQueue
 
-if TYPE_CHECKING:
-    # Import for type-hinting only to satisfy Pylance
-    from google.genai.types import Part as _PartType
-
 try:
     from google.genai.types import Content, Part, Blob
     logger.info("Successfully imported Content, Part, and Blob from google.genai.types.")
@@ -75,6 +75,159 @@ except Exception as e:
 
 app = FastAPI()
 
+from admission import CLOSE_DRAINING, AdmissionRejected, SessionAdmission, SessionLease
+from audio_coalescer import MicAudioCoalescer, audio_coalescer_stats
+from audio_frames import BINARY_AUDIO_SUBPROTOCOL, FrameError, decode_audio_frame, negotiate_subprotocol
+from event_dispatch import dispatcher as event_dispatcher
+from image_preprocessing import image_preprocessor
+from mock_live_runner import MockLiveRunner
+from outbound_queue import OutboundQueue, OutboundQueueClosed, outbound_queue_stats
+from session_metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, SessionTimings, register_stats, render_metrics
+from session_store import SqliteSessionService
+from voice_activity import VoiceActivityGate, voice_activity_stats
+
+# One durable session service for the whole process (see session_store.py). A new conversation is stored under a
+# random resume token sent to the client; reconnecting with ?resume_token= resumes it. Conversations not updated for
+# SESSION_RETENTION_DAYS are deleted (0 keeps them forever).
+SESSION_DB_PATH = os.environ.get("SESSION_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "sessions.db"))
+session_service = SqliteSessionService(
+    SESSION_DB_PATH, retention_secs=float(os.environ.get("SESSION_RETENTION_DAYS", "30")) * 86400,
+)
+
+# Threshold to filter out very short audio packets (e.g., mic pops)
+MIN_AUDIO_BYTES_THRESHOLD = 640  # Approx 20ms of 16kHz 16-bit mono audio
+# Suppress silent mic audio before send_realtime (see voice_activity.py); MIC_VAD_ENABLED=0 forwards everything.
+MIC_VAD_ENABLED = os.environ.get("MIC_VAD_ENABLED", "1") != "0"
+# Mic packets are packed into frames of this duration (40-100 ms) before send_realtime (see audio_coalescer.py).
+MIC_AUDIO_FRAME_MS = int(os.environ.get("MIC_AUDIO_FRAME_MS", "100"))
+# LIVE_RUNNER=mock drives sessions with scripted events instead of Gemini Live (see mock_live_runner.py).
+LIVE_RUNNER = os.environ.get("LIVE_RUNNER", "adk")
+# Live sessions per worker, how many more may wait for a slot and for how long, and when an idle session, or one
+# stuck mid-turn with no events, is closed (see admission.py); 0 disables the limit or that timeout. On SIGTERM/SIGINT, open sessions get
+# SHUTDOWN_DRAIN_TIMEOUT_SECS to finish their current turn before the worker exits.
+session_admission = SessionAdmission(
+    max_sessions=int(os.environ.get("MAX_CONCURRENT_SESSIONS", "100")),
+    max_waiting=int(os.environ.get("SESSION_QUEUE_SIZE", "20")),
+    wait_timeout_secs=float(os.environ.get("SESSION_QUEUE_TIMEOUT_SECS", "10")),
+    idle_timeout_secs=float(os.environ.get("SESSION_IDLE_TIMEOUT_SECS", "300")),
+    stuck_turn_timeout_secs=float(os.environ.get("SESSION_STUCK_TURN_TIMEOUT_SECS", "120")),
+)
+SHUTDOWN_DRAIN_TIMEOUT_SECS = float(os.environ.get("SHUTDOWN_DRAIN_TIMEOUT_SECS", "30"))
+
+
+async def _drain_then_pass_on(signum: int, previous_handler) -> None:
+    try:
+        await session_admission.drain(SHUTDOWN_DRAIN_TIMEOUT_SECS)
+    finally:
+        _pass_on_signal(signum, previous_handler)
+
+
+def _pass_on_signal(signum: int, previous_handler) -> None:
+    signal.signal(signum, previous_handler)
+    signal.raise_signal(signum)
+
+
+@app.on_event("startup")
+async def start_session_admission():
+    """Starts the idle session reaper and drains live sessions on SIGTERM/SIGINT.
+
+    Uvicorn closes every WebSocket as soon as it starts shutting down, before
+    shutdown handlers run, so the drain hooks the signal instead: it runs first
+    and then hands the signal to the server's own handler. A second signal
+    skips the drain.
+    """
+    session_admission.start_reaper()
+    session_service.start_retention_sweep()
+    if threading.current_thread() is not threading.main_thread():
+        return  # Signal handlers can only be installed from the main thread (not the case under TestClient)
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        previous_handler = signal.getsignal(signum)
+        if previous_handler in (signal.SIG_IGN, None):
+            continue
+
+        def on_signal(received, frame, previous_handler=previous_handler):
+            if session_admission.draining:
+                _pass_on_signal(received, previous_handler)
+                return
+            session_admission.draining = True
+            loop.call_soon_threadsafe(asyncio.ensure_future, _drain_then_pass_on(received, previous_handler))
+
+        signal.signal(signum, on_signal)
+
+
+@app.on_event("shutdown")
+async def stop_session_reaper():
+    await session_admission.stop_reaper()
+
+
+@app.on_event("shutdown")
+async def close_tool_http_client():
+    """Closes the shared HTTP clients used by the agent's backend tools."""
+    try:
+        from customer_service.tools.backend_client import close_async_client, close_session
+    except ImportError:
+        return
+    await close_async_client()
+    close_session()
+
+
+@app.on_event("shutdown")
+async def close_customer_repository():
+    """Closes the customer profile database connections."""
+    try:
+        from customer_service.entities.customer_repository import close_customer_repository as close_repository
+    except ImportError:
+        return
+    close_repository()
+
+
+@app.on_event("shutdown")
+async def stop_image_preprocessor():
+    """Stops the worker threads that downscale uploaded images."""
+    image_preprocessor.shutdown()
+
+
+@app.on_event("shutdown")
+async def close_session_store():
+    """Writes queued session events and closes the session database."""
+    await session_service.close()
+
+
+def _tool_backend_snapshot() -> dict:
+    from customer_service.tools.backend_client import metrics
+    return metrics.snapshot()
+
+
+def _rate_limiter_snapshot() -> dict:
+    from customer_service.shared_libraries.callbacks import model_rate_limiter
+    return model_rate_limiter.snapshot_stats()
+
+
+# Exported as gauges on /metrics next to the turn timing histograms (see session_metrics.py).
+register_stats("tool_backend", _tool_backend_snapshot, label="endpoint")
+register_stats("rate_limiter", _rate_limiter_snapshot, label="model")
+register_stats("outbound_queue", outbound_queue_stats)
+register_stats("voice_activity", lambda: dict(voice_activity_stats(), enabled=MIC_VAD_ENABLED))
+register_stats("mic_audio", audio_coalescer_stats)
+register_stats("image_preprocessing", image_preprocessor.snapshot_stats)
+register_stats("session_store", session_service.snapshot_stats)
+register_stats("admission", session_admission.snapshot_stats)
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Turn timing histograms and the stats registered above, in the Prometheus text format."""
+    return PlainTextResponse(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
+
+
+
+
+
+
+
 origins = [
     "http://localhost:5000", "http://127.0.0.1:5000",
     "http://localhost:3000", "http://127.0.0.1:3000",
@@ -85,24 +238,40 @@ app.add_middleware(
     allow_methods=["*"], allow_headers=["*"],
 )
 
-async def start_agent_session(session_id: str, is_audio: bool):
-    logger.info(f"[DIAG_LOG] start_agent_session called for session_id: {session_id}, is_audio: {is_audio}")
-    if not CUSTOMER_SERVICE_AGENT_LOADED or customer_service_agent is None:
+async def start_agent_session(session_id: str, is_audio: bool, lease: SessionLease, resume_token: Optional[str] = None,
+                              customer_id: Optional[str] = None):
+    """Starts the live runner on the stored conversation `resume_token` names, or on a new one.
+
+    A new conversation is created for `customer_id`, whose profile the agent's
+    callbacks then load; one stored for a different customer is not resumed.
+    Returns the live events, the request queue and the conversation's resume
+    token. `lease` is attached to the conversation first, so a second socket
+    resuming it replaces this one instead of sharing its Session.
+    """
+    logger.info(f"[DIAG_LOG] start_agent_session called for session_id: {session_id}, is_audio: {is_audio}, resuming: {bool(resume_token)}")
+    if LIVE_RUNNER != "mock" and (not CUSTOMER_SERVICE_AGENT_LOADED or customer_service_agent is None):
         logger.error(f"[DIAG_LOG] customer_service_agent is not loaded. Cannot start runner for session_id: {session_id}.")
         raise RuntimeError("Customer service agent could not be loaded.")
 
-    session_service = InMemorySessionService()
     app_name_str = "cymbal_home_garden_streaming_chat"
     user_id_str = f"user_{session_id}"
     
-    logger.info(f"[DIAG_LOG] Attempting to get/create session for session_id: {session_id}")
-    session_obj: ADKSessionType = session_service.get_session(
-        app_name=app_name_str, user_id=user_id_str, session_id=session_id
-    )
+    session_obj: Optional[ADKSessionType] = None
+    if resume_token:
+        await session_admission.claim(lease, resume_token)
+        session_obj = await session_service.get_session(
+            app_name=app_name_str, user_id=user_id_str, session_id=resume_token
+        )
+        if session_obj and customer_id and session_obj.state.get("customer_id") != customer_id:
+            logger.warning(f"[DIAG_LOG] Stored conversation for session_id: {session_id} belongs to another customer; not resuming it.")
+            session_obj = None
     if not session_obj:
-        logger.info(f"[DIAG_LOG] No existing session found for session_id: {session_id}. Creating new one.")
-        session_obj = session_service.create_session(
-            app_name=app_name_str, user_id=user_id_str, session_id=session_id
+        logger.info(f"[DIAG_LOG] No stored conversation to resume for session_id: {session_id}. Creating new one.")
+        resume_token = secrets.token_urlsafe(24)  # The stored session's id; only this client learns it
+        await session_admission.claim(lease, resume_token)
+        session_obj = await session_service.create_session(
+            app_name=app_name_str, user_id=user_id_str, session_id=resume_token,
+            state={"customer_id": customer_id} if customer_id else None,
         )
         if session_obj:
             logger.info(f"[DIAG_LOG] New session created for session_id: {session_id}, session_obj_id: {id(session_obj)}")
@@ -110,13 +279,14 @@ async def start_agent_session(session_id: str, is_audio: bool):
             logger.error(f"[DIAG_LOG] Critical error: Failed to create session for {session_id}")
             raise RuntimeError(f"Session object is None after creation attempt for {session_id}")
     else:
-        logger.info(f"[DIAG_LOG] Existing session retrieved for session_id: {session_id}, session_obj_id: {id(session_obj)}")
+        logger.info(f"[DIAG_LOG] Resuming existing session for session_id: {session_id} ({len(session_obj.events)} events), session_obj_id: {id(session_obj)}")
 
     if not session_obj: # Should be redundant due to checks above, but as a safeguard
         logger.error(f"[DIAG_LOG] Critical error: session_obj is None for {session_id} before runner init.")
         raise RuntimeError(f"Session object is None for {session_id}")
 
-    runner = Runner(agent=customer_service_agent, app_name=app_name_str, session_service=session_service)
+    runner_class = MockLiveRunner if LIVE_RUNNER == "mock" else Runner
+    runner = runner_class(agent=customer_service_agent, app_name=app_name_str, session_service=session_service)
     live_request_queue = LiveRequestQueue()
     logger.info(f"[DIAG_LOG] Created LiveRequestQueue for session_id: {session_id}, queue_id: {id(live_request_queue)}")
     
@@ -132,263 +302,21 @@ async def start_agent_session(session_id: str, is_audio: bool):
     )
     logger.info(f"[DIAG_LOG] runner.run_live completed for session_id: {session_id}, live_events_iterator_id: {id(live_events)}")
     logger.info(f"[DIAG_LOG] start_agent_session completed successfully for session_id: {session_id}")
-    return live_events, live_request_queue
+    return live_events, live_request_queue, resume_token
 
 # Rewritten agent_to_client_messaging based on ADK documentation
-async def agent_to_client_messaging(ws: WebSocket, events_iter: any, session_id: str):
-    logger.info(f"[DIAG_LOG S2C] Start agent_to_client_messaging for session: {session_id}, events_iter_id: {id(events_iter)}")
+async def agent_to_client_messaging(outbound: OutboundQueue, events_iter: any, session_id: str,
+                                    timings: Optional[SessionTimings] = None):
+    # Sends go through the session's OutboundQueue so a slow client never stalls this loop (see outbound_queue.py);
+    # what each event turns into is decided by the handler registry in event_dispatch.py.
+    logger.info(f"[DIAG_LOG S2C] Start agent_to_client_messaging for session: {session_id}, events_iter_id: {id(events_iter)}, binary_audio: {outbound.binary_audio}")
     try:
         async for agent_event in events_iter:
-            event_type_str = f"type: {type(agent_event).__name__}"
-            # logger.info(f"[DIAG_LOG S2C {session_id}] Received agent_event ({event_type_str})")
-
-            is_turn_complete = getattr(agent_event, 'turn_complete', False)
-            is_interrupted = getattr(agent_event, 'interrupted', False)
-            is_interaction_completed = getattr(agent_event, 'interaction_completed', False)
-
-            if is_turn_complete or is_interrupted or is_interaction_completed:
-                status_message = {
-                    "turn_complete": is_turn_complete,
-                    "interrupted": is_interrupted,
-                    "interaction_completed": is_interaction_completed,
-                }
-                logger.info(f"[DIAG_LOG S2C {session_id}] Sending status: {status_message}")
-                await ws.send_json(status_message)
-                continue
-            
-            server_content = getattr(agent_event, 'server_content', None) or getattr(agent_event, 'content', None)
-            if not server_content:
-                logger.info(f"[DIAG_LOG S2C {session_id}] Event has no server_content. Skipping.")
-                continue
-            
-            # --- Start: Preserve existing non-voice command handling ---
-            # Check for theme change instruction (Example of preserving custom logic)
-            theme_action_details = None
-            if isinstance(server_content, dict) and server_content.get("action") == "set_theme":
-                theme_action_details = server_content
-            elif hasattr(server_content, 'parts') and server_content.parts and \
-                 hasattr(server_content.parts[0], 'function_response') and \
-                 hasattr(server_content.parts[0].function_response, 'response') and \
-                 isinstance(server_content.parts[0].function_response.response, dict) and \
-                 server_content.parts[0].function_response.response.get("action") == "set_theme":
-                theme_action_details = server_content.parts[0].function_response.response
-            
-            if theme_action_details:
-                theme_value = theme_action_details.get("theme")
-                if theme_value:
-                    logger.info(f"[DIAG_LOG S2C {session_id}] Handling 'set_theme': {theme_value}")
-                    await ws.send_json({"type": "command", "command_name": "set_theme", "payload": {"theme": theme_value}})
-                    continue
-                else:
-                    logger.warning(f"[DIAG_LOG S2C {session_id}] 'set_theme' action missing value.")
-                    continue
-            
-            # Check for cart refresh instruction
-            cart_refresh_action = None
-            if isinstance(server_content, dict) and server_content.get("action") == "refresh_cart":
-                cart_refresh_action = True
-            elif hasattr(server_content, 'parts') and server_content.parts and \
-                 hasattr(server_content.parts[0], 'function_response') and \
-                 hasattr(server_content.parts[0].function_response, 'response') and \
-                 isinstance(server_content.parts[0].function_response.response, dict) and \
-                 server_content.parts[0].function_response.response.get("action") == "refresh_cart":
-                cart_refresh_action = True
-
-            if cart_refresh_action:
-                logger.info(f"[DIAG_LOG S2C {session_id}] Handling 'refresh_cart'")
-                await ws.send_json({"type": "command", "command_name": "refresh_cart"})
-                continue
+            kind = await event_dispatcher.dispatch(agent_event, outbound, session_id)
+            if timings is not None:
+                timings.agent_event(agent_event, kind)
 
-            # Product recommendations
-            product_recommendation_dict = None
-            if hasattr(server_content, 'parts') and server_content.parts and \
-               hasattr(server_content.parts[0], 'function_response') and \
-               hasattr(server_content.parts[0].function_response, 'response') and \
-               isinstance(server_content.parts[0].function_response.response, dict) and \
-               server_content.parts[0].function_response.response.get("type") == "product_recommendations":
-                product_recommendation_dict = server_content.parts[0].function_response.response
-            elif isinstance(server_content, dict) and server_content.get("type") == "product_recommendations":
-                 product_recommendation_dict = server_content
-            
-            if product_recommendation_dict:
-                logger.info(f"[DIAG_LOG S2C {session_id}] Handling 'product_recommendations'")
-                await ws.send_text(json.dumps(product_recommendation_dict)) # Client expects raw JSON string for this
-                continue
-
-            # Check for generic ui_command
-            # This expects the LLM to output a valid JSON string in part.text
-            # if the content is a ui_command.
-            
-            # New handler for direct tool responses that are UI commands
-            direct_ui_command_payload = None
-            if hasattr(server_content, 'parts') and server_content.parts and \
-               hasattr(server_content.parts[0], 'function_response') and \
-               hasattr(server_content.parts[0].function_response, 'response') and \
-               isinstance(server_content.parts[0].function_response.response, dict):
-                
-                tool_response_dict = server_content.parts[0].function_response.response
-
-                # Handle 'show_checkout_ui' action
-                if tool_response_dict.get("action") == "show_checkout_ui":
-                    cart_data = tool_response_dict.get("cart_data")
-                    if cart_data is not None:
-                        logger.info(f"[DIAG_LOG S2C {session_id}] Handling 'show_checkout_ui'. Cart data present.")
-                        # Ensure agent's speech for this turn is sent before this command.
-                        # The current loop structure processes events one by one.
-                        # If speech parts came before this tool_response part in the stream for the same agent turn, they'd be sent.
-                        # This command is sent when the tool_result event is processed.
-                        await ws.send_json({
-                            "type": "command",
-                            "command_name": "display_checkout_modal",
-                            "data": cart_data
-                        })
-                        logger.info(f"[DIAG_LOG S2C {session_id}] Sent 'display_checkout_modal' command with cart data.")
-                        continue # Command handled, move to next agent_event
-                    else:
-                        logger.warning(f"[DIAG_LOG S2C {session_id}] 'show_checkout_ui' action received, but 'cart_data' is missing or None. Payload: {tool_response_dict}")
-                        # Optionally, send an error or a specific message to the client if cart_data is crucial and missing.
-                        # For now, just log and continue. The client might need to handle missing cart_data gracefully.
-                        continue
-                
-                # Handle new shipping UI actions
-                if tool_response_dict.get("action") == "show_shipping_ui_requested":
-                    logger.info(f"[DIAG_LOG S2C {session_id}] Handling 'show_shipping_ui_requested'.")
-                    await ws.send_json({
-                        "type": "command",
-                        "command_name": "display_shipping_modal"
-                    })
-                    continue
-
-                # Handle new payment UI action
-                if tool_response_dict.get("action") == "show_payment_ui_requested":
-                    logger.info(f"[DIAG_LOG S2C {session_id}] Handling 'show_payment_ui_requested'.")
-                    await ws.send_json({
-                        "type": "command",
-                        "command_name": "display_payment_modal" # Client will listen for this
-                    })
-                    continue
-                
-                action_to_selection_type_map = {
-                    "confirm_ui_home_delivery": "home_delivery",
-                    "confirm_ui_pickup_initiated": "pickup_initiated",
-                    "confirm_ui_pickup_address": "pickup_address"
-                }
-                tool_action = tool_response_dict.get("action")
-                if tool_action in action_to_selection_type_map:
-                    selection_type = action_to_selection_type_map[tool_action]
-                    command_payload = {
-                        "type": "command",
-                        "command_name": "agent_confirm_selection",
-                        "selection_type": selection_type
-                    }
-                    if selection_type == "pickup_address":
-                        command_payload["address_index"] = tool_response_dict.get("address_index")
-                    
-                    # Send speech first if present in tool response
-                    agent_speech = tool_response_dict.get("speak")
-                    if agent_speech:
-                        logger.info(f"[DIAG_LOG S2C {session_id}] Sending agent speech for '{tool_action}': '{agent_speech[:70]}...'")
-                        await ws.send_json({"mime_type": "text/plain", "data": agent_speech})
-
-                    logger.info(f"[DIAG_LOG S2C {session_id}] Handling '{tool_action}'. Sending command: {command_payload}")
-                    await ws.send_json(command_payload)
-                    continue
-
-                if tool_response_dict.get("action") == "no_ui_change_needed":
-                    agent_speech = tool_response_dict.get("speak")
-                    if agent_speech:
-                        logger.info(f"[DIAG_LOG S2C {session_id}] Handling 'no_ui_change_needed'. Sending agent speech: '{agent_speech[:70]}...'")
-                        await ws.send_json({"mime_type": "text/plain", "data": agent_speech})
-                    else:
-                        logger.info(f"[DIAG_LOG S2C {session_id}] Handling 'no_ui_change_needed' but no speech provided.")
-                    continue
-                
-                # Handle 'refresh_cart_and_show_confirmation' action from submit_order_and_clear_cart tool
-                if tool_response_dict.get("action") == "refresh_cart_and_show_confirmation":
-                    logger.info(f"[DIAG_LOG S2C {session_id}] Handling 'refresh_cart_and_show_confirmation'.")
-                    # Send agent speech first if available (e.g., "Order submitted successfully!")
-                    agent_speech_for_confirmation = tool_response_dict.get("message") # Tool returns message from API
-                    order_id_for_confirmation = tool_response_dict.get("order_id")
-                    if agent_speech_for_confirmation:
-                        logger.info(f"[DIAG_LOG S2C {session_id}] Sending agent speech for order confirmation: '{agent_speech_for_confirmation[:70]}...'")
-                        await ws.send_json({"mime_type": "text/plain", "data": agent_speech_for_confirmation})
-                    
-                    # Send command to UI
-                    await ws.send_json({
-                        "type": "command",
-                        "command_name": "order_confirmed_refresh_cart", # Client will listen for this
-                        "data": {"order_id": order_id_for_confirmation, "message": agent_speech_for_confirmation }
-                    })
-                    logger.info(f"[DIAG_LOG S2C {session_id}] Sent 'order_confirmed_refresh_cart' command.")
-                    continue
-
-
-                if tool_response_dict.get("action") == "display_ui" and "ui_element" in tool_response_dict and "payload" in tool_response_dict:
-                    direct_ui_command_payload = {
-                        "type": "ui_command", # Standardize the type for client
-                        "command_name": tool_response_dict.get("ui_element"),
-                        "payload": tool_response_dict.get("payload")
-                    }
-                    log_command_name = direct_ui_command_payload.get('command_name')
-                    logger.info(f"[DIAG_LOG S2C {session_id}] Handling direct 'display_ui' tool response: {log_command_name}")
-                    await ws.send_json(direct_ui_command_payload)
-                    continue # Command handled
-
-            # ADK Documentation style for content parts (text/audio)
-            part: Optional[_PartType] = (
-                server_content.parts[0]
-                if hasattr(server_content, 'parts') and server_content.parts
-                else None
-            )
-            if not part:
-                logger.info(f"[DIAG_LOG S2C {session_id}] No parts in server_content. Skipping.")
-                continue
-
-            # Check for generic ui_command using the correctly defined 'part' (e.g. from LLM text output)
-            ui_command_details_from_text = None
-            if part.text: # Ensure part.text exists before trying to load it
-                try:
-                    potential_command = json.loads(part.text)
-                    if isinstance(potential_command, dict) and potential_command.get("type") == "ui_command":
-                        ui_command_details_from_text = potential_command
-                except json.JSONDecodeError:
-                    # Not a JSON command, or malformed JSON.
-                    # It will be handled by the subsequent text/audio block.
-                    pass
-                except Exception as e:
-                    # Catch any other unexpected errors during parsing or checking
-                    logger.error(f"[DIAG_LOG S2C {session_id}] Error processing ui_command in part.text: {e}", exc_info=True)
-
-            if ui_command_details_from_text:
-                command_name = ui_command_details_from_text.get("command_name", "Unknown UI Command")
-                logger.info(f"[DIAG_LOG S2C {session_id}] Handling 'ui_command' from text: {command_name}")
-                await ws.send_json(ui_command_details_from_text)
-                continue
-            
-            message_to_send = None
-            if part.text:
-                message_to_send = {"mime_type": "text/plain", "data": part.text}
-                logger.info(f"[DIAG_LOG S2C {session_id}] Sending text: '{part.text[:70]}...'")
-            elif part.inline_data and part.inline_data.mime_type == "audio/pcm":
-                audio_data = part.inline_data.data
-                if audio_data:
-                    base64_encoded_audio = base64.b64encode(audio_data).decode("ascii")
-                    message_to_send = {"mime_type": "audio/pcm", "data": base64_encoded_audio}
-                    # logger.info(f"[DIAG_LOG S2C {session_id}] Sending audio/pcm: {len(audio_data)} bytes raw.")
-                else:
-                    logger.info(f"[DIAG_LOG S2C {session_id}] Audio part present but data is empty.")
-            
-            if message_to_send:
-                # DIAGNOSTIC LOG: Log chunks sent from streaming_server.py to WebSocket client (proxy)
-                log_data_summary = str(message_to_send)
-                if len(log_data_summary) > 150: # Avoid overly long logs for audio data
-                    log_data_summary = log_data_summary[:150] + "..."
-                # logger.info(f"[DIAG_LOG S2C {session_id}] SENDING CHUNK TO WS CLIENT (PROXY): {log_data_summary}")
-                await ws.send_json(message_to_send)
-            else:
-                logger.info(f"[DIAG_LOG S2C {session_id}] No text or audio/pcm data in part to send.")
-
-    except WebSocketDisconnect:
+    except (WebSocketDisconnect, OutboundQueueClosed):
         logger.info(f"[DIAG_LOG S2C] WebSocket disconnected for session: {session_id}")
     except asyncio.CancelledError:
         logger.info(f"[DIAG_LOG S2C] Task cancelled for session: {session_id}")
@@ -397,12 +325,48 @@ async def agent_to_client_messaging(ws: WebSocket, events_iter: any, session_id:
     finally:
         logger.info(f"[DIAG_LOG S2C] Agent messaging finished for session: {session_id}")
 
+def send_mic_frame(pcm: bytes, queue_to_agent: LiveRequestQueue, session_id: str, vad_gate: Optional[VoiceActivityGate],
+                   timings: Optional[SessionTimings] = None) -> None:
+    """Forwards a coalesced mic frame to the agent unless it is a lone mic pop or, with the gate enabled, silence."""
+    if len(pcm) < MIN_AUDIO_BYTES_THRESHOLD:  # Full frames are longer; only a short burst flushed on its own gets here
+        logger.info(f"[DIAG_LOG C2S {session_id}] Audio packet too short ({len(pcm)} bytes), below threshold ({MIN_AUDIO_BYTES_THRESHOLD} bytes). Skipping send_realtime.")
+        return
+    chunks = vad_gate.filter(pcm) if vad_gate else (pcm,)
+    for chunk in chunks:
+        queue_to_agent.send_realtime(Blob(data=chunk, mime_type="audio/pcm"))
+    if chunks and timings is not None and (vad_gate is None or vad_gate.voiced):
+        timings.client_input("audio")  # Hangover silence after speech doesn't move the end of the utterance
+
+
+def forward_audio_frame(frame: bytes, coalescer: MicAudioCoalescer, session_id: str) -> None:
+    """Queues the PCM payload of a binary audio frame from the client, in sequence order."""
+    try:
+        audio_frame = decode_audio_frame(frame)
+    except FrameError as e:
+        logger.warning(f"[DIAG_LOG C2S {session_id}] Dropping invalid binary frame: {e}")
+        return
+    coalescer.push(audio_frame.pcm, audio_frame.sequence)
+
+
 # Rewritten client_to_agent_messaging based on ADK documentation
-async def client_to_agent_messaging(ws: WebSocket, queue_to_agent: LiveRequestQueue, session_id: str):
+async def client_to_agent_messaging(ws: WebSocket, queue_to_agent: LiveRequestQueue, session_id: str,
+                                    timings: Optional[SessionTimings] = None):
     logger.info(f"[DIAG_LOG C2S] Start client_to_agent_messaging for session: {session_id}, queue_id: {id(queue_to_agent)}")
+    vad_gate = VoiceActivityGate() if MIC_VAD_ENABLED else None
+    coalescer = MicAudioCoalescer(
+        lambda pcm: send_mic_frame(pcm, queue_to_agent, session_id, vad_gate, timings), frame_ms=MIC_AUDIO_FRAME_MS,
+    )
     try:
         while True:
-            raw_client_message = await ws.receive_text()
+            ws_message = await ws.receive()
+            if ws_message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(ws_message.get("code", 1000))
+            if ws_message.get("bytes") is not None:
+                forward_audio_frame(ws_message["bytes"], coalescer, session_id)
+                continue
+            raw_client_message = ws_message.get("text")
+            if raw_client_message is None:
+                continue
             # Avoid logging full raw_client_message if it's very long (e.g., audio data)
             log_msg_summary = raw_client_message[:200] + ('...' if len(raw_client_message) > 200 else '')
             logger.debug(f"[DIAG_LOG C2S {session_id}] Received raw message (len: {len(raw_client_message)}): '{log_msg_summary}'") # Changed to debug
@@ -433,7 +397,10 @@ async def client_to_agent_messaging(ws: WebSocket, queue_to_agent: LiveRequestQu
                     if part_mime_type.startswith("image/"):
                         try:
                             decoded_bytes = base64.b64decode(part_content_data)
-                            parts_for_adk.append(Part(inline_data=Blob(mime_type=part_mime_type, data=decoded_bytes)))
+                            # Downscaled and stripped of metadata off the event loop (see image_preprocessing.py)
+                            image_bytes, image_mime_type = await image_preprocessor.process(decoded_bytes, part_mime_type)
+                            logger.info(f"[DIAG_LOG C2S {session_id}] Image part {i}: {len(decoded_bytes)} bytes -> {len(image_bytes)} bytes {image_mime_type}.")
+                            parts_for_adk.append(Part(inline_data=Blob(mime_type=image_mime_type, data=image_bytes)))
                         except Exception as e:
                             logger.error(f"[DIAG_LOG C2S {session_id}] Error decoding image part {i}: {e}", exc_info=True)
                             valid_parts_assembly = False; break
@@ -446,6 +413,8 @@ async def client_to_agent_messaging(ws: WebSocket, queue_to_agent: LiveRequestQu
                     adk_content_obj = Content(role="user", parts=parts_for_adk)
                     logger.info(f"[DIAG_LOG C2S {session_id}] Sending {len(parts_for_adk)} parts to agent queue.")
                     queue_to_agent.send_content(content=adk_content_obj)
+                    if timings is not None:
+                        timings.client_input("parts")
                 elif not valid_parts_assembly:
                     logger.warning(f"[DIAG_LOG C2S {session_id}] Not sending to agent due to invalid parts.")
                 else: # valid_parts_assembly is true, but parts_for_adk is empty
@@ -468,26 +437,26 @@ async def client_to_agent_messaging(ws: WebSocket, queue_to_agent: LiveRequestQu
                     content = Content(role="user", parts=[Part.from_text(text=text_data)])
                     logger.info(f"[DIAG_LOG C2S {session_id}] Sending text (fallback) to agent: '{text_data[:70]}...'")
                     queue_to_agent.send_content(content=content)
+                    if timings is not None:
+                        timings.client_input("text")
                 elif mime_type == "audio/pcm":
                     try:
                         decoded_audio_bytes = base64.b64decode(str(data))
-                        # Threshold to filter out very short audio packets (e.g., mic pops)
-                        MIN_AUDIO_BYTES_THRESHOLD = 640  # Approx 20ms of 16kHz 16-bit mono audio
-                        if len(decoded_audio_bytes) < MIN_AUDIO_BYTES_THRESHOLD:
-                            logger.info(f"[DIAG_LOG C2S {session_id}] Audio packet too short ({len(decoded_audio_bytes)} bytes), below threshold ({MIN_AUDIO_BYTES_THRESHOLD} bytes). Skipping send_realtime.")
-                            continue
-                        logger.debug(f"[DIAG_LOG C2S {session_id}] Sending audio (fallback) to agent: {len(decoded_audio_bytes)} bytes.") # Changed to debug
-                        queue_to_agent.send_realtime(Blob(data=decoded_audio_bytes, mime_type="audio/pcm"))
+                        logger.debug(f"[DIAG_LOG C2S {session_id}] Received audio (fallback) from client: {len(decoded_audio_bytes)} bytes.") # Changed to debug
+                        coalescer.push(decoded_audio_bytes)
                     except Exception as e:
                         logger.error(f"[DIAG_LOG C2S {session_id}] Error decoding/sending audio (fallback): {e}", exc_info=True)
                         continue
                 elif mime_type.startswith("image/"):
                     try:
                         decoded_image_bytes = base64.b64decode(str(data))
-                        image_blob = Blob(data=decoded_image_bytes, mime_type=mime_type)
+                        image_bytes, image_mime_type = await image_preprocessor.process(decoded_image_bytes, mime_type)
+                        image_blob = Blob(data=image_bytes, mime_type=image_mime_type)
                         content = Content(role="user", parts=[Part(inline_data=image_blob)])
-                        logger.info(f"[DIAG_LOG C2S {session_id}] Sending image (fallback) to agent: {mime_type}, {len(decoded_image_bytes)} bytes.")
+                        logger.info(f"[DIAG_LOG C2S {session_id}] Sending image (fallback) to agent: {image_mime_type}, {len(decoded_image_bytes)} -> {len(image_bytes)} bytes.")
                         queue_to_agent.send_content(content=content)
+                        if timings is not None:
+                            timings.client_input("image")
                     except Exception as e:
                         logger.error(f"[DIAG_LOG C2S {session_id}] Error decoding/sending image (fallback): {e}", exc_info=True)
                         continue
@@ -512,6 +481,8 @@ async def client_to_agent_messaging(ws: WebSocket, queue_to_agent: LiveRequestQu
                 logger.info(f"[DIAG_LOG C2S {session_id}] Sending shipping interaction to agent as text: '{user_text_for_agent}'")
                 content = Content(role="user", parts=[Part.from_text(text=user_text_for_agent)])
                 queue_to_agent.send_content(content=content)
+                if timings is not None:
+                    timings.client_input("ui_event")
             
             else:
                 logger.warning(f"[DIAG_LOG C2S {session_id}] Unknown message structure: {client_message_json}")
@@ -523,16 +494,23 @@ async def client_to_agent_messaging(ws: WebSocket, queue_to_agent: LiveRequestQu
     except Exception as e:
         logger.error(f"[DIAG_LOG C2S] Error in client_to_agent_messaging for session {session_id}: {e}", exc_info=True)
     finally:
+        coalescer.close()
         logger.info(f"[DIAG_LOG C2S] Client messaging finished for session: {session_id}")
 
 
 @app.websocket("/ws/agent_stream/{session_id}")
-async def websocket_endpoint(websocket: WebSocket, session_id: str, is_audio: bool = False):
+async def websocket_endpoint(websocket: WebSocket, session_id: str, is_audio: bool = False,
+                             resume_token: Optional[str] = None, customer_id: Optional[str] = None):
+    # customer_id is the shopper the page is signed in as (the agent falls back to its default customer without one).
     logger.info(f"[DIAG_LOG] WebSocket connection attempt for session_id: {session_id}, is_audio: {is_audio}, client: {websocket.client}")
-    
+    # Audio framing is negotiated in the handshake (see audio_frames.py); clients
+    # that offer no subprotocol keep base64 audio inside JSON text frames.
+    subprotocol = negotiate_subprotocol(websocket.scope.get("subprotocols", []))
+    binary_audio = subprotocol == BINARY_AUDIO_SUBPROTOCOL
+
     try:
-        await websocket.accept()
-        logger.info(f"[DIAG_LOG] WebSocket connection accepted for session_id: {session_id}, is_audio: {is_audio}, client: {websocket.client}")
+        await websocket.accept(subprotocol=subprotocol)
+        logger.info(f"[DIAG_LOG] WebSocket connection accepted for session_id: {session_id}, is_audio: {is_audio}, subprotocol: {subprotocol}, client: {websocket.client}")
     except WebSocketDisconnect:
         logger.warning(f"[DIAG_LOG] WebSocket disconnected before/during accept for session_id: {session_id}, client: {websocket.client}")
         return
@@ -546,30 +524,51 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str, is_audio: bo
                  logger.error(f"[DIAG_LOG] Error closing WebSocket after accept error for session_id: {session_id}: {close_e}", exc_info=True)
         return
 
+    timings = SessionTimings(session_id)
+    try:
+        lease = await session_admission.acquire(session_id, timings)
+    except AdmissionRejected as e:
+        logger.warning(f"[DIAG_LOG] Session {session_id} not admitted ({e.reason}): {e}")
+        try:
+            await websocket.send_json({"error": str(e), "type": "ServerBusy", "reason": e.reason})
+            await websocket.close(code=1013)  # Try again later
+        except Exception:
+            pass
+        return
+
     live_events_iterator = None
     agent_send_queue = None
     agent_task = None
     client_task = None
+    writer_task = None
+    lease_task = None
+    outbound = OutboundQueue(websocket, session_id, binary_audio=binary_audio)
     logger.info(f"[DIAG_LOG] Initialized task variables to None for session_id: {session_id}")
 
     try:
         logger.info(f"[DIAG_LOG] Attempting to start_agent_session for session_id: {session_id}")
-        live_events_iterator, agent_send_queue = await start_agent_session(session_id, is_audio)
+        live_events_iterator, agent_send_queue, resume_token = await start_agent_session(
+            session_id, is_audio, lease, resume_token, customer_id)
         logger.info(f"[DIAG_LOG] start_agent_session successful for session_id: {session_id}. Iterator_id: {id(live_events_iterator)}, Queue_id: {id(agent_send_queue)}")
 
         agent_task_name = f"agent_to_client_{session_id}_{id(live_events_iterator)}"
-        agent_task = asyncio.create_task(agent_to_client_messaging(websocket, live_events_iterator, session_id))
+        writer_task = outbound.start()
+        await outbound.put_control({"type": "session_resume", "resume_token": resume_token})  # For reconnecting
+        agent_task = asyncio.create_task(agent_to_client_messaging(outbound, live_events_iterator, session_id, timings))
         agent_task.set_name(agent_task_name)
         logger.info(f"[DIAG_LOG] Created agent_task: {agent_task_name} for session_id: {session_id}")
         
         client_task_name = f"client_to_agent_{session_id}_{id(agent_send_queue)}"
-        client_task = asyncio.create_task(client_to_agent_messaging(websocket, agent_send_queue, session_id))
+        client_task = asyncio.create_task(client_to_agent_messaging(websocket, agent_send_queue, session_id, timings))
         client_task.set_name(client_task_name)
         logger.info(f"[DIAG_LOG] Created client_task: {client_task_name} for session_id: {session_id}")
 
-        logger.info(f"[DIAG_LOG] Awaiting completion of tasks for session_id: {session_id}: {agent_task_name}, {client_task_name}")
+        # Completes when the idle reaper or a shutdown drain closes the session
+        lease_task = asyncio.create_task(lease.closed.wait(), name=f"lease_{session_id}")
+
+        logger.info(f"[DIAG_LOG] Awaiting completion of tasks for session_id: {session_id}: {agent_task_name}, {client_task_name}, {writer_task.get_name()}")
         done, pending = await asyncio.wait(
-            [agent_task, client_task],
+            [agent_task, client_task, writer_task, lease_task],
             return_when=asyncio.FIRST_COMPLETED,
         )
         logger.info(f"[DIAG_LOG] asyncio.wait completed for session_id: {session_id}. Done tasks: {[t.get_name() for t in done]}. Pending tasks: {[t.get_name() for t in pending]}.")
@@ -586,6 +585,7 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str, is_audio: bo
             except Exception as e:
                 logger.error(f"[DIAG_LOG] Task {task_name} completed with error for session_id: {session_id}: {e}", exc_info=True)
 
+        pending.discard(writer_task)  # Drained by outbound.close() below
         for task_pending in pending:
             task_name = task_pending.get_name()
             logger.info(f"[DIAG_LOG] Cancelling pending task: {task_name} for session_id: {session_id}")
@@ -598,6 +598,11 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str, is_audio: bo
 
     except WebSocketDisconnect:
         logger.info(f"[DIAG_LOG] WebSocket disconnected in main endpoint for session_id: {session_id}, client: {websocket.client}")
+    except AdmissionRejected as e:
+        logger.warning(f"[DIAG_LOG] Session {session_id} could not attach to its conversation ({e.reason}): {e}")
+        if websocket.client_state != WebSocketState.DISCONNECTED:
+            try: await websocket.send_json({"error": str(e), "type": "ServerBusy", "reason": e.reason})
+            except: pass
     except RuntimeError as e:
         logger.error(f"Runtime error in WebSocket endpoint for session {session_id}: {e}", exc_info=True)
         if websocket.client_state != WebSocketState.DISCONNECTED:
@@ -609,24 +614,35 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str, is_audio: bo
             try: await websocket.send_json({"error": "Internal server error.", "type": "ServerError"})
             except: pass
     finally:
-        logger.info(f"Cleaning up WebSocket endpoint for session {session_id}...")
-        tasks_to_clean = [t for t in [agent_task, client_task] if t and not t.done()]
-        for task in tasks_to_clean:
-            if not task.done():
-                logger.info(f"Final cancellation for task {task.get_name()} in session {session_id}")
-                task.cancel()
-        if tasks_to_clean:
-            await asyncio.gather(*tasks_to_clean, return_exceptions=True)
+        try:
+            logger.info(f"Cleaning up WebSocket endpoint for session {session_id}...")
+            tasks_to_clean = [t for t in [agent_task, client_task, lease_task] if t and not t.done()]
+            for task in tasks_to_clean:
+                if not task.done():
+                    logger.info(f"Final cancellation for task {task.get_name()} in session {session_id}")
+                    task.cancel()
+            if tasks_to_clean:
+                await asyncio.gather(*tasks_to_clean, return_exceptions=True)
         
-        if agent_send_queue: # ADK LiveRequestQueue doesn't have an explicit close in examples
-            logger.debug(f"LiveRequestQueue for session {session_id} cleanup considered (managed by ADK runner).")
+            if lease.close_reason is not None:
+                logger.info(f"[DIAG_LOG] Session {session_id} closed by the server: {lease.close_reason}")
+                try:
+                    await outbound.put_control({"type": "session_closed", "reason": lease.close_reason})
+                except OutboundQueueClosed:
+                    pass
+            await outbound.close()  # Sends what the agent already queued before the socket closes
 
-        if websocket.client_state != WebSocketState.DISCONNECTED:
-            logger.info(f"Closing WebSocket connection from server side for session {session_id}.")
-            try:
-                await websocket.close(code=1000) 
-            except Exception as e_close:
-                logger.error(f"Error closing WebSocket for session {session_id} in finally: {e_close}", exc_info=True)
+            if agent_send_queue: # ADK LiveRequestQueue doesn't have an explicit close in examples
+                logger.debug(f"LiveRequestQueue for session {session_id} cleanup considered (managed by ADK runner).")
+
+            if websocket.client_state != WebSocketState.DISCONNECTED:
+                logger.info(f"Closing WebSocket connection from server side for session {session_id}.")
+                try:
+                    await websocket.close(code=1012 if lease.close_reason == CLOSE_DRAINING else 1000)  # 1012: service restart
+                except Exception as e_close:
+                    logger.error(f"Error closing WebSocket for session {session_id} in finally: {e_close}", exc_info=True)
+        finally:
+            session_admission.release(lease)  # Also hands the slot to the next waiting session
         logger.info(f"WebSocket endpoint for session {session_id} fully cleaned up.")
 
 if __name__ == "__main__":
@@ -0,0 +1,157 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import asyncio
+
+import pytest
+
+from admission import CLOSE_DRAINING, CLOSE_IDLE, CLOSE_REPLACED, AdmissionRejected, SessionAdmission
+from session_metrics import SessionTimings
+
+
+class Activity:
+    def __init__(self, last_activity=0.0, in_turn=False):
+        self.last_activity = last_activity
+        self.in_turn = in_turn
+        self.turns_finished = 0
+
+
+@pytest.mark.asyncio
+async def test_sessions_over_the_limit_wait_in_order_or_are_rejected():
+    admission = SessionAdmission(max_sessions=1, max_waiting=2, wait_timeout_secs=5)
+    first = await admission.acquire("a", Activity())
+    second = asyncio.create_task(admission.acquire("b", Activity()))
+    third = asyncio.create_task(admission.acquire("c", Activity()))
+    await asyncio.sleep(0)
+    with pytest.raises(AdmissionRejected) as rejected:
+        await admission.acquire("d", Activity())
+    assert rejected.value.reason == "queue_full"
+    assert not admission.has_capacity
+
+    admission.release(first)
+    lease = await asyncio.wait_for(second, timeout=1)
+    assert lease.session_id == "b" and not third.done()
+    admission.release(lease)
+    assert (await asyncio.wait_for(third, timeout=1)).session_id == "c"
+    stats = admission.snapshot_stats()
+    assert stats["admitted"] == 3 and stats["queued"] == 2 and stats["rejected_queue_full"] == 1
+    assert stats["active"] == 1 and stats["waiting"] == 0
+
+
+@pytest.mark.asyncio
+async def test_wait_timeout_and_cancelled_waiters_give_their_place_back():
+    admission = SessionAdmission(max_sessions=1, max_waiting=1, wait_timeout_secs=0.05)
+    first = await admission.acquire("a", Activity())
+    with pytest.raises(AdmissionRejected) as rejected:
+        await admission.acquire("b", Activity())
+    assert rejected.value.reason == "wait_timeout"
+
+    admission.wait_timeout_secs = 5
+    gone = asyncio.create_task(admission.acquire("c", Activity()))
+    await asyncio.sleep(0)
+    gone.cancel()  # Client disconnected while queued
+    await asyncio.gather(gone, return_exceptions=True)
+    waiting = asyncio.create_task(admission.acquire("d", Activity()))
+    await asyncio.sleep(0)
+    admission.release(first)
+    assert (await asyncio.wait_for(waiting, timeout=1)).session_id == "d"
+    assert admission.snapshot_stats()["active"] == 1
+
+
+@pytest.mark.asyncio
+async def test_idle_sessions_are_reaped_and_turns_get_longer():
+    admission = SessionAdmission(idle_timeout_secs=60, stuck_turn_timeout_secs=300)
+    idle = await admission.acquire("idle", Activity(last_activity=0.0))
+    talking = await admission.acquire("talking", Activity(last_activity=0.0, in_turn=True))
+    recent = await admission.acquire("recent", Activity(last_activity=50.0))
+
+    assert admission.reap_idle(now=100.0) == 1
+    assert idle.closed.is_set() and idle.close_reason == CLOSE_IDLE
+    assert not talking.closed.is_set() and not recent.closed.is_set()
+    assert admission.reap_idle(now=100.0) == 0  # Already asked to close
+    assert admission.reap_idle(now=301.0) == 2  # "recent" has gone idle too
+    assert talking.close_reason == CLOSE_IDLE and admission.snapshot_stats()["reaped_stuck_turn"] == 1
+
+
+@pytest.mark.asyncio
+async def test_unanswered_input_does_not_hold_a_slot_forever():
+    now = [0.0]
+    timings = SessionTimings("s1", clock=lambda: now[0])
+    admission = SessionAdmission(max_sessions=1, max_waiting=0, idle_timeout_secs=300, stuck_turn_timeout_secs=120)
+    lease = await admission.acquire("s1", timings)
+    timings.client_input("audio")  # The model never answers
+    assert timings.in_turn and not admission.has_capacity
+
+    assert admission.reap_idle(now=100.0) == 0
+    assert admission.reap_idle(now=3600.0) == 1
+    assert lease.closed.is_set()
+    admission.release(lease)  # What the WebSocket endpoint does once the lease closes
+    assert admission.has_capacity
+
+
+@pytest.mark.asyncio
+async def test_drain_waits_for_in_flight_turns():
+    admission = SessionAdmission(max_sessions=2, max_waiting=1)
+    between_turns = await admission.acquire("a", Activity())
+    mid_turn_activity = Activity(in_turn=True)
+    mid_turn = await admission.acquire("b", mid_turn_activity)
+    queued = asyncio.create_task(admission.acquire("c", Activity()))
+    await asyncio.sleep(0)
+
+    async def session(lease):
+        await lease.closed.wait()
+        admission.release(lease)
+
+    sessions = [asyncio.create_task(session(between_turns)), asyncio.create_task(session(mid_turn))]
+    drain = asyncio.create_task(admission.drain(timeout_secs=5))
+    await asyncio.sleep(0.15)
+    assert between_turns.close_reason == CLOSE_DRAINING
+    assert not mid_turn.closed.is_set() and not drain.done()
+    with pytest.raises(AdmissionRejected):
+        await queued
+    with pytest.raises(AdmissionRejected):
+        await admission.acquire("d", Activity())
+
+    mid_turn_activity.turns_finished += 1  # turn_complete, and the client starts its next turn at once
+    await asyncio.wait_for(drain, timeout=1)
+    await asyncio.gather(*sessions)
+    stats = admission.snapshot_stats()
+    assert stats["active"] == 0 and stats["closed_by_drain"] == 2 and stats["rejected_draining"] == 2
+
+
+@pytest.mark.asyncio
+async def test_one_lease_per_conversation():
+    admission = SessionAdmission(max_sessions=3)
+    first = await admission.acquire("a", Activity())
+    await admission.claim(first, "conversation")
+
+    async def session(lease):
+        await lease.closed.wait()
+        admission.release(lease)
+
+    first_session = asyncio.create_task(session(first))
+    second = await admission.acquire("a", Activity())
+    await asyncio.wait_for(admission.claim(second, "conversation"), timeout=1)
+    assert first.close_reason == CLOSE_REPLACED and first_session.done()
+    assert admission.snapshot_stats()["claimed"] == 1
+
+    stuck = await admission.acquire("a", Activity())  # The holder never lets go
+    with pytest.raises(AdmissionRejected) as rejected:
+        await admission.claim(stuck, "conversation", timeout_secs=0.05)
+    assert rejected.value.reason == "session_in_use"
+    admission.release(second)
+    admission.release(stuck)
+    stats = admission.snapshot_stats()
+    assert stats["claimed"] == 0 and stats["replaced"] == 2 and stats["rejected_session_in_use"] == 1
@@ -0,0 +1,161 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from customer_service.tools import async_tools, backend_client, tools
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    """Routes the shared async client to an in-process handler; returns the request log."""
+    requests_seen = []
+    routes = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests_seen.append(request)
+        route = routes.get((request.method, request.url.path))
+        if route is None:
+            return httpx.Response(404, json={"error": "Not Found"})
+        return route(request)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(backend_client, "get_async_client", lambda: client)
+    return routes, requests_seen
+
+
+@pytest.mark.asyncio
+async def test_access_cart_information(backend):
+    routes, seen = backend
+    cart = {"items": [{"product_id": "SKU_A", "name": "A", "quantity": 2}], "subtotal": 9.5}
+    routes[("GET", "/api/cart/123")] = lambda request: httpx.Response(200, json=cart)
+
+    assert await async_tools.access_cart_information("123") == cart
+    assert len(seen) == 1
+
+
+@pytest.mark.asyncio
+async def test_modify_cart_fetches_added_item(backend):
+    routes, seen = backend
+    routes[("POST", "/api/cart/modify/123")] = lambda request: httpx.Response(
+        200, json={"status": "success", "items_added": True, "items_removed": False}
+    )
+    routes[("GET", "/api/products/SKU_A")] = lambda request: httpx.Response(
+        200, json={"id": "SKU_A", "name": "Aloe", "image_url": "a.png", "price": 3}
+    )
+
+    result = await async_tools.modify_cart("123", [{"product_id": "SKU_A", "quantity": 1}], [])
+
+    assert json.loads(seen[0].content) == {"items_to_add": [{"product_id": "SKU_A", "quantity": 1}], "items_to_remove": []}
+    assert result == {
+        "action": "refresh_cart",
+        "status": "success",
+        "items_added": True,
+        "items_removed": False,
+        "added_item": {"product_id": "SKU_A", "name": "Aloe", "image_url": "a.png"},
+    }
+
+
+@pytest.mark.asyncio
+async def test_check_product_availability_404_passthrough(backend):
+    routes, _ = backend
+    routes[("GET", "/api/products/availability/SKU_X/pickup")] = lambda request: httpx.Response(
+        404, json={"error": "Product not found for availability check"}
+    )
+
+    result = await async_tools.check_product_availability("SKU_X", "pickup")
+    assert result == {"error": "Product not found for availability check"}
+
+
+@pytest.mark.asyncio
+async def test_recommendations_are_fetched_in_chunks_the_backend_accepts(backend):
+    routes, seen = backend
+
+    def products(request):
+        ids = request.url.params["ids"].split(",")
+        if "SKU_BAD" in ids:
+            return httpx.Response(500, json={"error": "Internal Server Error"})
+        return httpx.Response(200, json=[{"id": product_id, "name": product_id, "price": 1} for product_id in ids])
+
+    routes[("GET", "/api/products")] = products
+    product_ids = [f"SKU_{i}" for i in range(150)] + ["SKU_BAD"]
+    result = await async_tools.get_product_recommendations(product_ids, "123")
+
+    assert sorted(len(request.url.params["ids"].split(",")) for request in seen) == [51, 100]
+    assert [card["id"] for card in result["recommendations"]] == product_ids[:100]
+    assert len(result["errors_fetching_recommendations"]) == 51
+
+
+@pytest.mark.asyncio
+async def test_search_products_renames_recommendations(backend):
+    routes, _ = backend
+    routes[("POST", "/api/retail/search-products")] = lambda request: httpx.Response(
+        200, json={"recommendations": [{"product_id": "SKU_A", "name": "Aloe", "description": "x"}]}
+    )
+
+    result = await async_tools.search_products("aloe", "123")
+    assert result == {"results": [{"product_id": "SKU_A", "name": "Aloe", "description": "x"}]}
+
+
+@pytest.mark.asyncio
+async def test_connection_error_matches_sync_error_shape(monkeypatch):
+    monkeypatch.setattr(backend_client, "RETRY_BACKOFF_BASE_SECS", 0.0)
+
+    def handler(request):
+        raise httpx.ConnectError("connection refused", request=request)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(backend_client, "get_async_client", lambda: client)
+
+    assert await async_tools.submit_order_and_clear_cart("123", [], {}, 0.0) == {
+        "status": "error",
+        "message": "Failed to connect to order submission service.",
+    }
+    recommendations = await async_tools.get_product_recommendations(["SKU_A"], "123")
+    assert recommendations["recommendations"] == []
+    assert recommendations["errors_fetching_recommendations"][0]["product_id"] == "SKU_A"
+
+
+@pytest.mark.asyncio
+async def test_slow_backend_does_not_block_event_loop(monkeypatch):
+    async def slow_handler(request):
+        await asyncio.sleep(0.2)
+        return httpx.Response(200, json={"items": [], "subtotal": 0.0})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(slow_handler))
+    monkeypatch.setattr(backend_client, "get_async_client", lambda: client)
+
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        for _ in range(10):
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    await asyncio.gather(async_tools.access_cart_information("123"), ticker())
+    assert ticks == 10  # The loop kept running while the tool waited on I/O
+
+
+def test_async_tools_keep_sync_names_and_docs():
+    for name in ("access_cart_information", "modify_cart", "get_product_recommendations",
+                 "check_product_availability", "search_products", "submit_order_and_clear_cart"):
+        async_tool = getattr(async_tools, name)
+        assert asyncio.iscoroutinefunction(async_tool)
+        assert async_tool.__name__ == name
+        assert async_tool.__doc__ == getattr(tools, name).__doc__
@@ -0,0 +1,115 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import asyncio
+
+import pytest
+
+import audio_coalescer
+from audio_coalescer import MicAudioCoalescer
+
+FRAME_MS = 40
+FRAME_BYTES = 16000 * FRAME_MS // 1000 * 2  # 1280
+
+
+def _coalescer(**kwargs):
+    frames = []
+    return MicAudioCoalescer(frames.append, frame_ms=FRAME_MS, **kwargs), frames
+
+
+def _packet(value, size=320):
+    return bytes([value]) * size
+
+
+@pytest.mark.asyncio
+async def test_small_packets_are_packed_into_full_frames():
+    coalescer, frames = _coalescer()
+    for i in range(9):
+        coalescer.push(_packet(i))
+    assert frames == [b"".join(_packet(i) for i in range(4)), b"".join(_packet(i) for i in range(4, 8))]
+    assert coalescer.stats["packets_in"] == 9
+    coalescer.close()
+
+
+@pytest.mark.asyncio
+async def test_frame_sized_packet_passes_through_uncopied():
+    coalescer, frames = _coalescer()
+    packet = _packet(1, FRAME_BYTES)
+    coalescer.push(packet)
+    assert frames[0] is packet
+
+
+@pytest.mark.asyncio
+async def test_large_packet_is_split_and_remainder_buffered():
+    coalescer, frames = _coalescer()
+    coalescer.push(_packet(1, 100))
+    coalescer.push(_packet(2, 3000))
+    assert [len(frame) for frame in frames] == [FRAME_BYTES, FRAME_BYTES]
+    assert frames[0] == _packet(1, 100) + _packet(2, FRAME_BYTES - 100)
+    coalescer.flush()
+    assert len(frames[2]) == 100 + 3000 - 2 * FRAME_BYTES
+
+
+@pytest.mark.asyncio
+async def test_partial_frame_is_flushed_by_the_timer():
+    coalescer, frames = _coalescer(max_delay_ms=10)
+    coalescer.push(_packet(1))
+    assert frames == []
+    await asyncio.sleep(0.05)
+    assert frames == [_packet(1)]
+    assert coalescer.stats["timer_flushes"] == 1
+
+
+@pytest.mark.asyncio
+async def test_out_of_order_packets_are_reordered_and_late_ones_dropped():
+    coalescer, frames = _coalescer()
+    for sequence in (10, 12, 11, 13, 9):
+        coalescer.push(_packet(sequence), sequence)
+    assert frames == [b"".join(_packet(seq) for seq in (10, 11, 12, 13))]
+    assert coalescer.stats["reordered"] == 1
+    assert coalescer.stats["late_dropped"] == 1
+
+
+@pytest.mark.asyncio
+async def test_gap_is_skipped_when_the_reorder_window_fills():
+    coalescer, frames = _coalescer(reorder_window=2)
+    coalescer.push(_packet(0), 65535)
+    for sequence in (1, 2, 3):  # 0 never arrives; sequence numbers wrap
+        coalescer.push(_packet(sequence), sequence)
+    assert frames == [b"".join(_packet(seq) for seq in (0, 1, 2, 3))]
+    assert coalescer.stats["gaps_skipped"] == 1
+
+
+@pytest.mark.asyncio
+async def test_close_discards_buffer_and_cancels_the_timer():
+    coalescer, frames = _coalescer(max_delay_ms=10)
+    coalescer.push(_packet(1))
+    coalescer.close()
+    await asyncio.sleep(0.03)
+    assert frames == []
+
+
+def test_frame_duration_is_validated():
+    with pytest.raises(ValueError):
+        MicAudioCoalescer(lambda frame: None, frame_ms=20)
+
+
+@pytest.mark.asyncio
+async def test_process_totals_accumulate():
+    before = audio_coalescer.totals["frames_out"]
+    coalescer, _ = _coalescer()
+    coalescer.push(_packet(1, FRAME_BYTES))
+    assert audio_coalescer.totals["frames_out"] == before + 1
+    assert audio_coalescer.audio_coalescer_stats()["packets_per_frame"] > 0
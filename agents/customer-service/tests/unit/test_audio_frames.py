@@ -0,0 +1,52 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import pytest
+
+from audio_frames import (
+    BINARY_AUDIO_SUBPROTOCOL,
+    HEADER_SIZE,
+    JSON_SUBPROTOCOL,
+    FrameError,
+    decode_audio_frame,
+    encode_audio_frame,
+    negotiate_subprotocol,
+)
+
+
+def test_round_trip_keeps_pcm_and_sequence():
+    pcm = bytes(range(256)) * 4
+    frame = encode_audio_frame(pcm, 7)
+    assert len(frame) == HEADER_SIZE + len(pcm)
+    decoded = decode_audio_frame(frame)
+    assert decoded.sequence == 7
+    assert decoded.pcm == pcm
+
+
+def test_sequence_wraps():
+    assert decode_audio_frame(encode_audio_frame(b"\x00\x00", 65537)).sequence == 1
+
+
+@pytest.mark.parametrize("frame", [b"", b"\x01\x01", b"\x02\x01\x00\x00pcm", b"\x01\x7f\x00\x00pcm"])
+def test_invalid_frames_raise(frame):
+    with pytest.raises(FrameError):
+        decode_audio_frame(frame)
+
+
+def test_negotiation_prefers_binary_and_falls_back_to_json():
+    assert negotiate_subprotocol([JSON_SUBPROTOCOL, BINARY_AUDIO_SUBPROTOCOL]) == BINARY_AUDIO_SUBPROTOCOL
+    assert negotiate_subprotocol([JSON_SUBPROTOCOL]) == JSON_SUBPROTOCOL
+    assert negotiate_subprotocol(["chat"]) is None
+    assert negotiate_subprotocol([]) is None
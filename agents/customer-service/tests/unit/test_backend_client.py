@@ -0,0 +1,118 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from unittest.mock import MagicMock, patch
+
+import httpx
+import pytest
+import requests
+
+from customer_service.tools import backend_client
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(backend_client, "RETRY_BACKOFF_BASE_SECS", 0.0)
+    backend_client.metrics.reset()
+    yield
+    backend_client.metrics.reset()
+
+
+def _response(status_code):
+    response = MagicMock()
+    response.status_code = status_code
+    return response
+
+
+def test_session_is_shared():
+    assert backend_client.get_session() is backend_client.get_session()
+
+
+def test_async_client_is_closed_with_its_event_loop():
+    async def shared_clients():
+        client = backend_client.get_async_client()
+        assert backend_client.get_async_client() is client
+        await backend_client.close_async_client()
+        replacement = backend_client.get_async_client()
+        await asyncio.sleep(0)  # Lets the closer of the first client finish
+        return client, replacement
+
+    first, replacement = asyncio.run(shared_clients())
+    assert first.is_closed and replacement.is_closed  # The replacement closed when asyncio.run() ended its loop
+
+    next_loop_client = asyncio.run(shared_clients())[0]
+    assert next_loop_client is not replacement
+
+
+def test_get_retries_transient_status_then_succeeds():
+    responses = [_response(503), _response(502), _response(200)]
+    with patch.object(requests.Session, "request", side_effect=responses) as mock_request:
+        response = backend_client.request("GET", "http://backend/api/cart/1", endpoint="cart")
+
+    assert response.status_code == 200
+    assert mock_request.call_count == 3
+    stats = backend_client.metrics.snapshot()["cart"]
+    assert stats["calls"] == 1
+    assert stats["retries"] == 2
+    assert stats["errors"] == 0
+
+
+def test_get_retries_are_bounded():
+    error = requests.exceptions.ConnectionError("down")
+    with patch.object(requests.Session, "request", side_effect=error) as mock_request:
+        with pytest.raises(requests.exceptions.ConnectionError):
+            backend_client.request("GET", "http://backend/api/cart/1", endpoint="cart")
+
+    assert mock_request.call_count == backend_client.MAX_GET_RETRIES + 1
+    assert backend_client.metrics.snapshot()["cart"]["errors"] == 1
+
+
+def test_post_is_not_retried():
+    with patch.object(requests.Session, "request", return_value=_response(503)) as mock_request:
+        response = backend_client.request("POST", "http://backend/api/checkout/place_order",
+                                          endpoint="place_order", json={})
+
+    assert response.status_code == 503
+    mock_request.assert_called_once()
+    assert backend_client.metrics.snapshot()["place_order"]["errors"] == 1
+
+
+def test_backoff_delay_is_jittered_and_capped(monkeypatch):
+    monkeypatch.setattr(backend_client, "RETRY_BACKOFF_BASE_SECS", 0.1)
+    delays = [backend_client.backoff_delay(attempt) for attempt in range(10) for _ in range(20)]
+    assert all(0 <= delay <= backend_client.RETRY_BACKOFF_MAX_SECS for delay in delays)
+    assert len(set(delays)) > 1
+
+
+@pytest.mark.asyncio
+async def test_async_get_retries_transient_errors(monkeypatch):
+    attempts = []
+
+    def handler(request):
+        attempts.append(request)
+        if len(attempts) == 1:
+            raise httpx.ConnectError("connection reset", request=request)
+        if len(attempts) == 2:
+            return httpx.Response(504)
+        return httpx.Response(200, json={"ok": True})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(backend_client, "get_async_client", lambda: client)
+
+    response = await backend_client.arequest("GET", "http://backend/api/products", endpoint="product_batch")
+
+    assert response.json() == {"ok": True}
+    assert len(attempts) == 3
+    assert backend_client.metrics.snapshot()["product_batch"]["retries"] == 2
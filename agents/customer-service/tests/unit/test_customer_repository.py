@@ -0,0 +1,154 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import sqlite3
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from customer_service.entities import customer_repository
+from customer_service.entities.customer import Customer
+from customer_service.entities.customer_repository import CustomerRepository, CustomerStoreUnavailable
+from customer_service.shared_libraries import callbacks
+from customer_service.shared_libraries.profile_cache import customer_profile_cache
+
+# Same tables as the backend's customer_store.py (which creates them in ecommerce.db).
+SCHEMA = """
+CREATE TABLE customers (
+    customer_id TEXT PRIMARY KEY, account_number TEXT NOT NULL UNIQUE, first_name TEXT NOT NULL,
+    last_name TEXT NOT NULL, email TEXT NOT NULL, phone_number TEXT, customer_start_date TEXT,
+    years_as_customer INTEGER NOT NULL DEFAULT 0, loyalty_points INTEGER NOT NULL DEFAULT 0, preferred_store TEXT,
+    email_opt_in BOOLEAN NOT NULL DEFAULT TRUE, sms_opt_in BOOLEAN NOT NULL DEFAULT TRUE,
+    push_opt_in BOOLEAN NOT NULL DEFAULT TRUE, scheduled_appointments TEXT NOT NULL DEFAULT '{}'
+);
+CREATE TABLE addresses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, customer_id TEXT NOT NULL, address_type TEXT NOT NULL DEFAULT 'billing',
+    street TEXT NOT NULL, city TEXT NOT NULL, state TEXT NOT NULL, zip TEXT NOT NULL,
+    UNIQUE (customer_id, address_type)
+);
+CREATE TABLE purchases (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, customer_id TEXT NOT NULL, purchase_date TEXT NOT NULL,
+    items TEXT NOT NULL, total_amount REAL NOT NULL
+);
+CREATE INDEX idx_purchases_customer_date ON purchases (customer_id, purchase_date);
+CREATE TABLE garden_profile (
+    customer_id TEXT PRIMARY KEY, type TEXT NOT NULL, size TEXT NOT NULL, sun_exposure TEXT NOT NULL,
+    soil_type TEXT NOT NULL, interests TEXT NOT NULL DEFAULT '[]'
+);
+"""
+
+
+def _insert(conn, customer: Customer):
+    conn.execute(
+        "INSERT INTO customers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (customer.customer_id, customer.account_number, customer.customer_first_name, customer.customer_last_name,
+         customer.email, customer.phone_number, customer.customer_start_date, customer.years_as_customer,
+         customer.loyalty_points, customer.preferred_store, customer.communication_preferences.email,
+         customer.communication_preferences.sms, customer.communication_preferences.push_notifications,
+         json.dumps(customer.scheduled_appointments)),
+    )
+    address = customer.billing_address
+    conn.execute("INSERT INTO addresses (customer_id, street, city, state, zip) VALUES (?, ?, ?, ?, ?)",
+                 (customer.customer_id, address.street, address.city, address.state, address.zip))
+    for purchase in customer.purchase_history:
+        conn.execute("INSERT INTO purchases (customer_id, purchase_date, items, total_amount) VALUES (?, ?, ?, ?)",
+                     (customer.customer_id, purchase.date, json.dumps([item.model_dump() for item in purchase.items]),
+                      purchase.total_amount))
+    garden = customer.garden_profile
+    conn.execute("INSERT INTO garden_profile VALUES (?, ?, ?, ?, ?, ?)",
+                 (customer.customer_id, garden.type, garden.size, garden.sun_exposure, garden.soil_type,
+                  json.dumps(garden.interests)))
+
+
+def _sample_customer(customer_id: str) -> Customer:
+    return Customer.demo_customer(customer_id).model_copy(update={"account_number": f"acct-{customer_id}"})
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "customers.db"
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    for customer_id in ("123", "456"):
+        _insert(conn, _sample_customer(customer_id))
+    conn.commit()
+    conn.close()
+    return str(path)
+
+
+def test_get_round_trips_profile(db_path):
+    repository = CustomerRepository(db_path)
+    assert repository.get("456") == _sample_customer("456")
+    assert repository.get("nobody") is None
+
+
+def test_lru_cache_hits_evicts_and_expires(db_path):
+    now = [0.0]
+    repository = CustomerRepository(db_path, cache_size=1, cache_ttl_secs=10, clock=lambda: now[0])
+
+    first = repository.get("123")
+    assert repository.get("123") is first
+    repository.get("456")  # Evicts 123
+    assert repository.get("123") is not first
+    now[0] = 11.0  # Expired
+    repository.get("123")
+    assert repository.stats == {"hits": 1, "misses": 4, "not_found": 0, "evictions": 2}
+
+
+def test_invalidate_reloads_changed_profile(db_path):
+    repository = CustomerRepository(db_path)
+    assert repository.get("123").loyalty_points == 133
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE customers SET loyalty_points = 200 WHERE customer_id = '123'")
+    assert repository.get("123").loyalty_points == 133
+    repository.invalidate("123")
+    assert repository.get("123").loyalty_points == 200
+
+
+def test_missing_tables_fall_back_to_demo_profile(tmp_path, monkeypatch):
+    empty_db = tmp_path / "empty.db"
+    sqlite3.connect(empty_db).close()
+    repository = CustomerRepository(str(empty_db))
+    with pytest.raises(CustomerStoreUnavailable):
+        repository.get("123")
+
+    monkeypatch.setattr(customer_repository, "_repository", repository)
+    assert Customer.get_customer("789") == Customer.demo_customer("789")
+
+
+def test_session_for_another_customer_loads_their_profile(db_path, monkeypatch):
+    monkeypatch.setattr(customer_repository, "_repository", CustomerRepository(db_path))
+    # The streaming server creates each session with the customer_id from the WebSocket handshake.
+    context = SimpleNamespace(state={"customer_id": "456"}, session=SimpleNamespace(id="session-456"))
+
+    callbacks._load_customer_profile(context, "test")
+
+    assert customer_profile_cache.get("session-456", context.state) == _sample_customer("456")
+
+
+def test_thread_connections_are_closed_when_threads_exit(db_path):
+    repository = CustomerRepository(db_path)
+    worker = threading.Thread(target=repository.get, args=("123",))
+    worker.start()
+    worker.join()
+    assert not repository._connections
+
+    repository.get("456")
+    assert len(repository._connections) == 1
+    repository.close()
+    assert not repository._connections
+    repository.invalidate()
+    assert repository.get("456") == _sample_customer("456")  # Reopens
@@ -0,0 +1,151 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import json
+from types import SimpleNamespace
+
+import pytest
+from google.adk.events import Event
+from google.genai import types
+
+from event_dispatch import AgentEventDispatcher, dispatcher, parse_ui_command
+
+
+class RecordingOutbound:
+    def __init__(self):
+        self.control = []
+        self.audio = []
+
+    async def put_control(self, message):
+        self.control.append(message)
+
+    def put_audio(self, pcm):
+        self.audio.append(pcm)
+
+    def clear_audio(self):
+        cleared = sum(map(len, self.audio))
+        self.audio = []
+        return cleared
+
+
+def _event(part, **kwargs):
+    return Event(author="agent", content=types.Content(role="model", parts=[part]), **kwargs)
+
+
+def _tool_event(response):
+    return _event(types.Part(function_response=types.FunctionResponse(name="tool", response=response)))
+
+
+async def _dispatch(event):
+    outbound = RecordingOutbound()
+    kind = await dispatcher.dispatch(event, outbound, "s1")
+    return kind, outbound
+
+
+@pytest.mark.asyncio
+async def test_status_events():
+    kind, outbound = await _dispatch(Event(author="agent", turn_complete=True, interrupted=False))
+    assert kind == "status"
+    assert outbound.control == [{"turn_complete": True, "interrupted": False, "interaction_completed": False}]
+
+
+@pytest.mark.asyncio
+async def test_interruption_discards_queued_audio():
+    outbound = RecordingOutbound()
+    await dispatcher.dispatch(_event(types.Part(inline_data=types.Blob(mime_type="audio/pcm", data=b"\x01" * 10))),
+                              outbound, "s1")
+    await dispatcher.dispatch(Event(author="agent", interrupted=True), outbound, "s1")
+    assert outbound.audio == []
+    assert len(outbound.control) == 1 and outbound.control[0]["interrupted"] is True
+
+
+@pytest.mark.asyncio
+async def test_audio_and_text_parts():
+    kind, outbound = await _dispatch(_event(types.Part(inline_data=types.Blob(mime_type="audio/pcm", data=b"\x01\x02"))))
+    assert (kind, outbound.audio) == ("audio", [b"\x01\x02"])
+
+    kind, outbound = await _dispatch(_event(types.Part(text="Try a slow-release fertilizer.")))
+    assert (kind, outbound.control) == ("text", [{"mime_type": "text/plain", "data": "Try a slow-release fertilizer."}])
+
+
+@pytest.mark.asyncio
+async def test_ui_command_text_is_forwarded_as_command():
+    command = {"type": "ui_command", "command_name": "highlight", "payload": {}}
+    kind, outbound = await _dispatch(_event(types.Part(text=" " + json.dumps(command))))
+    assert (kind, outbound.control) == ("ui_command", [command])
+
+
+def test_ui_command_parse_is_skipped_for_ordinary_text():
+    assert parse_ui_command("I can help with your ui_command question.") is None
+    assert parse_ui_command('{"type": "other"}') is None
+    assert parse_ui_command('{"type": "ui_command", broken') is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("response, expected", [
+    ({"action": "set_theme", "theme": "dark"},
+     [{"type": "command", "command_name": "set_theme", "payload": {"theme": "dark"}}]),
+    ({"action": "refresh_cart"}, [{"type": "command", "command_name": "refresh_cart"}]),
+    ({"action": "show_checkout_ui", "cart_data": {"items": []}},
+     [{"type": "command", "command_name": "display_checkout_modal", "data": {"items": []}}]),
+    ({"action": "show_checkout_ui"}, []),
+    ({"action": "show_shipping_ui_requested"}, [{"type": "command", "command_name": "display_shipping_modal"}]),
+    ({"action": "show_payment_ui_requested"}, [{"type": "command", "command_name": "display_payment_modal"}]),
+    ({"action": "confirm_ui_pickup_address", "address_index": 1, "speak": "Pickup it is."},
+     [{"mime_type": "text/plain", "data": "Pickup it is."},
+      {"type": "command", "command_name": "agent_confirm_selection", "selection_type": "pickup_address", "address_index": 1}]),
+    ({"action": "no_ui_change_needed", "speak": "Okay."}, [{"mime_type": "text/plain", "data": "Okay."}]),
+    ({"action": "refresh_cart_and_show_confirmation", "message": "Order placed", "order_id": "o1"},
+     [{"mime_type": "text/plain", "data": "Order placed"},
+      {"type": "command", "command_name": "order_confirmed_refresh_cart", "data": {"order_id": "o1", "message": "Order placed"}}]),
+    ({"action": "display_ui", "ui_element": "care_card", "payload": {"plant": "fern"}},
+     [{"type": "ui_command", "command_name": "care_card", "payload": {"plant": "fern"}}]),
+])
+async def test_tool_response_actions(response, expected):
+    kind, outbound = await _dispatch(_tool_event(response))
+    assert kind == f"action:{response['action']}"
+    assert outbound.control == expected
+
+
+@pytest.mark.asyncio
+async def test_product_recommendations_are_sent_as_raw_json():
+    response = {"type": "product_recommendations", "recommendations": [{"id": "p1"}]}
+    kind, outbound = await _dispatch(_tool_event(response))
+    assert kind == "type:product_recommendations"
+    assert json.loads(outbound.control[0]) == response
+
+
+@pytest.mark.asyncio
+async def test_incomplete_or_unknown_tool_responses_fall_through():
+    kind, outbound = await _dispatch(_tool_event({"action": "display_ui", "ui_element": "care_card"}))
+    assert (kind, outbound.control) == ("unhandled", [])
+    kind, _ = await _dispatch(_tool_event({"status": "ok"}))
+    assert kind == "unhandled"
+
+
+@pytest.mark.asyncio
+async def test_registry_accepts_new_actions_and_counts_kinds():
+    local = AgentEventDispatcher()
+
+    @local.action("wave")
+    async def wave(outbound, session_id, response):
+        await outbound.put_control({"waved": response["times"]})
+        return True
+
+    outbound = RecordingOutbound()
+    assert await local.dispatch(_tool_event({"action": "wave", "times": 2}), outbound, "s1") == "action:wave"
+    assert await local.dispatch(SimpleNamespace(content=None), outbound, "s1") == "empty"
+    assert outbound.control == [{"waved": 2}]
+    assert local.counts == {"action:wave": 1, "empty": 1}
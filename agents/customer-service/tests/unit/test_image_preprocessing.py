@@ -0,0 +1,108 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import io
+
+import pytest
+from PIL import Image
+
+import image_preprocessing
+from image_preprocessing import ImagePreprocessor, ImageRejected, preprocess_image
+
+
+def _encode(image, fmt, **kwargs):
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, **kwargs)
+    return buffer.getvalue()
+
+
+def _photo(width, height):
+    return Image.linear_gradient("L").resize((width, height)).convert("RGB")
+
+
+def test_large_photo_is_downscaled_and_exif_stripped():
+    exif = Image.Exif()
+    exif[0x010F] = "PhoneMaker"  # Make
+    exif[0x0112] = 6  # Orientation: rotate 90 degrees clockwise
+    source = _encode(_photo(4000, 3000), "JPEG", quality=95, exif=exif)
+
+    result = Image.open(io.BytesIO(preprocess_image(source, max_dimension=1024)))
+    assert result.format == "JPEG"
+    assert result.size == (768, 1024)  # Orientation applied before scaling
+    assert not result.getexif()
+
+
+def test_small_image_keeps_its_size():
+    result = Image.open(io.BytesIO(preprocess_image(_encode(_photo(300, 200), "PNG"))))
+    assert result.size == (300, 200)
+
+
+def test_transparency_is_flattened_onto_white():
+    source = _encode(Image.new("RGBA", (20, 20), (0, 0, 0, 0)), "PNG")
+    result = Image.open(io.BytesIO(preprocess_image(source, max_dimension=10)))
+    assert result.mode == "RGB"
+    assert result.getpixel((5, 5)) == pytest.approx((255, 255, 255), abs=2)
+
+
+def _noisy_jpeg(size: int, **kwargs) -> bytes:
+    """A low-quality JPEG of sensor-like noise, which re-encoding at quality 85 makes bigger."""
+    return _encode(Image.effect_noise((size, size), 20).convert("RGB"), "JPEG", quality=40, **kwargs)
+
+
+def test_compressed_jpeg_that_would_grow_is_kept_unless_it_has_metadata():
+    source = _noisy_jpeg(400)
+    assert preprocess_image(source, quality=85) is source
+
+    exif = Image.Exif()
+    exif[0x010F] = "PhoneMaker"
+    with_exif = _noisy_jpeg(400, exif=exif)
+    stripped = preprocess_image(with_exif, quality=85)
+    assert stripped is not with_exif
+    assert not Image.open(io.BytesIO(stripped)).getexif()
+
+
+def test_undecodable_data_is_passed_through():
+    assert preprocess_image(b"not an image") is None
+
+
+def test_oversized_image_is_rejected(monkeypatch):
+    monkeypatch.setattr(image_preprocessing, "MAX_INPUT_PIXELS", 100)
+    with pytest.raises(ImageRejected):
+        preprocess_image(_encode(_photo(20, 20), "PNG"))
+
+
+@pytest.mark.asyncio
+async def test_preprocessor_runs_in_executor_and_records_stats():
+    preprocessor = ImagePreprocessor(max_dimension=256)
+    try:
+        source = _encode(_photo(2000, 1500), "PNG")
+        data, mime_type = await preprocessor.process(source, "image/png")
+        assert mime_type == "image/jpeg"
+        assert Image.open(io.BytesIO(data)).size == (256, 192)
+
+        data, mime_type = await preprocessor.process(b"\x00heic?", "image/heic")
+        assert (data, mime_type) == (b"\x00heic?", "image/heic")
+
+        small_jpeg = _noisy_jpeg(200)
+        assert await preprocessor.process(small_jpeg, "image/jpeg") == (small_jpeg, "image/jpeg")
+
+        stats = preprocessor.snapshot_stats()
+        assert stats["images"] == 3
+        assert stats["reduced"] == 1
+        assert stats["kept_original"] == 1
+        assert stats["passthrough"] == 1
+        assert stats["bytes_saved_ratio"] > 0.5
+    finally:
+        preprocessor.shutdown()
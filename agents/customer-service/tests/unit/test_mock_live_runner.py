@@ -0,0 +1,132 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import asyncio
+
+import httpx
+import pytest
+from google.adk.agents import LiveRequestQueue
+from google.adk.agents.run_config import RunConfig
+from google.genai import types
+
+from customer_service.tools import backend_client
+from event_dispatch import dispatcher
+from mock_live_runner import MockLiveRunner, MockLiveScript
+from session_store import SqliteSessionService
+
+APP, USER = "app", "user_1"
+
+
+def _fast_script(**overrides):
+    settings = dict(first_token_latency_ms=1, latency_jitter_ms=0, chunk_interval_ms=0, tool_every_n_turns=0)
+    settings.update(overrides)
+    return MockLiveScript(**settings)
+
+
+async def _next_turn(events):
+    """Collects events up to and including the next turn_complete."""
+    turn = []
+    while True:
+        event = await asyncio.wait_for(events.__anext__(), timeout=2)
+        turn.append(event)
+        if event.turn_complete:
+            return turn
+
+
+async def _store(tmp_path):
+    service = SqliteSessionService(str(tmp_path / "sessions.db"))
+    return service, await service.create_session(app_name=APP, user_id=USER, session_id="s1")
+
+
+@pytest.mark.asyncio
+async def test_text_turn_streams_chunks_and_records_session(tmp_path):
+    service, session = await _store(tmp_path)
+    runner = MockLiveRunner(app_name=APP, session_service=service, script=_fast_script(text_chunks=3))
+    queue = LiveRequestQueue()
+    events = runner.run_live(session=session, live_request_queue=queue, run_config=RunConfig(response_modalities=["TEXT"]))
+
+    queue.send_content(types.Content(role="user", parts=[types.Part(text="hi")]))
+    turn = await _next_turn(events)
+
+    chunks = [event.content.parts[0].text for event in turn[:-1]]
+    assert len(chunks) == 3 and all(event.partial for event in turn[:-1])
+    assert turn[-1].turn_complete and not turn[-1].interrupted
+    stored = (await service.get_session(app_name=APP, user_id=USER, session_id="s1")).events
+    assert [event.author for event in stored] == ["user", "mock_live_agent"]
+    assert stored[1].content.parts[0].text.strip() == "".join(chunks).strip()
+
+    queue.close()
+    with pytest.raises(StopAsyncIteration):
+        await asyncio.wait_for(events.__anext__(), timeout=2)
+    await service.close()
+
+
+@pytest.mark.asyncio
+async def test_mic_audio_turn_gets_audio_reply(tmp_path):
+    service, session = await _store(tmp_path)
+    runner = MockLiveRunner(app_name=APP, session_service=service, script=_fast_script(audio_chunks=4))
+    queue = LiveRequestQueue()
+    events = runner.run_live(session=session, live_request_queue=queue, run_config=RunConfig(response_modalities=["AUDIO"]))
+
+    for _ in range(10):  # 10 x 100 ms of 16 kHz mic audio = one utterance
+        queue.send_realtime(types.Blob(mime_type="audio/pcm", data=b"\x01\x00" * 1600))
+    turn = await _next_turn(events)
+
+    audio = [event.content.parts[0].inline_data for event in turn[:-1]]
+    assert len(audio) == 4
+    assert all(blob.mime_type == "audio/pcm" and len(blob.data) == 4800 for blob in audio)
+    await events.aclose()
+    await service.close()
+
+
+@pytest.mark.asyncio
+async def test_tool_turns_call_real_tools_against_backend(tmp_path, monkeypatch):
+    service, session = await _store(tmp_path)
+    cart = {"items": [{"product_id": "SKU_A", "quantity": 1}], "subtotal": 4.5}
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.url.path)
+        return httpx.Response(200, json=cart)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(backend_client, "get_async_client", lambda: client)
+    runner = MockLiveRunner(app_name=APP, session_service=service, script=_fast_script(tool_every_n_turns=1))
+    queue = LiveRequestQueue()
+    events = runner.run_live(session=session, live_request_queue=queue, run_config=RunConfig(response_modalities=["TEXT"]))
+
+    queue.send_content(types.Content(role="user", parts=[types.Part(text="what's in my cart?")]))
+    first = await _next_turn(events)
+    queue.send_content(types.Content(role="user", parts=[types.Part(text="night mode please")]))
+    second = await _next_turn(events)
+
+    assert first[0].content.parts[0].function_call.name == "access_cart_information"
+    assert first[1].content.parts[0].function_response.response == cart
+    assert seen == ["/api/cart/123"]
+    theme_response = second[1]
+    assert theme_response.content.parts[0].function_response.response == {"action": "set_theme", "theme": "night"}
+
+    class Outbound:
+        def __init__(self):
+            self.sent = []
+
+        async def put_control(self, message):
+            self.sent.append(message)
+
+    outbound = Outbound()
+    assert await dispatcher.dispatch(theme_response, outbound, "s1") == "action:set_theme"
+    assert outbound.sent[0]["command_name"] == "set_theme"
+    await events.aclose()
+    await service.close()
@@ -0,0 +1,167 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import asyncio
+import base64
+
+import pytest
+
+from audio_frames import decode_audio_frame
+from outbound_queue import OutboundQueue, OutboundQueueClosed, outbound_queue_stats
+
+
+class FakeWebSocket:
+    """Records sends; each send waits on `gate` so tests can stall the writer."""
+
+    def __init__(self):
+        self.sent = []
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def _send(self, kind, payload):
+        await self.gate.wait()
+        self.sent.append((kind, payload))
+
+    async def send_json(self, payload):
+        await self._send("json", payload)
+
+    async def send_text(self, payload):
+        await self._send("text", payload)
+
+    async def send_bytes(self, payload):
+        await self._send("bytes", payload)
+
+
+@pytest.mark.asyncio
+async def test_messages_are_sent_in_order():
+    ws = FakeWebSocket()
+    queue = OutboundQueue(ws, "s1")
+    queue.start()
+    await queue.put_control({"turn_complete": False})
+    queue.put_audio(b"\x01\x02")
+    await queue.put_control('{"type": "product_recommendations"}')
+    await queue.close()
+
+    assert ws.sent == [
+        ("json", {"turn_complete": False}),
+        ("json", {"mime_type": "audio/pcm", "data": base64.b64encode(b"\x01\x02").decode()}),
+        ("text", '{"type": "product_recommendations"}'),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_slow_client_drops_oldest_audio_but_keeps_control():
+    ws = FakeWebSocket()
+    ws.gate.clear()
+    queue = OutboundQueue(ws, "s1", binary_audio=True, max_audio_bytes=30, max_coalesced_audio_bytes=1000)
+    queue.start()
+    await queue.put_control({"command_name": "refresh_cart"})
+    await asyncio.sleep(0)  # Writer takes the command and stalls on the send
+    for i in range(5):
+        queue.put_audio(bytes([i]) * 10)
+        await queue.put_control({"seq": i})
+
+    assert queue.stats["audio_dropped"] == 2
+    assert queue.snapshot_stats()["buffered_audio_bytes"] == 30
+    ws.gate.set()
+    await queue.close()
+
+    controls = [payload for kind, payload in ws.sent if kind == "json"]
+    assert controls == [{"command_name": "refresh_cart"}] + [{"seq": i} for i in range(5)]
+    audio = [decode_audio_frame(payload).pcm for kind, payload in ws.sent if kind == "bytes"]
+    assert audio == [b"\x02" * 10, b"\x03" * 10, b"\x04" * 10]
+
+
+@pytest.mark.asyncio
+async def test_queued_audio_is_coalesced_into_one_frame():
+    ws = FakeWebSocket()
+    ws.gate.clear()
+    queue = OutboundQueue(ws, "s1", binary_audio=True, max_coalesced_audio_bytes=25)
+    queue.start()
+    await queue.put_control({"status": "speaking"})
+    await asyncio.sleep(0)
+    for i in range(3):
+        queue.put_audio(bytes([i]) * 10)
+    ws.gate.set()
+    await queue.close()
+
+    frames = [decode_audio_frame(payload) for kind, payload in ws.sent if kind == "bytes"]
+    assert [frame.pcm for frame in frames] == [b"\x00" * 10 + b"\x01" * 10, b"\x02" * 10]
+    assert [frame.sequence for frame in frames] == [0, 1]
+    assert queue.stats["audio_coalesced"] == 1
+
+
+@pytest.mark.asyncio
+async def test_clear_audio_discards_queued_speech_but_keeps_control():
+    ws = FakeWebSocket()
+    ws.gate.clear()
+    queue = OutboundQueue(ws, "s1", binary_audio=True)
+    queue.start()
+    await queue.put_control({"status": "speaking"})
+    await asyncio.sleep(0)  # Writer stalls on the first send
+    queue.put_audio(b"\x01" * 10)
+    await queue.put_control({"seq": 1})
+    queue.put_audio(b"\x02" * 10)
+
+    assert queue.clear_audio() == 20
+    await queue.put_control({"interrupted": True})
+    queue.put_audio(b"\x03" * 10)  # The next answer
+    ws.gate.set()
+    await queue.close()
+
+    assert [payload for kind, payload in ws.sent if kind == "json"] == [
+        {"status": "speaking"}, {"seq": 1}, {"interrupted": True},
+    ]
+    assert [decode_audio_frame(payload).pcm for kind, payload in ws.sent if kind == "bytes"] == [b"\x03" * 10]
+    assert queue.stats["audio_cleared"] == 2 and queue.stats["audio_bytes_cleared"] == 20
+
+
+@pytest.mark.asyncio
+async def test_full_control_backlog_blocks_the_producer():
+    ws = FakeWebSocket()
+    ws.gate.clear()
+    queue = OutboundQueue(ws, "s1", max_control_messages=2)
+    queue.start()
+    for i in range(3):  # The writer holds the first one
+        await queue.put_control({"seq": i})
+    blocked = asyncio.ensure_future(queue.put_control({"seq": 3}))
+    await asyncio.sleep(0.01)
+    assert not blocked.done()
+
+    ws.gate.set()
+    await blocked
+    await queue.close()
+    assert [payload["seq"] for _, payload in ws.sent] == [0, 1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_failed_send_closes_the_queue_and_updates_totals():
+    class BrokenWebSocket(FakeWebSocket):
+        async def send_json(self, payload):
+            raise ConnectionResetError("client went away")
+
+    before = outbound_queue_stats()["totals"]["control_enqueued"]
+    queue = OutboundQueue(BrokenWebSocket(), "s1")
+    writer = queue.start()
+    await queue.put_control({"seq": 0})
+    with pytest.raises(ConnectionResetError):
+        await writer
+    with pytest.raises(OutboundQueueClosed):
+        await queue.put_control({"seq": 1})
+    await queue.close()
+
+    stats = outbound_queue_stats()
+    assert stats["totals"]["control_enqueued"] == before + 1
+    assert all(session["session_id"] != "s1" for session in stats["sessions"])
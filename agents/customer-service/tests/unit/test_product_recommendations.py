@@ -0,0 +1,82 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from customer_service.tools.tools import get_product_recommendations
+
+
+def _mock_response(payload, status_code=200):
+    response = MagicMock()
+    response.status_code = status_code
+    response.json.return_value = payload
+    response.raise_for_status.return_value = None
+    return response
+
+
+def test_get_product_recommendations_uses_one_batch_request():
+    products = [
+        {"id": "SKU_B", "name": "Basil", "price": 3.5, "image_url": "b.png"},
+        {"id": "SKU_A", "name": "Aloe", "price": "12", "image_url": "a.png"},
+    ]
+    with patch.object(requests.Session, "request", return_value=_mock_response(products)) as mock_get:
+        result = get_product_recommendations(["SKU_A", "SKU_B", "SKU_MISSING"], "123")
+
+    mock_get.assert_called_once()
+    params = mock_get.call_args.kwargs["params"]
+    assert params["ids"] == "SKU_A,SKU_B,SKU_MISSING"
+    assert params["fields"] == "id,name,price,image_url"
+
+    assert [card["id"] for card in result["recommendations"]] == ["SKU_A", "SKU_B"]
+    assert result["recommendations"][0] == {
+        "id": "SKU_A",
+        "name": "Aloe",
+        "formatted_price": "$12.00",
+        "image_url": "a.png",
+        "product_url": "/products/SKU_A",
+    }
+    assert result["errors_fetching_recommendations"] == [
+        {"product_id": "SKU_MISSING", "error": "Product not found", "status_code": 404}
+    ]
+
+
+def test_get_product_recommendations_connection_error():
+    with patch.object(
+        requests.Session,
+        "request",
+        side_effect=requests.exceptions.ConnectionError("down"),
+    ), patch("customer_service.tools.backend_client.time.sleep"):
+        result = get_product_recommendations(["SKU_A"], "123")
+
+    assert result["recommendations"] == []
+    assert result["errors_fetching_recommendations"][0]["product_id"] == "SKU_A"
+
+
+def test_get_product_recommendations_chunks_long_id_lists():
+    product_ids = [f"SKU_{i}" for i in range(250)]
+
+    def batch_response(method, url, params=None, **kwargs):
+        ids = params["ids"].split(",")
+        if len(ids) > 100:  # The backend's MAX_BATCH_PRODUCT_IDS
+            return _mock_response({"error": "Bad Request"}, status_code=400)
+        return _mock_response([{"id": product_id, "name": product_id, "price": 1} for product_id in ids])
+
+    with patch.object(requests.Session, "request", side_effect=batch_response) as mock_get:
+        result = get_product_recommendations(product_ids, "123")
+
+    assert [len(call.kwargs["params"]["ids"].split(",")) for call in mock_get.call_args_list] == [100, 100, 50]
+    assert [card["id"] for card in result["recommendations"]] == product_ids
+    assert result["errors_fetching_recommendations"] is None
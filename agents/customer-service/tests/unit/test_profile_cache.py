@@ -0,0 +1,71 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from customer_service.entities.customer import Customer
+from customer_service.shared_libraries import callbacks
+from customer_service.shared_libraries.profile_cache import (
+    PROFILE_STATE_KEY,
+    PROFILE_VERSION_STATE_KEY,
+    CustomerProfileCache,
+    session_id_of,
+)
+
+
+def test_store_writes_compact_json_and_bumps_version():
+    cache = CustomerProfileCache()
+    state = {}
+    cache.store("s1", state, Customer.get_customer("123"))
+    cache.store("s1", state, Customer.get_customer("123"))
+
+    assert "\n" not in state[PROFILE_STATE_KEY]
+    assert state[PROFILE_VERSION_STATE_KEY] == 2
+
+
+def test_get_parses_once_per_version():
+    cache = CustomerProfileCache()
+    state = {PROFILE_STATE_KEY: Customer.get_customer("123").to_json(), PROFILE_VERSION_STATE_KEY: 1}
+
+    with patch.object(Customer, "model_validate_json", wraps=Customer.model_validate_json) as parse:
+        first = cache.get("s1", state)
+        assert cache.get("s1", state) is first
+        assert parse.call_count == 1
+
+        state[PROFILE_STATE_KEY] = Customer.get_customer("456").to_json()  # Replaced without a version bump
+        assert cache.get("s1", state).customer_id == "456"
+        assert cache.get("s2", state).customer_id == "456"  # Other sessions have their own entry
+        assert parse.call_count == 3
+    assert cache.stats == {"hits": 1, "misses": 3}
+
+
+def test_cache_is_bounded():
+    cache = CustomerProfileCache(max_sessions=2)
+    for session_id in ("a", "b", "c"):
+        cache.store(session_id, {}, Customer.get_customer("123"))
+    assert list(cache._entries) == ["b", "c"]
+
+
+def test_before_tool_validates_customer_id_from_cached_profile(monkeypatch):
+    monkeypatch.setattr(Customer, "get_customer", staticmethod(Customer.demo_customer))
+    context = SimpleNamespace(state={}, session=SimpleNamespace(id="session-1"))
+    tool = SimpleNamespace(name="access_cart_information")
+
+    assert session_id_of(context) == "session-1"
+    assert callbacks.before_tool(tool, {"customer_id": "123"}, context) is None
+    with patch.object(Customer, "model_validate_json") as parse:
+        assert callbacks.before_tool(tool, {"customer_id": "123"}, context) is None
+        assert "error" in callbacks.before_tool(tool, {"customer_id": "999"}, context)
+        parse.assert_not_called()
@@ -0,0 +1,125 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import time
+from unittest.mock import MagicMock
+
+import pytest
+from google.adk.models import LlmRequest
+
+from customer_service.shared_libraries import callbacks
+from customer_service.shared_libraries.rate_limiter import ModelRateLimiter, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_queues_then_sheds():
+    clock = FakeClock()
+    bucket = TokenBucket(rate_per_sec=1.0, capacity=2, clock=clock)
+
+    assert bucket.reserve(max_wait=5) == 0
+    assert bucket.reserve(max_wait=5) == 0
+    assert bucket.reserve(max_wait=5) == pytest.approx(1.0)
+    assert bucket.reserve(max_wait=5) == pytest.approx(2.0)
+    assert bucket.reserve(max_wait=1.5) is None  # Shed requests book nothing
+
+    clock.now = 10.0  # Refill is capped at capacity
+    assert bucket.reserve(max_wait=0) == 0
+    assert bucket.reserve(max_wait=0) == 0
+    assert bucket.reserve(max_wait=0) is None
+
+
+def test_limiter_uses_per_model_rates_and_counts():
+    clock = FakeClock()
+    limiter = ModelRateLimiter(default_rpm=60, model_rpm={"slow-model": 1}, max_wait_secs=0, clock=clock)
+
+    async def burst(model, count):
+        return [await limiter.acquire(model) for _ in range(count)]
+
+    assert asyncio.run(burst("slow-model", 2)) == [True, False]
+    assert asyncio.run(burst("fast-model", 60)) == [True] * 60
+
+    stats = limiter.snapshot_stats()
+    assert stats["slow-model"]["admitted"] == 1
+    assert stats["slow-model"]["shed"] == 1
+    assert stats["fast-model"]["admitted"] == 60
+
+
+
+def test_zero_rpm_disables_limiting_unless_a_model_has_a_quota():
+    limiter = ModelRateLimiter(default_rpm=0, model_rpm={"capped-model": 1}, max_wait_secs=0, clock=FakeClock())
+
+    async def burst(model, count):
+        return [await limiter.acquire(model) for _ in range(count)]
+
+    assert asyncio.run(burst("any-model", 500)) == [True] * 500
+    assert asyncio.run(burst("capped-model", 2)) == [True, False]
+    assert limiter.bucket_for("any-model") is None
+
+    stats = limiter.snapshot_stats()
+    assert stats["any-model"]["admitted"] == 500
+    assert stats["any-model"]["delayed"] == stats["any-model"]["shed"] == 0
+
+@pytest.mark.asyncio
+async def test_waiting_for_a_token_does_not_block_other_sessions():
+    limiter = ModelRateLimiter(default_rpm=600, burst=1, max_wait_secs=1)  # One token per 0.1s
+    ticks = 0
+
+    async def other_session():
+        nonlocal ticks
+        for _ in range(5):
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    start = time.perf_counter()
+    results = await asyncio.gather(limiter.acquire("m"), limiter.acquire("m"), other_session())
+
+    assert results[:2] == [True, True]
+    assert ticks == 5
+    assert time.perf_counter() - start >= 0.09
+    assert limiter.snapshot_stats()["m"]["delayed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_returns_its_token():
+    clock = FakeClock()
+    limiter = ModelRateLimiter(default_rpm=60, burst=1, max_wait_secs=10, clock=clock)  # One token per second
+    assert await limiter.acquire("m")
+    waiter = asyncio.create_task(limiter.acquire("m"))
+    await asyncio.sleep(0)  # Booked the next token and is sleeping on it
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    assert limiter.bucket_for("m").reserve(max_wait=10) == pytest.approx(1.0)  # Not 2.0: no debt left behind
+    stats = limiter.snapshot_stats()["m"]
+    assert stats["admitted"] == 1 and stats["cancelled"] == 1
+
+@pytest.mark.asyncio
+async def test_rate_limit_callback_short_circuits_when_shed(monkeypatch):
+    monkeypatch.setattr(callbacks, "model_rate_limiter", ModelRateLimiter(default_rpm=1, max_wait_secs=0))
+    context = MagicMock()
+    context.state = {}
+
+    assert await callbacks.rate_limit_callback(context, LlmRequest(model="m", contents=[])) is None
+    response = await callbacks.rate_limit_callback(context, LlmRequest(model="m", contents=[]))
+
+    assert response.content.parts[0].text == callbacks.RATE_LIMITED_MESSAGE
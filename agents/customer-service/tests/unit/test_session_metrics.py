@@ -0,0 +1,127 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import json
+import logging
+
+import pytest
+from google.adk.events import Event
+from google.genai import types
+
+import session_metrics
+from session_metrics import Histogram, SessionTimings, register_stats, render_metrics
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def _part_event(part):
+    return Event(author="agent", content=types.Content(role="model", parts=[part]))
+
+
+def _sample(text, line_start):
+    return float(next(line for line in text.splitlines() if line.startswith(line_start)).split()[-1])
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    session_metrics.reset()
+    yield
+    session_metrics.reset()
+
+
+def test_histogram_bucket_bounds_are_inclusive():
+    histogram = Histogram((0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value)
+    assert histogram.bucket_counts == [2, 1, 1]  # le=0.1 is inclusive
+    assert histogram.count == 4 and histogram.sum == pytest.approx(3.65)
+
+
+def test_voice_turn_timings(caplog):
+    clock = FakeClock()
+    timings = SessionTimings("s1", clock=clock)
+    audio = _part_event(types.Part(inline_data=types.Blob(mime_type="audio/pcm", data=b"\x00\x00")))
+    call = _part_event(types.Part(function_call=types.FunctionCall(name="access_cart_information", args={})))
+    response = _part_event(types.Part(function_response=types.FunctionResponse(name="access_cart_information", response={})))
+
+    timings.client_input("audio")  # Turn starts with the first voiced frame
+    clock.now += 0.9
+    timings.client_input("audio")  # End of the utterance
+    clock.now += 0.4
+    timings.agent_event(call, "unhandled")  # First model output is the function call
+    clock.now += 0.2
+    timings.agent_event(response, "unhandled")
+    clock.now += 0.3
+    timings.agent_event(audio, "audio")
+    timings.client_input("audio")  # Barge-in noise after the answer started doesn't move the utterance end
+    clock.now += 0.5
+    timings.agent_event(audio, "audio")
+    with caplog.at_level(logging.INFO, logger="session_metrics"):
+        timings.agent_event(Event(author="agent", turn_complete=True), "status")
+
+    text = render_metrics()
+    assert _sample(text, "customer_service_model_first_token_seconds_sum") == pytest.approx(0.4)
+    assert _sample(text, "customer_service_first_audio_out_seconds_sum") == pytest.approx(0.9)
+    assert _sample(text, 'customer_service_tool_duration_seconds_sum{tool="access_cart_information"}') == pytest.approx(0.2)
+    assert _sample(text, "customer_service_turn_duration_seconds_sum") == pytest.approx(2.3)
+    assert _sample(text, 'customer_service_turn_duration_seconds_bucket{le="2.0"}') == 0
+    assert _sample(text, 'customer_service_turn_duration_seconds_bucket{le="3.0"}') == 1
+    assert _sample(text, 'customer_service_turns_total{outcome="complete"}') == 1
+    assert _sample(text, 'customer_service_client_inputs_total{kind="audio"}') == 3
+
+    record = json.loads(caplog.records[-1].getMessage().split("] ", 1)[1])
+    assert record["first_audio_ms"] == 900.0
+    assert record["tools"] == [{"name": "access_cart_information", "ms": 200.0}]
+
+
+def test_interrupted_turn_resets_state():
+    clock = FakeClock()
+    timings = SessionTimings("s1", clock=clock)
+    timings.client_input("text")
+    clock.now += 1.0
+    timings.agent_event(_part_event(types.Part(text="Sure")), "text")
+    timings.agent_event(Event(author="agent", interrupted=True), "status")
+    clock.now += 5.0
+    timings.client_input("text")
+    clock.now += 0.25
+    timings.agent_event(_part_event(types.Part(text="Next")), "text")
+
+    text = render_metrics()
+    assert _sample(text, 'customer_service_turns_total{outcome="interrupted"}') == 1
+    assert _sample(text, "customer_service_model_first_token_seconds_count") == 2
+    assert _sample(text, "customer_service_model_first_token_seconds_sum") == pytest.approx(1.25)
+
+
+def test_registered_stats_are_exported_as_gauges():
+    register_stats("test_flat", lambda: {"frames": 3, "ratio": 0.5, "enabled": True, "sessions": [1, 2]})
+    register_stats("test_labelled", lambda: {"cart": {"calls": 2}, "product": {"calls": 1}}, label="endpoint")
+    try:
+        text = render_metrics()
+    finally:
+        session_metrics._stats_providers.pop("test_flat")
+        session_metrics._stats_providers.pop("test_labelled")
+
+    assert "customer_service_test_flat_frames 3\n" in text
+    assert "customer_service_test_flat_enabled 1\n" in text
+    assert "sessions" not in text
+    assert ('# TYPE customer_service_test_labelled_calls gauge\n'
+            'customer_service_test_labelled_calls{endpoint="cart"} 2\n'
+            'customer_service_test_labelled_calls{endpoint="product"} 1\n') in text
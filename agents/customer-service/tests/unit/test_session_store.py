@@ -0,0 +1,116 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sqlite3
+import time
+
+import pytest
+from google.adk.events import Event, EventActions
+from google.genai import types
+
+from session_store import AlreadyExistsError, SqliteSessionService
+
+APP, USER = "app", "user_1"
+
+
+def _event(text, **state_delta):
+    return Event(
+        author="user",
+        invocation_id="inv",
+        content=types.Content(role="user", parts=[types.Part(text=text)]),
+        actions=EventActions(state_delta=state_delta),
+    )
+
+
+def _stored_event_count(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM session_events").fetchone()[0]
+
+
+@pytest.mark.asyncio
+async def test_reconnecting_client_resumes_session(tmp_path):
+    db_path = str(tmp_path / "sessions.db")
+    service = SqliteSessionService(db_path)
+    session = await service.create_session(app_name=APP, user_id=USER, session_id="s1", state={"customer_id": "123"})
+    await service.append_event(session, _event("hello", cart_items=2))
+    await service.append_event(session, _event("add soil", **{"temp:scratch": 1}))
+    await service.close()
+
+    restarted = SqliteSessionService(db_path)
+    resumed = await restarted.get_session(app_name=APP, user_id=USER, session_id="s1")
+    assert resumed.state == {"customer_id": "123", "cart_items": 2}  # temp: state is never persisted
+    assert [event.content.parts[0].text for event in resumed.events] == ["hello", "add soil"]
+    assert await restarted.get_session(app_name=APP, user_id=USER, session_id="missing") is None
+    with pytest.raises(AlreadyExistsError):
+        await restarted.create_session(app_name=APP, user_id=USER, session_id="s1")
+    await restarted.close()
+
+
+@pytest.mark.asyncio
+async def test_writes_are_batched(tmp_path):
+    db_path = str(tmp_path / "sessions.db")
+    service = SqliteSessionService(db_path, batch_size=3, flush_interval_secs=60)
+    session = await service.create_session(app_name=APP, user_id=USER, session_id="s1")
+
+    await service.append_event(session, _event("one"))
+    await service.append_event(session, _event("two"))
+    assert _stored_event_count(db_path) == 0
+    await service.append_event(session, _event("three"))
+    assert _stored_event_count(db_path) == 3
+    assert service.stats["flushes"] == 1
+    await service.close()
+
+
+@pytest.mark.asyncio
+async def test_memory_is_bounded(tmp_path):
+    db_path = str(tmp_path / "sessions.db")
+    service = SqliteSessionService(db_path, max_cached_sessions=1, max_events_in_memory=2)
+    first = await service.create_session(app_name=APP, user_id=USER, session_id="s1")
+    for text in ("a", "b", "c"):
+        await service.append_event(first, _event(text))
+    assert [event.content.parts[0].text for event in first.events] == ["b", "c"]
+
+    await service.create_session(app_name=APP, user_id=USER, session_id="s2")  # Evicts s1
+    assert service.snapshot_stats()["cached_sessions"] == 1
+    reloaded = await service.get_session(app_name=APP, user_id=USER, session_id="s1")
+    assert reloaded is not first
+    assert [event.content.parts[0].text for event in reloaded.events] == ["b", "c"]
+    assert _stored_event_count(db_path) == 3  # Trimmed events are still on disk
+
+    listed = await service.list_sessions(app_name=APP, user_id=USER)
+    assert sorted(s.id for s in listed.sessions) == ["s1", "s2"]
+    await service.delete_session(app_name=APP, user_id=USER, session_id="s1")
+    assert await service.get_session(app_name=APP, user_id=USER, session_id="s1") is None
+    await service.close()
+
+
+@pytest.mark.asyncio
+async def test_sessions_past_retention_are_purged(tmp_path):
+    db_path = str(tmp_path / "sessions.db")
+    service = SqliteSessionService(db_path, max_cached_sessions=1, retention_secs=3600)
+    old = await service.create_session(app_name=APP, user_id=USER, session_id="old")
+    await service.append_event(old, _event("hello"))
+    await service.create_session(app_name=APP, user_id=USER, session_id="cached")  # Evicts "old"
+    later = time.time() + 7200
+
+    assert await service.purge_expired(now=later) == 1  # The cached session may still be live
+    assert await service.get_session(app_name=APP, user_id=USER, session_id="old") is None
+    assert _stored_event_count(db_path) == 0
+    assert await service.get_session(app_name=APP, user_id=USER, session_id="cached") is not None
+    assert service.stats["sessions_expired"] == 1
+
+    service.retention_secs = 0  # Keeps everything
+    await service.create_session(app_name=APP, user_id=USER, session_id="evicts-cached")
+    assert await service.purge_expired(now=later) == 0
+    await service.close()
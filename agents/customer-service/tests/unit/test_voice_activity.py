@@ -0,0 +1,76 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import numpy as np
+import pytest
+
+import voice_activity
+from voice_activity import VoiceActivityGate, frame_levels_dbfs
+
+SAMPLE_RATE = 16000
+PACKET_MS = 100
+
+
+def _pcm(amplitude, ms=PACKET_MS):
+    t = np.arange(SAMPLE_RATE * ms // 1000) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * 440 * t)).astype("<i2").tobytes()
+
+
+SILENCE = _pcm(0)
+NOISE = _pcm(50)  # About -56 dBFS
+SPEECH = _pcm(8000)  # About -15 dBFS
+
+
+def test_frame_levels():
+    levels = frame_levels_dbfs(SPEECH + SILENCE[:320], 320)
+    assert levels.shape == (6,)
+    assert levels[:5] == pytest.approx(-15.2, abs=0.5)
+    assert levels[5] < -80
+    assert frame_levels_dbfs(b"\x01", 320).size == 0
+
+
+def test_silence_is_suppressed_until_speech():
+    gate = VoiceActivityGate(hangover_ms=0, preroll_ms=0)
+    assert gate.filter(SILENCE) == []
+    assert gate.filter(NOISE) == []
+    assert gate.filter(SPEECH) == [SPEECH]
+    assert gate.filter(NOISE) == []
+    assert gate.stats["packets_suppressed"] == 3
+    assert gate.stats["bytes_suppressed"] == 3 * len(SILENCE)
+
+
+def test_hangover_keeps_trailing_silence():
+    gate = VoiceActivityGate(hangover_ms=250, preroll_ms=0)
+    gate.filter(SPEECH)
+    forwarded = [bool(gate.filter(SILENCE)) for _ in range(5)]
+    assert forwarded == [True, True, True, False, False]
+
+
+def test_preroll_is_sent_before_speech_and_not_counted_as_suppressed():
+    gate = VoiceActivityGate(hangover_ms=0, preroll_ms=200)
+    quiet = [_pcm(a) for a in (1, 2, 3)]
+    for packet in quiet:
+        assert gate.filter(packet) == []
+    assert gate.filter(SPEECH) == quiet[1:] + [SPEECH]
+    assert gate.stats["packets_suppressed"] == 1
+    assert gate.stats["packets_forwarded"] == 3
+
+
+def test_process_totals_accumulate_across_gates():
+    before = voice_activity.totals["packets_in"]
+    VoiceActivityGate().filter(SILENCE)
+    VoiceActivityGate().filter(SPEECH)
+    assert voice_activity.totals["packets_in"] == before + 2
+    assert 0.0 <= voice_activity.voice_activity_stats()["suppressed_bytes_ratio"] <= 1.0
@@ -0,0 +1,116 @@
+"""Energy-based voice activity gate for microphone audio before send_realtime.
+
+Every mic packet above MIN_AUDIO_BYTES_THRESHOLD used to reach the model,
+including long runs of silence. VoiceActivityGate splits each packet into
+20 ms frames, computes their RMS level in one vectorised NumPy pass and only
+forwards packets that contain speech:
+
+- A packet is voiced if any frame is louder than `threshold_dbfs`.
+- Hangover: after speech, packets keep flowing for `hangover_ms` so word tails
+  and short pauses survive, and so the Live model's own end-of-turn detection
+  still hears the silence it needs after the user stops talking.
+- Pre-roll: up to `preroll_ms` of the most recent suppressed audio is sent just
+  before the packet that starts speech, so soft onsets aren't clipped.
+"""
+
+import logging
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SAMPLE_RATE = 16000  # The widget records 16kHz 16-bit mono PCM
+DEFAULT_FRAME_MS = 20
+DEFAULT_THRESHOLD_DBFS = -45.0
+DEFAULT_HANGOVER_MS = 1000
+DEFAULT_PREROLL_MS = 200
+
+_INT16_FULL_SCALE = 32768.0
+_STAT_KEYS = ("packets_in", "packets_forwarded", "packets_suppressed", "bytes_in", "bytes_suppressed")
+
+# Process-wide counters across all gates, exported on /metrics.
+totals = dict.fromkeys(_STAT_KEYS, 0)
+
+
+def frame_levels_dbfs(pcm: bytes, frame_samples: int) -> np.ndarray:
+    """RMS level in dBFS of each `frame_samples`-long frame of 16-bit little-endian PCM.
+
+    A trailing partial frame is measured on its own; an odd trailing byte is ignored.
+    """
+    samples = np.frombuffer(pcm, dtype="<i2", count=len(pcm) // 2).astype(np.float32)
+    if samples.size == 0:
+        return np.empty(0, dtype=np.float32)
+    pad = -samples.size % frame_samples
+    frames = np.pad(samples, (0, pad)).reshape(-1, frame_samples)
+    counts = np.full(frames.shape[0], frame_samples, dtype=np.float32)
+    counts[-1] -= pad
+    rms = np.sqrt(np.einsum("ij,ij->i", frames, frames) / counts)
+    return 20.0 * np.log10(np.maximum(rms, 1.0) / _INT16_FULL_SCALE)
+
+
+class VoiceActivityGate:
+    """Per-session speech gate over a stream of PCM packets; see the module docstring."""
+
+    def __init__(
+        self,
+        sample_rate: int = DEFAULT_SAMPLE_RATE,
+        frame_ms: int = DEFAULT_FRAME_MS,
+        threshold_dbfs: float = DEFAULT_THRESHOLD_DBFS,
+        hangover_ms: int = DEFAULT_HANGOVER_MS,
+        preroll_ms: int = DEFAULT_PREROLL_MS,
+    ):
+        self.threshold_dbfs = threshold_dbfs
+        self.frame_samples = max(1, sample_rate * frame_ms // 1000)
+        self.hangover_bytes = sample_rate * hangover_ms // 1000 * 2
+        self.preroll_bytes = sample_rate * preroll_ms // 1000 * 2
+        self._hangover_left = 0  # Bytes still forwarded after the last voiced packet
+        self._preroll = deque()
+        self._preroll_size = 0
+        self.voiced = False  # Whether the last packet passed to filter() contained speech
+        self.stats = dict.fromkeys(_STAT_KEYS, 0)
+
+    def filter(self, pcm: bytes) -> list:
+        """Returns the chunks to forward for this packet, oldest first; empty while silent."""
+        self._count("packets_in", 1)
+        self._count("bytes_in", len(pcm))
+        levels = frame_levels_dbfs(pcm, self.frame_samples)
+        voiced = self.voiced = bool(levels.size) and float(levels.max()) > self.threshold_dbfs
+
+        if voiced:
+            chunks = list(self._preroll) + [pcm]
+            # Pre-roll was counted as suppressed when it arrived; it is forwarded after all.
+            self._count("packets_suppressed", -len(self._preroll))
+            self._count("bytes_suppressed", -self._preroll_size)
+            self._preroll.clear()
+            self._preroll_size = 0
+            self._hangover_left = self.hangover_bytes
+        elif self._hangover_left > 0:
+            chunks = [pcm]
+            self._hangover_left -= len(pcm)
+        else:
+            self._remember(pcm)
+            self._count("packets_suppressed", 1)
+            self._count("bytes_suppressed", len(pcm))
+            return []
+        self._count("packets_forwarded", len(chunks))
+        return chunks
+
+    def _remember(self, pcm: bytes) -> None:
+        self._preroll.append(pcm)
+        self._preroll_size += len(pcm)
+        while len(self._preroll) > 1 and self._preroll_size > self.preroll_bytes:
+            self._preroll_size -= len(self._preroll.popleft())
+        if self._preroll_size > self.preroll_bytes:  # A single packet longer than the pre-roll
+            self._preroll.clear()
+            self._preroll_size = 0
+
+    def _count(self, key: str, amount: int) -> None:
+        self.stats[key] += amount
+        totals[key] += amount
+
+
+def voice_activity_stats() -> dict:
+    """Process-wide gate counters and the share of mic audio that was not forwarded."""
+    suppressed_ratio = totals["bytes_suppressed"] / totals["bytes_in"] if totals["bytes_in"] else 0.0
+    return dict(totals, suppressed_bytes_ratio=round(suppressed_ratio, 4))
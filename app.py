@@ -1,15 +1,24 @@
 # cymbal_home_garden_backend/app.py
 
-import sqlite3
+import os
 import logging
 import json # Added for JSON deserialization
 import time # Added for time.time()
+from urllib.parse import urlencode
 from flask import Flask, jsonify, request, g, render_template
 from werkzeug.exceptions import HTTPException # Added for specific error handling
 from google.cloud import retail_v2
 from google.api_core.exceptions import GoogleAPICallError
 from google.api_core.client_options import ClientOptions # Added for regional endpoint
 from google.auth import default as default_auth_credentials # Added for ADC logging
+from product_catalog import ProductCatalog, project_products
+from db_pool import ConnectionPool
+from cart_engine import CartEngine, CartChangeError
+from product_search import ProductSearch
+from product_pages import fetch_product_page, InvalidCursorError, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from http_caching import ResponseBodyCache, catalog_conditional, init_response_compression
+from local_search import LocalSearchEngine
+from retail_search import LazySearchClient, SearchResultCache, describe_search_result, normalize_query
 
 app = Flask(__name__, template_folder='cymbal_home_garden_backend/templates', static_folder='cymbal_home_garden_backend/static')
 # For serving frontend directly from Flask, uncomment above and adjust paths if frontend is in a sibling folder.
@@ -29,19 +38,68 @@ RETAIL_SERVING_CONFIG_ID = "default_search" # Replace with your Serving Config I
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# In-memory, pre-decoded products snapshot. Reloaded automatically whenever the
+# products table changes (tracked by the catalog_version triggers).
+product_catalog = ProductCatalog()
+
+# FTS5-backed search for the q/name/plant_type filters of /api/products.
+product_search = ProductSearch()
+
+# Set-based cart mutations (one transaction, fixed statement count per request).
+cart_engine = CartEngine()
+
 # --- Database Helper Functions ---
+# Shared by all endpoints: WAL journaling, busy timeout and statement caching are
+# configured once per pooled connection instead of on every request.
+db_pool = ConnectionPool(DATABASE)
+
 def get_db():
     db = getattr(g, '_database', None)
     if db is None:
-        db = g._database = sqlite3.connect(DATABASE)
-        db.row_factory = sqlite3.Row # Access columns by name
+        db = g._database = db_pool.acquire() # Rows are sqlite3.Row (access columns by name)
     return db
 
 @app.teardown_appcontext
 def close_connection(exception):
-    db = getattr(g, '_database', None)
+    db = g.pop('_database', None)
     if db is not None:
-        db.close()
+        db_pool.release(db)
+
+# --- Retail API search client ---
+def _create_search_client():
+    """Resolves ADC once and builds the SearchServiceClient shared by all search requests."""
+    try:
+        credentials, project_id_adc = default_auth_credentials() # project_id_adc to avoid conflict with GCP_PROJECT_ID
+        logger.info(f"ADC using credentials: {credentials}")
+        if hasattr(credentials, 'service_account_email'):
+            logger.info(f"ADC Service Account Email: {credentials.service_account_email}")
+        else:
+            logger.info(f"ADC is likely using user credentials (gcloud auth application-default login). Active project for ADC: {project_id_adc}")
+    except Exception as e:
+        logger.error(f"Error getting ADC: {e}")
+    return retail_v2.SearchServiceClient()
+
+retail_search_client = LazySearchClient(_create_search_client)
+
+# "local" (default): in-process BM25 index over the products table, no network dependency.
+# "retail": Google Cloud Retail API, with the local index as fallback.
+SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'local').lower()
+SEARCH_PAGE_SIZE = 10
+local_search_engine = LocalSearchEngine()
+
+# Hot queries ("lavender", "tomato soil") are answered from memory. Keyed on the
+# normalized query text and serving config; stale entries are served while refreshing.
+retail_search_cache = SearchResultCache(max_entries=512, ttl=300, stale_ttl=1800)
+
+# --- HTTP caching & compression ---
+# Catalog responses carry a weak ETag derived from the catalog version: clients that
+# revalidate get an empty 304, and serialized/compressed bodies are reused until the
+# products table changes. Text/JSON responses are brotli- or gzip-compressed.
+response_cache = ResponseBodyCache()
+init_response_compression(app, response_cache)
+
+def _current_catalog_version():
+    return product_catalog.snapshot(get_db()).version
 
 # --- Error Handlers ---
 @app.errorhandler(404)
@@ -79,82 +137,106 @@ def internal_error(error):
 # --- API Endpoints ---
 
 # === Product Endpoints (SQLite-backed) ===
+MAX_BATCH_PRODUCT_IDS = 100 # Upper bound for GET /api/products?ids=...
+
+def _get_list_param(name):
+    """Reads a list query param given as comma-separated values and/or repeated keys."""
+    values = []
+    for raw_value in request.args.getlist(name):
+        values.extend(value.strip() for value in raw_value.split(',') if value.strip())
+    return values
+
 @app.route('/api/products', methods=['GET'])
+@catalog_conditional(_current_catalog_version, response_cache)
 def get_products():
-    """Lists all products or filters by name/category."""
+    """Lists all products or filters by name/category/plant_type.
+    Full-text search: ?q=lavender drought returns products matching every word in name, description,
+    botanical_name or plant_type, ranked by BM25 (can be combined with the other filters).
+    Batch lookup: ?ids=SKU_1,SKU_2 returns those products in the requested order (other filters are ignored;
+    unknown ids are skipped).
+    Projection: ?fields=id,name,price,image_url limits the keys of every returned product.
+    Pagination: ?limit=50 returns one keyset page; when more results exist the X-Next-Cursor header
+    (and a Link rel="next" header) carries the token to pass back as ?after=... . Paged requests only
+    SELECT the projected columns.
+    """
     logger.info(f"Received GET request for /api/products. Query params: {request.args}")
     query_params = request.args
     name_filter = query_params.get('name')
     category_filter = query_params.get('category')
     plant_type_filter = query_params.get('plant_type') # New filter
+    search_text = (query_params.get('q') or '').strip()
+    requested_ids = _get_list_param('ids')
+    requested_fields = _get_list_param('fields')
 
     db = get_db()
-    cursor = db.cursor()
-    
-    # Select all columns from the products table
-    query = "SELECT * FROM products" # Changed from specific columns to *
-    filters = []
-    params = []
-
-    if name_filter:
-        filters.append("name LIKE ?")
-        params.append(f"%{name_filter}%")
-    if category_filter:
-        filters.append("category = ?")
-        params.append(category_filter)
-    if plant_type_filter: # New filter condition
-        filters.append("plant_type LIKE ?") # Using LIKE for flexibility, e.g. "Perennial" vs "Perennial Shrub"
-        params.append(f"%{plant_type_filter}%")
-    
-    if filters:
-        query += " WHERE " + " AND ".join(filters)
-        
-    cursor.execute(query, params)
-    products_rows = cursor.fetchall()
-    products = []
-    for row in products_rows:
-        product_dict = dict(row)
-        # Deserialize JSON strings back into lists for relevant fields
-        for field in ['flower_color', 'flowering_season', 'pollinator_types', 
-                      'landscape_use', 'companion_plants_ids', 'recommended_soil_ids', 
-                      'recommended_fertilizer_ids', 'harvest_time']:
-            if product_dict.get(field) and isinstance(product_dict[field], str):
-                try:
-                    product_dict[field] = json.loads(product_dict[field])
-                except json.JSONDecodeError:
-                    logger.warning(f"Could not decode JSON for field {field} in product {product_dict['id']}")
-                    product_dict[field] = [] # Default to empty list on error
-            elif product_dict.get(field) is None:
-                 product_dict[field] = [] # Default to empty list if field is None (for consistency in API response)
-        products.append(product_dict)
+    catalog = product_catalog.snapshot(db)
+
+    if requested_fields:
+        unknown_fields = [field for field in requested_fields if field not in catalog.columns]
+        if unknown_fields and catalog.columns:
+            return jsonify({"error": "Bad Request", "message": f"Unknown fields requested: {', '.join(unknown_fields)}"}), 400
+
+    if not requested_ids and ('limit' in query_params or 'after' in query_params):
+        return _get_products_page(db, catalog, requested_fields, category_filter,
+                                  name_filter, plant_type_filter, search_text)
+
+    if requested_ids:
+        if len(requested_ids) > MAX_BATCH_PRODUCT_IDS:
+            return jsonify({"error": "Bad Request", "message": f"At most {MAX_BATCH_PRODUCT_IDS} ids may be requested at once."}), 400
+        products, missing_ids = catalog.get_many(requested_ids)
+        if missing_ids:
+            logger.warning(f"Batch product lookup: {len(missing_ids)} ids not found: {missing_ids}")
+    elif search_text or name_filter or plant_type_filter:
+        matching_ids = product_search.search(db, text=search_text, name=name_filter, plant_type=plant_type_filter)
+        if matching_ids is None:
+            products = catalog.filter(name=name_filter, category=category_filter, plant_type=plant_type_filter, text=search_text)
+        else:
+            products, _ = catalog.get_many(matching_ids)
+            if category_filter:
+                products = [product for product in products if product.get('category') == category_filter]
+    else:
+        products = catalog.filter(category=category_filter)
+
+    if requested_fields:
+        products = project_products(products, requested_fields)
 
     logger.info(f"Returning {len(products)} products from /api/products.")
     return jsonify(products)
 
+def _get_products_page(db, catalog, requested_fields, category_filter, name_filter, plant_type_filter, search_text):
+    """Serves one keyset page of /api/products straight from SQL (see product_pages.py)."""
+    try:
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        return jsonify({"error": "Bad Request", "message": f"limit must be an integer between 1 and {MAX_PAGE_SIZE}."}), 400
+
+    try:
+        products, next_cursor = fetch_product_page(
+            db, requested_fields or catalog.columns, limit=limit, after=request.args.get('after') or None,
+            category=category_filter, name=name_filter, plant_type=plant_type_filter, text=search_text,
+            use_fts=product_search.ensure_index(db))
+    except InvalidCursorError as e:
+        return jsonify({"error": "Bad Request", "message": str(e)}), 400
+
+    response = jsonify(products)
+    if next_cursor:
+        next_args = request.args.to_dict(flat=False)
+        next_args['after'] = [next_cursor]
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = f'<{request.base_url}?{urlencode(next_args, doseq=True)}>; rel="next"'
+    logger.info(f"Returning page of {len(products)} products from /api/products (more: {bool(next_cursor)}).")
+    return response
+
 @app.route('/api/products/<string:product_id>', methods=['GET'])
+@catalog_conditional(_current_catalog_version, response_cache)
 def get_product_detail(product_id):
     """Gets specific product details."""
     logger.info(f"Received GET request for /api/products/{product_id}.")
-    db = get_db()
-    cursor = db.cursor()
-    # Select all columns
-    cursor.execute("SELECT * FROM products WHERE id = ?", (product_id,)) # Changed to *
-    product_row = cursor.fetchone()
+    product = product_catalog.snapshot(get_db()).get(product_id)
     
-    if product_row:
-        product = dict(product_row)
-        # Deserialize JSON strings back into lists for relevant fields
-        for field in ['flower_color', 'flowering_season', 'pollinator_types', 
-                      'landscape_use', 'companion_plants_ids', 'recommended_soil_ids', 
-                      'recommended_fertilizer_ids', 'harvest_time']:
-            if product.get(field) and isinstance(product[field], str):
-                try:
-                    product[field] = json.loads(product[field])
-                except json.JSONDecodeError:
-                    logger.warning(f"Could not decode JSON for field {field} in product {product['id']}")
-                    product[field] = []
-            elif product.get(field) is None:
-                 product[field] = []
+    if product:
         logger.info(f"Returning details for product {product_id}.")
         return jsonify(product)
         
@@ -244,68 +326,7 @@ def modify_cart_endpoint(customer_id):
     items_to_add = data.get('items_to_add', [])
     items_to_remove = data.get('items_to_remove', [])
     
-    db = get_db()
-    cursor = db.cursor()
-    
-    items_added_flag = False
-    items_removed_flag = False
-
-    # Process items to add/update
-    if items_to_add:
-        for item_add in items_to_add:
-            product_id = item_add.get('product_id')
-            quantity_to_add = item_add.get('quantity', 0)
-
-            if not product_id or not isinstance(quantity_to_add, int) or quantity_to_add <= 0:
-                logger.warning(f"Invalid item to add: {item_add} for customer {customer_id}")
-                continue
-
-            # Check product stock
-            cursor.execute("SELECT stock FROM products WHERE id = ?", (product_id,))
-            product_stock_row = cursor.fetchone()
-            if not product_stock_row or product_stock_row['stock'] < quantity_to_add:
-                logger.warning(f"Not enough stock for {product_id} or product does not exist.")
-                # Potentially return a specific error or just skip adding
-                continue
-
-            cursor.execute("SELECT id, quantity FROM cart_items WHERE customer_id = ? AND product_id = ?", (customer_id, product_id))
-            cart_item = cursor.fetchone()
-            
-            if cart_item: # Update quantity if item already in cart
-                new_quantity = cart_item['quantity'] + quantity_to_add
-                # Ensure new quantity doesn't exceed stock (though initial add check should cover this)
-                if new_quantity <= product_stock_row['stock']:
-                    cursor.execute("UPDATE cart_items SET quantity = ? WHERE id = ?", (new_quantity, cart_item['id']))
-                    items_added_flag = True
-                else:
-                    logger.warning(f"Cannot add {quantity_to_add} of {product_id}, exceeds stock for existing cart item.")
-            else: # Add new item to cart
-                cursor.execute("INSERT INTO cart_items (customer_id, product_id, quantity) VALUES (?, ?, ?)",
-                               (customer_id, product_id, quantity_to_add))
-                items_added_flag = True
-    
-    # Process items to remove/decrease quantity
-    if items_to_remove:
-        for item_rem in items_to_remove:
-            product_id = item_rem.get('product_id')
-            quantity_to_remove = item_rem.get('quantity', 0)
-
-            if not product_id or not isinstance(quantity_to_remove, int) or quantity_to_remove <= 0:
-                logger.warning(f"Invalid item to remove: {item_rem} for customer {customer_id}")
-                continue
-
-            cursor.execute("SELECT id, quantity FROM cart_items WHERE customer_id = ? AND product_id = ?", (customer_id, product_id))
-            cart_item = cursor.fetchone()
-
-            if cart_item:
-                if quantity_to_remove >= cart_item['quantity']: # Remove item completely
-                    cursor.execute("DELETE FROM cart_items WHERE id = ?", (cart_item['id'],))
-                else: # Decrease quantity
-                    new_quantity = cart_item['quantity'] - quantity_to_remove
-                    cursor.execute("UPDATE cart_items SET quantity = ? WHERE id = ?", (new_quantity, cart_item['id']))
-                items_removed_flag = True
-    
-    db.commit()
+    items_added_flag, items_removed_flag = cart_engine.modify(get_db(), customer_id, items_to_add, items_to_remove)
     
     message = "Cart updated."
     if not items_added_flag and not items_removed_flag:
@@ -337,51 +358,14 @@ def add_or_update_cart_item(customer_id):
     if not isinstance(quantity, int):
         return jsonify({"error": "'quantity' must be an integer."}), 400
 
-    db = get_db()
-    cursor = db.cursor()
-
-    # Check product existence and stock
-    cursor.execute("SELECT stock FROM products WHERE id = ?", (product_id,))
-    product_stock_row = cursor.fetchone()
-
-    if not product_stock_row:
-        return jsonify({"error": f"Product {product_id} not found."}), 404
-
-    current_stock = product_stock_row['stock']
-
-    cursor.execute("SELECT id, quantity FROM cart_items WHERE customer_id = ? AND product_id = ?", (customer_id, product_id))
-    cart_item = cursor.fetchone()
-
-    if quantity > 0:
-        requested_quantity_increase = quantity # How many to add in this request
-        if cart_item:
-            # Item exists, increment quantity
-            new_quantity = cart_item['quantity'] + requested_quantity_increase
-            # Check against total stock for the *new total quantity*
-            if new_quantity > current_stock:
-                return jsonify({"error": f"Not enough stock for {product_id} to increase quantity to {new_quantity}. Available: {current_stock}, Current in cart: {cart_item['quantity']}"}), 400
-            cursor.execute("UPDATE cart_items SET quantity = ? WHERE id = ?", (new_quantity, cart_item['id']))
-            message = f"Quantity for product {product_id} updated to {new_quantity}."
-        else:
-            # Item does not exist, add new with the given quantity
-            if requested_quantity_increase > current_stock:
-                return jsonify({"error": f"Not enough stock for {product_id}. Available: {current_stock}, Requested: {requested_quantity_increase}"}), 400
-            cursor.execute("INSERT INTO cart_items (customer_id, product_id, quantity) VALUES (?, ?, ?)",
-                           (customer_id, product_id, requested_quantity_increase))
-            message = f"Product {product_id} added to cart with quantity {requested_quantity_increase}."
-    elif quantity <= 0: # Quantity is 0 or negative, remove item or reduce (though DELETE endpoint is better for full removal)
-        if cart_item:
-            # For simplicity with this endpoint, if quantity <=0, we remove the item.
-            # More complex logic could allow reducing quantity if this endpoint was also for that.
-            cursor.execute("DELETE FROM cart_items WHERE id = ?", (cart_item['id'],))
-            message = f"Product {product_id} removed from cart due to quantity <= 0."
-        else:
-            # Trying to set non-existent item to 0 or less quantity - no action needed.
-            message = f"Product {product_id} not in cart, no action taken for quantity <= 0."
-            return jsonify({"status": "no_action", "message": message}), 200
+    try:
+        status, message = cart_engine.add_or_update_item(get_db(), customer_id, product_id, quantity)
+    except CartChangeError as e:
+        return jsonify({"error": e.message}), e.status_code
 
+    if status == "no_action":
+        return jsonify({"status": "no_action", "message": message}), 200
 
-    db.commit()
     logger.info(f"Cart item operation for customer {customer_id}, product {product_id} (quantity {quantity}) resulted in: {message}")
     return jsonify({"status": "success", "message": message}), 200
 
@@ -504,36 +488,40 @@ def conceptual_place_order():
 @app.route('/api/retail/search-products', methods=['POST'])
 def retail_search_products():
     """
-    Queries Google Cloud Retail API for product recommendations.
+    Product search for the storefront and the agent's search_products tool.
+    The backend is selected with SEARCH_BACKEND: "local" (default) answers from the in-process BM25 index
+    over the products table; "retail" queries Google Cloud Retail API and falls back to the local index
+    when the API is not configured or the call fails.
     Expects JSON: {"query": "search_term", "visitor_id": "id"}
     Output matches ADK tool: {'recommendations': [{'product_id': ..., 'name': ..., 'description': ...}, ...]}
     """
-    try:
-        credentials, project_id_adc = default_auth_credentials() # project_id_adc to avoid conflict with GCP_PROJECT_ID
-        logger.info(f"ADC using credentials: {credentials}")
-        if hasattr(credentials, 'service_account_email'):
-            logger.info(f"ADC Service Account Email: {credentials.service_account_email}")
-        else:
-            logger.info(f"ADC is likely using user credentials (gcloud auth application-default login). Active project for ADC: {project_id_adc}")
-    except Exception as e:
-        logger.error(f"Error getting ADC: {e}")
-
-    # Simplified check: if project ID is still the placeholder, assume not configured.
-    # This allows using "default_catalog" and "default_search" if they are actual live IDs.
-    if GCP_PROJECT_ID == "your-gcp-project-id":
-        logger.error("Retail API not configured. GCP_PROJECT_ID is still set to placeholder 'your-gcp-project-id' in app.py.")
-        return jsonify({
-            "error": "Retail API not configured on the server (Project ID not set).",
-            "recommendations": []
-        }), 503 # Service Unavailable
-
     data = request.get_json()
     if not data or 'query' not in data or 'visitor_id' not in data:
         return jsonify({"error": "Invalid JSON payload. 'query' and 'visitor_id' are required."}), 400
 
     search_query = data['query']
     visitor_id = data['visitor_id']
-    
+    catalog = product_catalog.snapshot(get_db()) # id -> name/description from the live products table
+
+    if SEARCH_BACKEND == 'retail':
+        # Simplified check: if project ID is still the placeholder, assume not configured.
+        # This allows using "default_catalog" and "default_search" if they are actual live IDs.
+        if GCP_PROJECT_ID == "your-gcp-project-id":
+            logger.error("Retail API not configured. GCP_PROJECT_ID is still set to placeholder 'your-gcp-project-id' in app.py. Using local search.")
+        else:
+            recommendations = _search_retail(search_query, visitor_id, catalog)
+            if recommendations is not None:
+                return jsonify({"recommendations": recommendations})
+            logger.warning(f"Retail API search failed for query '{search_query}'; answering from the local index.")
+
+    start_time = time.perf_counter()
+    results = local_search_engine.search(catalog, str(search_query), limit=SEARCH_PAGE_SIZE)
+    recommendations = [describe_search_result(product['id'], None, catalog) for product, _ in results]
+    logger.info(f"Local search for '{search_query}' returned {len(recommendations)} results in {(time.perf_counter() - start_time) * 1000:.2f} ms.")
+    return jsonify({"recommendations": recommendations})
+
+def _search_retail(search_query, visitor_id, catalog):
+    """Queries Google Cloud Retail API. Returns recommendations, or None if the call failed."""
     # Construct the placement string for the Retail API
     placement = (
         f"projects/{GCP_PROJECT_ID}/locations/{RETAIL_API_LOCATION}/" 
@@ -541,8 +529,7 @@ def retail_search_products():
     )
 
     #client_options = ClientOptions(api_endpoint=f"{RETAIL_API_LOCATION}-retail.googleapis.com")
-    search_client = retail_v2.SearchServiceClient()
-    
+
     # Construct the full path for the default branch
     # default_branch_name = search_client.branch_path(
     #     GCP_PROJECT_ID, RETAIL_API_LOCATION, RETAIL_CATALOG_ID, "0"  # "0" is the default branch ID
@@ -553,70 +540,51 @@ def retail_search_products():
         # branch=default_branch_name, # Explicitly set the branch - REMOVING TO TEST
         query=search_query,
         visitor_id=visitor_id,
-        page_size=10 # Or configurable
+        page_size=SEARCH_PAGE_SIZE
     )
     
-    recommendations = []
-    try:
+    def fetch_search_results():
+        # Runs on a cache miss, or on a background thread to refresh a stale entry,
+        # so it only talks to the Retail API. Returns (product_id, description) pairs.
+        search_client = retail_search_client.get()
         logger.info(f"Sending search request to Retail API: {search_request}")
         search_response = search_client.search(request=search_request)
-        logger.info(f"Received search response from Retail API: {search_response}")
         logger.info(f"Received search response from Retail API. Results count: {len(search_response.results)}")
-        
-        for result in search_response.results:
-            product = result.product
-            product_id_from_api = result.id # product.id is the fully qualified name
-            
-            # Find the product name from SAMPLE_PRODUCTS using product_id_from_api
-            product_name_from_sample = "Unknown Product" # Default if not found
-            # The following import and list comprehension should ideally be outside the loop or optimized
-            # For simplicity in this diff, it's here. Consider moving SAMPLE_PRODUCTS to a more accessible place if not already.
-            from sample_data_importer import SAMPLE_PRODUCTS
-            found_product_sample = next((p for p in SAMPLE_PRODUCTS if p["id"] == product_id_from_api), None)
-            if found_product_sample:
-                product_name_from_sample = found_product_sample["name"]
-
-            recommendations.append({
-                "product_id": product_id_from_api, # Use the ID directly from the result
-                "name": product_name_from_sample, # Use the name looked up from sample data
-                "description": product.description if hasattr(product, 'description') and product.description else "No description available.",
-            })
-            
+        # result.id is the catalog SKU (result.product.id is the fully qualified name)
+        return tuple((result.id, getattr(result.product, 'description', None)) for result in search_response.results)
+
+    try:
+        cache_key = (normalize_query(search_query), placement)
+        search_results = retail_search_cache.get_or_fetch(cache_key, fetch_search_results)
     except GoogleAPICallError as e:
         logger.error(f"Retail API call failed: {e}")
-        return jsonify({"error": "Failed to query Retail API.", "details": str(e)}), 500
+        return None
     except Exception as e:
         logger.error(f"An unexpected error occurred during Retail API search: {e}")
-        return jsonify({"error": "An unexpected error occurred during search."}), 500
+        return None
 
-    return jsonify({"recommendations": recommendations})
+    return [describe_search_result(product_id, description, catalog) for product_id, description in search_results]
+
+@app.route('/api/retail/search-cache/stats', methods=['GET'])
+def retail_search_cache_stats():
+    """Hit/miss counters of the Retail API search result cache."""
+    return jsonify(retail_search_cache.snapshot_stats())
 
 # === Product Detail Page Route ===
 @app.route('/products/<string:product_id>')
 def product_detail_page(product_id):
     """Serves the product detail page for a given product ID."""
     logger.info(f"Received GET request for product detail page /products/{product_id}.")
-    db = get_db()
-    cursor = db.cursor()
-    cursor.execute("SELECT * FROM products WHERE id = ?", (product_id,))
-    product_row = cursor.fetchone()
-
-    if product_row:
-        product_data = dict(product_row)
-        # Deserialize JSON strings back into lists for relevant fields
-        for field in ['flower_color', 'flowering_season', 'pollinator_types', 
-                      'landscape_use', 'companion_plants_ids', 'recommended_soil_ids', 
-                      'recommended_fertilizer_ids', 'harvest_time', 'attributes']: # Added 'attributes'
-            if product_data.get(field) and isinstance(product_data[field], str):
-                try:
-                    product_data[field] = json.loads(product_data[field])
-                except json.JSONDecodeError:
-                    logger.warning(f"Could not decode JSON for field {field} in product {product_data['id']}")
-                    # Decide on default: empty list or keep as is, or None
-                    product_data[field] = product_data[field] if isinstance(product_data[field], dict) else [] 
-            elif product_data.get(field) is None and field != 'attributes': # attributes can be None
-                 product_data[field] = []
-        
+    product = product_catalog.snapshot(get_db()).get(product_id)
+
+    if product:
+        product_data = dict(product) # Snapshot products are shared; copy before adding page-only fields
+        if product_data.get('attributes') and isinstance(product_data['attributes'], str):
+            try:
+                product_data['attributes'] = json.loads(product_data['attributes'])
+            except json.JSONDecodeError:
+                logger.warning(f"Could not decode JSON for field attributes in product {product_data['id']}")
+
         # Ensure attributes is a dict if it's None or empty list after potential deserialization
         if not isinstance(product_data.get('attributes'), dict):
             product_data['attributes'] = {}
@@ -0,0 +1,170 @@
+# cymbal_home_garden_backend/benchmark_db_pool.py
+#
+# Multi-threaded read/write throughput benchmark for the SQLite connection layer.
+# Runs app.py under Werkzeug's threaded WSGI server twice against identical copies
+# of the sample database:
+#   - "per-request": the old behaviour (sqlite3.connect per request, rollback journal)
+#   - "pooled":      db_pool.ConnectionPool (WAL, busy timeout, statement cache)
+#
+# Usage: python benchmark_db_pool.py [--threads 16] [--seconds 10] [--write-ratio 0.2]
+
+import argparse
+import logging
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+import requests
+from werkzeug.serving import make_server
+
+logger = logging.getLogger(__name__)
+
+
+class PerRequestConnections:
+    """Baseline with the same acquire/release interface as ConnectionPool.
+
+    Opens a fresh rollback-journal connection per request and closes it afterwards,
+    which is what get_db()/close_connection did before the pool was introduced.
+    """
+
+    def __init__(self, database):
+        self.database = database
+
+    def acquire(self):
+        conn = sqlite3.connect(self.database)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def release(self, conn):
+        conn.close()
+
+
+def build_database(path, journal_mode):
+    """Creates the schema and sample data in `path` with the given journal mode."""
+    from database_setup import create_tables
+    from sample_data_importer import insert_sample_data
+
+    workdir = os.path.dirname(path)
+    cwd = os.getcwd()
+    os.chdir(workdir)  # The setup scripts write to ./ecommerce.db
+    try:
+        create_tables()
+        insert_sample_data()
+    finally:
+        os.chdir(cwd)
+    built = os.path.join(workdir, 'ecommerce.db')
+    if built != path:
+        shutil.move(built, path)
+    conn = sqlite3.connect(path)
+    conn.execute(f"PRAGMA journal_mode={journal_mode}")
+    conn.close()
+
+
+def run_load(base_url, product_ids, threads, seconds, write_ratio):
+    """Hammers the API from `threads` client threads; returns per-kind latencies."""
+    stop_at = time.perf_counter() + seconds
+    results = {"read": [], "write": [], "errors": 0}
+    results_lock = threading.Lock()
+
+    def worker(worker_id):
+        session = requests.Session()
+        rng = random.Random(worker_id)
+        customer_id = f"bench_customer_{worker_id}"
+        reads, writes, errors = [], [], 0
+        while time.perf_counter() < stop_at:
+            product_id = rng.choice(product_ids)
+            is_write = rng.random() < write_ratio
+            start = time.perf_counter()
+            try:
+                if is_write:
+                    key = "items_to_add" if rng.random() < 0.5 else "items_to_remove"
+                    response = session.post(f"{base_url}/api/cart/modify/{customer_id}",
+                                            json={key: [{"product_id": product_id, "quantity": 1}]}, timeout=30)
+                elif rng.random() < 0.5:
+                    response = session.get(f"{base_url}/api/cart/{customer_id}", timeout=30)
+                else:
+                    response = session.get(f"{base_url}/api/products/availability/{product_id}/pickup", timeout=30)
+                ok = response.status_code < 500
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - start
+            if not ok:
+                errors += 1
+            elif is_write:
+                writes.append(elapsed)
+            else:
+                reads.append(elapsed)
+        with results_lock:
+            results["read"].extend(reads)
+            results["write"].extend(writes)
+            results["errors"] += errors
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return results
+
+
+def summarize(label, results, seconds):
+    def pct(values, q):
+        if not values:
+            return 0.0
+        return statistics.quantiles(values, n=100)[q - 1] * 1000 if len(values) > 1 else values[0] * 1000
+
+    total = len(results["read"]) + len(results["write"])
+    print(f"{label:>12}: {total / seconds:8.1f} req/s  "
+          f"reads {len(results['read']) / seconds:8.1f}/s (p50 {pct(results['read'], 50):6.2f} ms, p99 {pct(results['read'], 99):7.2f} ms)  "
+          f"writes {len(results['write']) / seconds:7.1f}/s (p50 {pct(results['write'], 50):6.2f} ms, p99 {pct(results['write'], 99):7.2f} ms)  "
+          f"errors {results['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Threaded read/write benchmark: per-request connections vs. the WAL connection pool.')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    parser.add_argument('--port', type=int, default=5099)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    import app as app_module
+    from db_pool import ConnectionPool
+    from sample_data_importer import SAMPLE_PRODUCTS
+    logging.getLogger().setLevel(logging.WARNING)  # app.py configures DEBUG logging on import
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    product_ids = [p["id"] for p in SAMPLE_PRODUCTS]
+    workdir = tempfile.mkdtemp(prefix='db_pool_bench_')
+    try:
+        modes = [
+            ("per-request", "DELETE", PerRequestConnections),
+            ("pooled", "WAL", lambda database: ConnectionPool(database, max_size=args.threads)),
+        ]
+        for label, journal_mode, factory in modes:
+            db_path = os.path.join(workdir, f"{label}.db")
+            build_database(db_path, journal_mode)
+            app_module.db_pool = factory(db_path)
+
+            server = make_server('127.0.0.1', args.port, app_module.app, threaded=True)
+            server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+            server_thread.start()
+            try:
+                results = run_load(f"http://127.0.0.1:{args.port}", product_ids,
+                                   args.threads, args.seconds, args.write_ratio)
+            finally:
+                server.shutdown()
+                server_thread.join()
+            summarize(label, results, args.seconds)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
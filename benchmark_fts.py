@@ -0,0 +1,136 @@
+# cymbal_home_garden_backend/benchmark_fts.py
+#
+# Compares product search on a synthetic catalog (100k+ SKUs by default):
+#   - "like": the old SQL path, SELECT ... WHERE name LIKE '%term%' (full table scan)
+#   - "fts":  product_search.ProductSearch over the products_fts FTS5 index
+#             (filters in catalog order, free text ranked by BM25)
+#
+# Usage: python benchmark_fts.py [--products 100000] [--repeat 20]
+
+import argparse
+import logging
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+ADJECTIVES = ['Dwarf', 'Giant', 'Golden', 'Variegated', 'Compact', 'Trailing', 'Hardy', 'Scented',
+              'Purple', 'Silver', 'Early', 'Late', 'Wild', 'Royal', 'Miniature', 'Weeping']
+PLANTS = ['Lavender', 'Rosemary', 'Tomato', 'Basil', 'Hydrangea', 'Hosta', 'Fern', 'Maple',
+          'Sage', 'Mint', 'Rose', 'Juniper', 'Boxwood', 'Clematis', 'Peony', 'Dahlia',
+          'Coneflower', 'Salvia', 'Thyme', 'Oregano', 'Pepper', 'Cucumber', 'Begonia', 'Petunia']
+PLANT_TYPES = ['Perennial Shrub', 'Perennial Herb/Shrub', 'Annual Herb', 'Annual Vegetable',
+               'Deciduous Tree', 'Evergreen Shrub', 'Perennial Flower', 'Annual Flower', 'Vine']
+CATEGORIES = ['Plants', 'Soil', 'Fertilizers', 'Pots', 'Tools', 'Seeds']
+DESCRIPTION_WORDS = ['drought', 'tolerant', 'pollinator', 'friendly', 'fragrant', 'foliage', 'shade',
+                     'full', 'sun', 'container', 'border', 'edible', 'low', 'maintenance', 'deer',
+                     'resistant', 'compact', 'habit', 'long', 'blooming', 'hardy', 'winter', 'evergreen']
+
+# (label, keyword arguments for ProductSearch.search, equivalent LIKE query)
+QUERIES = [
+    ("name=Lavender", {"name": "Lavender"},
+     "SELECT * FROM products WHERE name LIKE ?", ("%Lavender%",)),
+    ("name=Golden Hosta", {"name": "Golden Hosta"},
+     "SELECT * FROM products WHERE name LIKE ?", ("%Golden Hosta%",)),
+    ("plant_type=Herb", {"plant_type": "Herb"},
+     "SELECT * FROM products WHERE plant_type LIKE ?", ("%Herb%",)),
+    ("name=NoSuchPlant", {"name": "NoSuchPlant"},
+     "SELECT * FROM products WHERE name LIKE ?", ("%NoSuchPlant%",)),
+    ("q=drought lavender", {"text": "drought lavender"},
+     "SELECT * FROM products WHERE (name || ' ' || IFNULL(description, '') || ' ' || IFNULL(botanical_name, '') || ' ' || IFNULL(plant_type, '')) LIKE ? "
+     "AND (name || ' ' || IFNULL(description, '') || ' ' || IFNULL(botanical_name, '') || ' ' || IFNULL(plant_type, '')) LIKE ?",
+     ("%drought%", "%lavender%")),
+]
+
+
+def build_catalog(path, product_count, seed=42):
+    """Creates the schema in `path` and fills products with synthetic SKUs. Returns load seconds."""
+    from database_setup import create_tables
+
+    workdir = os.path.dirname(path)
+    cwd = os.getcwd()
+    os.chdir(workdir)  # database_setup writes to ./ecommerce.db
+    try:
+        create_tables()
+    finally:
+        os.chdir(cwd)
+    built = os.path.join(workdir, 'ecommerce.db')
+    if built != path:
+        shutil.move(built, path)
+
+    rng = random.Random(seed)
+    rows = []
+    for i in range(product_count):
+        plant = rng.choice(PLANTS)
+        name = f"{rng.choice(ADJECTIVES)} {plant} '{rng.choice(ADJECTIVES)} {i}'"
+        description = ' '.join(rng.choice(DESCRIPTION_WORDS) for _ in range(rng.randint(12, 30)))
+        rows.append((f"SKU_SYN_{i:07d}", name, description, rng.choice(CATEGORIES),
+                     round(rng.uniform(2, 80), 2), f"{plant}us {rng.choice(DESCRIPTION_WORDS)}a",
+                     rng.choice(PLANT_TYPES), rng.randint(0, 200)))
+
+    conn = sqlite3.connect(path)
+    start = time.perf_counter()
+    conn.executemany(
+        "INSERT INTO products (id, name, description, category, price, botanical_name, plant_type, stock) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed
+
+
+def time_query(fn, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Product search benchmark: LIKE scans vs. the FTS5 index.')
+    parser.add_argument('--products', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+    from product_search import ProductSearch
+
+    workdir = tempfile.mkdtemp(prefix='fts_bench_')
+    try:
+        db_path = os.path.join(workdir, 'catalog.db')
+        load_seconds = build_catalog(db_path, args.products)
+        print(f"Inserted {args.products} synthetic products in {load_seconds:.2f}s (FTS index maintained by triggers).")
+
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        search = ProductSearch()
+        # Trigger-maintained, so the index is already complete; this only warms it up.
+        search.search(conn, name="warmup")
+
+        print(f"{'query':>20} | {'LIKE ms':>9} {'rows':>7} | {'FTS ms':>9} {'rows':>7} | speedup")
+        for label, search_kwargs, like_sql, like_params in QUERIES:
+            like_ms, like_rows = time_query(lambda: conn.execute(like_sql, like_params).fetchall(), args.repeat)
+            fts_ms, fts_ids = time_query(lambda: search.search(conn, **search_kwargs), args.repeat)
+            if fts_ids is None:
+                print(f"{label:>20} | FTS could not answer this query (no FTS5/trigram support?)")
+                continue
+            if len(fts_ids) != len(like_rows):
+                logger.warning(f"{label}: LIKE returned {len(like_rows)} rows but FTS returned {len(fts_ids)}.")
+            speedup = like_ms / fts_ms if fts_ms else float('inf')
+            print(f"{label:>20} | {like_ms:9.2f} {len(like_rows):7d} | {fts_ms:9.2f} {len(fts_ids):7d} | {speedup:6.1f}x")
+        conn.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
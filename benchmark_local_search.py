@@ -0,0 +1,82 @@
+# cymbal_home_garden_backend/benchmark_local_search.py
+#
+# Index build time and query latency of the in-process search backend
+# (local_search.LocalSearchIndex) on the sample catalog plus a synthetic one.
+# No network or database needed: products are generated in memory with the
+# same vocabulary as benchmark_fts.py.
+#
+# Usage: python benchmark_local_search.py [--products 100000] [--queries 2000]
+
+import argparse
+import random
+import statistics
+import time
+
+from benchmark_fts import ADJECTIVES, PLANTS, PLANT_TYPES, CATEGORIES, DESCRIPTION_WORDS
+
+QUERIES = ["lavender", "tomato soil", "red pots", "drought tolerant shrub", "golden hosta",
+           "pollinator friendly perennial", "herb", "container evergreen", "nosuchplant"]
+
+
+def synthetic_products(count, seed=42):
+    rng = random.Random(seed)
+    products = []
+    for i in range(count):
+        plant = rng.choice(PLANTS)
+        products.append({
+            "id": f"SKU_SYN_{i:07d}",
+            "name": f"{rng.choice(ADJECTIVES)} {plant} '{rng.choice(ADJECTIVES)} {i}'",
+            "description": ' '.join(rng.choice(DESCRIPTION_WORDS) for _ in range(rng.randint(12, 30))),
+            "category": rng.choice(CATEGORIES),
+            "botanical_name": f"{plant}us {rng.choice(DESCRIPTION_WORDS)}a",
+            "plant_type": rng.choice(PLANT_TYPES),
+            "flower_color": [rng.choice(["Purple", "Red", "White", "Yellow", "Blue"])],
+            "drought_tolerant": rng.random() < 0.3,
+            "stock": rng.randint(0, 200),
+        })
+    return products
+
+
+def run(label, products, query_count):
+    from local_search import LocalSearchIndex
+
+    start = time.perf_counter()
+    index = LocalSearchIndex(products)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    timings = []
+    for i in range(query_count):
+        query = QUERIES[i % len(QUERIES)]
+        start = time.perf_counter()
+        index.search(query, limit=10)
+        timings.append((time.perf_counter() - start) * 1000)
+    p50 = statistics.median(timings)
+    p99 = statistics.quantiles(timings, n=100)[98] if len(timings) > 1 else timings[0]
+    print(f"{label:>18}: {len(products):7d} products, {len(index.postings):6d} terms, "
+          f"build {build_ms:8.1f} ms, query p50 {p50:7.3f} ms, p99 {p99:7.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local BM25 search backend benchmark.')
+    parser.add_argument('--products', type=int, default=100_000)
+    parser.add_argument('--queries', type=int, default=2000)
+    args = parser.parse_args()
+
+    import json
+    from product_catalog import JSON_LIST_FIELDS
+    from sample_data_importer import SAMPLE_PRODUCTS
+
+    sample = []
+    for product in SAMPLE_PRODUCTS:  # Decode JSON list columns the way the catalog snapshot does
+        decoded = dict(product)
+        for field in JSON_LIST_FIELDS:
+            if isinstance(decoded.get(field), str):
+                decoded[field] = json.loads(decoded[field])
+        sample.append(decoded)
+
+    run("sample catalog", sample, args.queries)
+    run("synthetic catalog", synthetic_products(args.products), max(args.queries // 10, 50))
+
+
+if __name__ == '__main__':
+    main()
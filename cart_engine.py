@@ -0,0 +1,208 @@
+# cymbal_home_garden_backend/cart_engine.py
+
+import logging
+import json
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+CART_INDEX_NAME = 'idx_cart_items_customer_product'
+
+# Product id lists are passed as one JSON array parameter (json_each) so the
+# statement text never changes with payload size and stays in the statement cache.
+_SELECT_STOCK_SQL = "SELECT id, stock FROM products WHERE id IN (SELECT value FROM json_each(?))"
+_SELECT_CART_SQL = (
+    "SELECT product_id, quantity FROM cart_items "
+    "WHERE customer_id = ? AND product_id IN (SELECT value FROM json_each(?))"
+)
+_UPSERT_CART_SQL = (
+    "INSERT INTO cart_items (customer_id, product_id, quantity) VALUES (?, ?, ?) "
+    "ON CONFLICT(customer_id, product_id) DO UPDATE SET quantity = excluded.quantity"
+)
+_DELETE_CART_SQL = (
+    "DELETE FROM cart_items "
+    "WHERE customer_id = ? AND product_id IN (SELECT value FROM json_each(?))"
+)
+
+
+def ensure_cart_index(conn):
+    """Creates the unique (customer_id, product_id) index, merging duplicate lines first.
+
+    Older databases could hold several rows for the same product in one cart;
+    they are collapsed into the oldest row with the summed quantity.
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (CART_INDEX_NAME,)
+    ).fetchone()
+    if exists:
+        return
+    cursor = conn.cursor()
+    cursor.execute('''
+        UPDATE cart_items SET quantity = (
+            SELECT SUM(c2.quantity) FROM cart_items c2
+            WHERE c2.customer_id = cart_items.customer_id AND c2.product_id = cart_items.product_id
+        )
+        WHERE id IN (SELECT MIN(id) FROM cart_items GROUP BY customer_id, product_id HAVING COUNT(*) > 1)
+    ''')
+    cursor.execute('''
+        DELETE FROM cart_items
+        WHERE id NOT IN (SELECT MIN(id) FROM cart_items GROUP BY customer_id, product_id)
+    ''')
+    if cursor.rowcount:
+        logger.info(f"Merged {cursor.rowcount} duplicate cart_items rows before creating {CART_INDEX_NAME}.")
+    cursor.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {CART_INDEX_NAME} ON cart_items (customer_id, product_id)")
+    conn.commit()
+
+
+class CartChangeError(Exception):
+    """A single-item cart change was rejected; carries the HTTP status for the API."""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class CartEngine:
+    """Set-based cart mutations.
+
+    Every request runs inside one write transaction and costs a fixed number of
+    statements regardless of payload size: one stock lookup, one cart lookup, one
+    batched UPSERT and one batched DELETE. The per-item rules (stock limits,
+    partial removals, invalid items being skipped) are applied in memory against
+    the state read at the start of the transaction, in payload order.
+    """
+
+    def __init__(self):
+        self._index_ready = False
+
+    @contextmanager
+    def _write_transaction(self, conn):
+        if not self._index_ready:
+            ensure_cart_index(conn)
+            self._index_ready = True
+        if conn.in_transaction:
+            conn.commit()
+        # IMMEDIATE takes the write lock up front, so the stock/cart state we read
+        # cannot change before our writes land.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+
+    @staticmethod
+    def _load_state(conn, customer_id, product_ids):
+        ids_json = json.dumps(list(product_ids))
+        stocks = {row[0]: row[1] for row in conn.execute(_SELECT_STOCK_SQL, (ids_json,))}
+        quantities = {row[0]: row[1] for row in conn.execute(_SELECT_CART_SQL, (customer_id, ids_json))}
+        return stocks, quantities
+
+    @staticmethod
+    def _save_state(conn, customer_id, before, after):
+        upserts = [(customer_id, product_id, quantity)
+                   for product_id, quantity in after.items() if before.get(product_id) != quantity]
+        deletes = [product_id for product_id in before if product_id not in after]
+        if upserts:
+            conn.executemany(_UPSERT_CART_SQL, upserts)
+        if deletes:
+            conn.execute(_DELETE_CART_SQL, (customer_id, json.dumps(deletes)))
+
+    def modify(self, conn, customer_id, items_to_add, items_to_remove):
+        """Applies an add/remove payload. Returns (items_added, items_removed) flags.
+
+        Invalid items, unknown products and additions exceeding stock are skipped
+        with a warning, matching the /api/cart/modify contract.
+        """
+        valid_adds = []
+        for item_add in items_to_add or []:
+            product_id = item_add.get('product_id')
+            quantity_to_add = item_add.get('quantity', 0)
+            if not product_id or not isinstance(quantity_to_add, int) or quantity_to_add <= 0:
+                logger.warning(f"Invalid item to add: {item_add} for customer {customer_id}")
+                continue
+            valid_adds.append((product_id, quantity_to_add))
+
+        valid_removes = []
+        for item_rem in items_to_remove or []:
+            product_id = item_rem.get('product_id')
+            quantity_to_remove = item_rem.get('quantity', 0)
+            if not product_id or not isinstance(quantity_to_remove, int) or quantity_to_remove <= 0:
+                logger.warning(f"Invalid item to remove: {item_rem} for customer {customer_id}")
+                continue
+            valid_removes.append((product_id, quantity_to_remove))
+
+        if not valid_adds and not valid_removes:
+            return False, False
+
+        items_added_flag = False
+        items_removed_flag = False
+        product_ids = {product_id for product_id, _ in valid_adds} | {product_id for product_id, _ in valid_removes}
+
+        with self._write_transaction(conn):
+            stocks, before = self._load_state(conn, customer_id, product_ids)
+            after = dict(before)
+
+            for product_id, quantity_to_add in valid_adds:
+                stock = stocks.get(product_id)
+                if stock is None or stock < quantity_to_add:
+                    logger.warning(f"Not enough stock for {product_id} or product does not exist.")
+                    continue
+                new_quantity = after.get(product_id, 0) + quantity_to_add
+                if new_quantity <= stock:
+                    after[product_id] = new_quantity
+                    items_added_flag = True
+                else:
+                    logger.warning(f"Cannot add {quantity_to_add} of {product_id}, exceeds stock for existing cart item.")
+
+            for product_id, quantity_to_remove in valid_removes:
+                current_quantity = after.get(product_id)
+                if current_quantity is None:
+                    continue
+                if quantity_to_remove >= current_quantity:
+                    del after[product_id]
+                else:
+                    after[product_id] = current_quantity - quantity_to_remove
+                items_removed_flag = True
+
+            self._save_state(conn, customer_id, before, after)
+
+        return items_added_flag, items_removed_flag
+
+    def add_or_update_item(self, conn, customer_id, product_id, quantity):
+        """Adds `quantity` of a product (or removes the line when quantity <= 0).
+
+        Returns (status, message). Raises CartChangeError for unknown products or
+        insufficient stock.
+        """
+        with self._write_transaction(conn):
+            stocks, before = self._load_state(conn, customer_id, {product_id})
+            if product_id not in stocks:
+                raise CartChangeError(f"Product {product_id} not found.", 404)
+            current_stock = stocks[product_id]
+            current_quantity = before.get(product_id)
+            after = dict(before)
+
+            if quantity > 0:
+                if current_quantity is not None:
+                    new_quantity = current_quantity + quantity
+                    if new_quantity > current_stock:
+                        raise CartChangeError(f"Not enough stock for {product_id} to increase quantity to {new_quantity}. Available: {current_stock}, Current in cart: {current_quantity}")
+                    after[product_id] = new_quantity
+                    message = f"Quantity for product {product_id} updated to {new_quantity}."
+                else:
+                    if quantity > current_stock:
+                        raise CartChangeError(f"Not enough stock for {product_id}. Available: {current_stock}, Requested: {quantity}")
+                    after[product_id] = quantity
+                    message = f"Product {product_id} added to cart with quantity {quantity}."
+            elif current_quantity is not None:
+                del after[product_id]
+                message = f"Product {product_id} removed from cart due to quantity <= 0."
+            else:
+                return "no_action", f"Product {product_id} not in cart, no action taken for quantity <= 0."
+
+            self._save_state(conn, customer_id, before, after)
+        return "success", message
@@ -0,0 +1,128 @@
+# cymbal_home_garden_backend/customer_store.py
+
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Customer profiles read by the customer service agent
+# (agents/customer-service/customer_service/entities/customer_repository.py).
+# Every per-customer lookup is by primary key or a (customer_id, ...) index.
+CUSTOMER_TABLES_DDL = (
+    '''
+    CREATE TABLE IF NOT EXISTS customers (
+        customer_id TEXT PRIMARY KEY,
+        account_number TEXT NOT NULL UNIQUE,
+        first_name TEXT NOT NULL,
+        last_name TEXT NOT NULL,
+        email TEXT NOT NULL,
+        phone_number TEXT,
+        customer_start_date TEXT,                 -- ISO date, e.g. "2022-06-10"
+        years_as_customer INTEGER NOT NULL DEFAULT 0,
+        loyalty_points INTEGER NOT NULL DEFAULT 0,
+        preferred_store TEXT,
+        email_opt_in BOOLEAN NOT NULL DEFAULT TRUE,
+        sms_opt_in BOOLEAN NOT NULL DEFAULT TRUE,
+        push_opt_in BOOLEAN NOT NULL DEFAULT TRUE,
+        scheduled_appointments TEXT NOT NULL DEFAULT '{}'  -- JSON object
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS addresses (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        customer_id TEXT NOT NULL,
+        address_type TEXT NOT NULL DEFAULT 'billing',
+        street TEXT NOT NULL,
+        city TEXT NOT NULL,
+        state TEXT NOT NULL,
+        zip TEXT NOT NULL,
+        UNIQUE (customer_id, address_type),
+        FOREIGN KEY (customer_id) REFERENCES customers (customer_id) ON DELETE CASCADE
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS purchases (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        customer_id TEXT NOT NULL,
+        purchase_date TEXT NOT NULL,
+        items TEXT NOT NULL,                      -- JSON array: '[{"product_id": ..., "name": ..., "quantity": 1}]'
+        total_amount REAL NOT NULL,
+        FOREIGN KEY (customer_id) REFERENCES customers (customer_id) ON DELETE CASCADE
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_purchases_customer_date ON purchases (customer_id, purchase_date)",
+    '''
+    CREATE TABLE IF NOT EXISTS garden_profile (
+        customer_id TEXT PRIMARY KEY,
+        type TEXT NOT NULL,                       -- e.g. "backyard", "balcony"
+        size TEXT NOT NULL,
+        sun_exposure TEXT NOT NULL,
+        soil_type TEXT NOT NULL,
+        interests TEXT NOT NULL DEFAULT '[]',     -- JSON string array
+        FOREIGN KEY (customer_id) REFERENCES customers (customer_id) ON DELETE CASCADE
+    )
+    ''',
+)
+
+
+def ensure_customer_tables(conn):
+    """Creates the customer profile tables and indexes if they do not exist."""
+    cursor = conn.cursor()
+    for statement in CUSTOMER_TABLES_DDL:
+        cursor.execute(statement)
+    conn.commit()
+
+
+def save_customer(conn, profile):
+    """Inserts or replaces one customer profile.
+
+    `profile` has the agent's Customer JSON shape (billing_address,
+    purchase_history, communication_preferences, garden_profile, ...).
+    The caller commits.
+    """
+    customer_id = profile['customer_id']
+    preferences = profile.get('communication_preferences') or {}
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO customers (customer_id, account_number, first_name, last_name, email, phone_number,
+                               customer_start_date, years_as_customer, loyalty_points, preferred_store,
+                               email_opt_in, sms_opt_in, push_opt_in, scheduled_appointments)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(customer_id) DO UPDATE SET
+            account_number = excluded.account_number, first_name = excluded.first_name,
+            last_name = excluded.last_name, email = excluded.email, phone_number = excluded.phone_number,
+            customer_start_date = excluded.customer_start_date, years_as_customer = excluded.years_as_customer,
+            loyalty_points = excluded.loyalty_points, preferred_store = excluded.preferred_store,
+            email_opt_in = excluded.email_opt_in, sms_opt_in = excluded.sms_opt_in,
+            push_opt_in = excluded.push_opt_in, scheduled_appointments = excluded.scheduled_appointments
+    ''', (
+        customer_id, profile['account_number'], profile['customer_first_name'], profile['customer_last_name'],
+        profile['email'], profile.get('phone_number'), profile.get('customer_start_date'),
+        profile.get('years_as_customer', 0), profile.get('loyalty_points', 0), profile.get('preferred_store'),
+        preferences.get('email', True), preferences.get('sms', True), preferences.get('push_notifications', True),
+        json.dumps(profile.get('scheduled_appointments') or {}),
+    ))
+
+    cursor.execute("DELETE FROM addresses WHERE customer_id = ?", (customer_id,))
+    address = profile.get('billing_address')
+    if address:
+        cursor.execute(
+            "INSERT INTO addresses (customer_id, address_type, street, city, state, zip) VALUES (?, 'billing', ?, ?, ?, ?)",
+            (customer_id, address['street'], address['city'], address['state'], address['zip']),
+        )
+
+    cursor.execute("DELETE FROM purchases WHERE customer_id = ?", (customer_id,))
+    cursor.executemany(
+        "INSERT INTO purchases (customer_id, purchase_date, items, total_amount) VALUES (?, ?, ?, ?)",
+        [(customer_id, purchase['date'], json.dumps(purchase['items']), purchase['total_amount'])
+         for purchase in profile.get('purchase_history') or []],
+    )
+
+    cursor.execute("DELETE FROM garden_profile WHERE customer_id = ?", (customer_id,))
+    garden = profile.get('garden_profile')
+    if garden:
+        cursor.execute(
+            "INSERT INTO garden_profile (customer_id, type, size, sun_exposure, soil_type, interests) VALUES (?, ?, ?, ?, ?, ?)",
+            (customer_id, garden['type'], garden['size'], garden['sun_exposure'], garden['soil_type'],
+             json.dumps(garden.get('interests') or [])),
+        )
@@ -37,6 +37,7 @@ document.addEventListener('DOMContentLoaded', () => {
  
     let websocket = null;
     let currentSessionId = null;
+    let resumeToken = null; // Issued by the server; reconnects with it resume the same conversation
     let isWsAudioMode = false; // Reflects the actual mode of the current/last WebSocket connection
     let userDesiredAudioMode = false; // User's intent, toggled by mic button
     console.log(`[AgentWidgetDebug] Initial state: userDesiredAudioMode=${userDesiredAudioMode}, isWsAudioMode=${isWsAudioMode}`);
@@ -74,6 +75,47 @@ let initialGreetingSent = false; // Tracks if the first user message/greeting ha
         return window.btoa(binary);
     }
 
+    // Binary audio frames (see agents/customer-service/audio_frames.py). The subprotocol is
+    // offered in the handshake; audio goes binary only if the server selects it.
+    const BINARY_AUDIO_SUBPROTOCOL = "adk-audio-binary.v1";
+    const AUDIO_FRAME_VERSION = 1;
+    const AUDIO_FRAME_TYPE_PCM = 0x01;
+    const AUDIO_FRAME_HEADER_BYTES = 4;
+    let audioFrameSequence = 0;
+
+    function isBinaryAudioNegotiated() {
+        return !!websocket && websocket.protocol === BINARY_AUDIO_SUBPROTOCOL;
+    }
+
+    function encodeAudioFrame(pcmBytes) {
+        const frame = new Uint8Array(AUDIO_FRAME_HEADER_BYTES + pcmBytes.byteLength);
+        const header = new DataView(frame.buffer);
+        header.setUint8(0, AUDIO_FRAME_VERSION);
+        header.setUint8(1, AUDIO_FRAME_TYPE_PCM);
+        header.setUint16(2, audioFrameSequence, false); // Big-endian, wraps at 65536
+        audioFrameSequence = (audioFrameSequence + 1) & 0xffff;
+        frame.set(pcmBytes, AUDIO_FRAME_HEADER_BYTES);
+        return frame.buffer;
+    }
+
+    function decodeAudioFrame(frameBuffer) {
+        if (frameBuffer.byteLength < AUDIO_FRAME_HEADER_BYTES) return null;
+        const header = new DataView(frameBuffer);
+        if (header.getUint8(0) !== AUDIO_FRAME_VERSION || header.getUint8(1) !== AUDIO_FRAME_TYPE_PCM) return null;
+        return frameBuffer.slice(AUDIO_FRAME_HEADER_BYTES);
+    }
+
+    function sendAudioToServer(pcmBytes) {
+        if (isBinaryAudioNegotiated() && websocket.readyState === WebSocket.OPEN) {
+            websocket.send(encodeAudioFrame(pcmBytes));
+            return;
+        }
+        sendMessageToServer({
+            mime_type: "audio/pcm",
+            data: arrayBufferToBase64(pcmBytes.buffer),
+        });
+    }
+
     function base64ToArrayBuffer(base64) {
         const binaryString = window.atob(base64);
         const len = binaryString.length;
@@ -209,12 +251,7 @@ let initialGreetingSent = false; // Tracks if the first user message/greeting ha
                 concatenatedBuffer.set(new Uint8Array(chunk), offset);
                 offset += chunk.byteLength;
             }
-            const base64Data = arrayBufferToBase64(concatenatedBuffer.buffer);
-            const actualSampleRate = 16000;
-             sendMessageToServer({
-                mime_type: "audio/pcm",
-                data: base64Data,
-            });
+            sendAudioToServer(concatenatedBuffer);
             console.log(`[AudioStop] Sent remaining ${concatenatedBuffer.byteLength} bytes.`);
         }
         audioChunkBuffer = []; // Clear buffer on stop
@@ -301,15 +338,8 @@ let initialGreetingSent = false; // Tracks if the first user message/greeting ha
             }
             audioChunkBuffer = []; 
 
-            const base64Data = arrayBufferToBase64(concatenatedBuffer.buffer);
-            const actualSampleRate = 16000; 
-            
-            // console.log(`[AudioSend] Sending buffered audio. Total bytes: ${concatenatedBuffer.byteLength}, Sample rate: ${actualSampleRate}, Base64 length: ${base64Data.length}`); // Original log
-            
-            sendMessageToServer({
-                mime_type: "audio/pcm",
-                data: base64Data,
-            });
+            // console.log(`[AudioSend] Sending buffered audio. Total bytes: ${concatenatedBuffer.byteLength}`); // Original log
+            sendAudioToServer(concatenatedBuffer);
         }
     }
 
@@ -341,13 +371,18 @@ let initialGreetingSent = false; // Tracks if the first user message/greeting ha
         } else {
             console.log(`[AgentWidgetDebug] connectWebSocketInternal: Reusing existing client session ID: ${currentSessionId}`);
         }
-        const websocketUrl = `ws://localhost:8001/ws/agent_stream/${currentSessionId}?is_audio=${isWsAudioMode}`;
+        let websocketUrl = `ws://localhost:8001/ws/agent_stream/${currentSessionId}?is_audio=${isWsAudioMode}`;
+        const customerId = document.getElementById('current-customer-id')?.textContent.trim();
+        if (customerId) websocketUrl += `&customer_id=${encodeURIComponent(customerId)}`;
+        if (resumeToken) websocketUrl += `&resume_token=${encodeURIComponent(resumeToken)}`;
 
         console.log(`[AgentWidgetDebug] connectWebSocketInternal: Attempting to connect to: ${websocketUrl}`);
         addMessageToChat("system", `Connecting (audio: ${isWsAudioMode})...`);
         
         try {
-            websocket = new WebSocket(websocketUrl);
+            websocket = new WebSocket(websocketUrl, [BINARY_AUDIO_SUBPROTOCOL]);
+            websocket.binaryType = "arraybuffer";
+            audioFrameSequence = 0;
             console.log(`[AgentWidgetDebug] connectWebSocketInternal: New WebSocket object created for ${websocketUrl}`);
         } catch (error) {
             console.error("[AgentWidgetDebug] connectWebSocketInternal: Error creating WebSocket object:", error);
@@ -388,6 +423,15 @@ let initialGreetingSent = false; // Tracks if the first user message/greeting ha
 
         websocket.onmessage = (event) => {
             // console.log("[AgentWidgetDebug] websocket.onmessage: RAW CHUNK RECEIVED:", event.data); // DIAGNOSTIC LOG
+            if (event.data instanceof ArrayBuffer) { // Binary frames only ever carry agent audio
+                const audioData = decodeAudioFrame(event.data);
+                if (audioData) {
+                    playAgentAudio(audioData);
+                } else {
+                    console.warn(`[AgentWidgetDebug] websocket.onmessage: Ignoring invalid binary frame (${event.data.byteLength} bytes).`);
+                }
+                return;
+            }
             const rawDataForLog = (typeof event.data === 'string' && event.data.length > 100) ? event.data.substring(0,100) + "..." : event.data;
             let parsedData;
             try {
@@ -416,6 +460,11 @@ let initialGreetingSent = false; // Tracks if the first user message/greeting ha
                 return;
             }
 
+            if (parsedData.type === "session_resume") {
+                resumeToken = parsedData.resume_token;
+                return;
+            }
+
             // Preserve non-voice command handling
             if (parsedData.type === "command" && parsedData.command_name === "set_theme") {
                 const themeValue = parsedData.payload?.theme;
@@ -550,22 +599,8 @@ let initialGreetingSent = false; // Tracks if the first user message/greeting ha
 
             // Standard content messages
             if (parsedData.mime_type === "audio/pcm" && audioPlayerNode) {
-                if (userDesiredAudioMode && localMicStream && !isMicPausedForAgentSpeech) {
-                    console.log(`[AgentWidgetDebug MIC_ACTION] websocket.onmessage (audio/pcm): Agent audio starting. Pausing mic. States: userDesiredAudio=${userDesiredAudioMode}, micStream=${!!localMicStream}, micPaused=${isMicPausedForAgentSpeech}`);
-                    pauseMicrophoneInput(localMicStream);
-                    isMicPausedForAgentSpeech = true;
-                    waitingForAgentPlaybackToFinish = true;
-                } else {
-                     console.log(`[AgentWidgetDebug MIC_ACTION] websocket.onmessage (audio/pcm): Agent audio starting. Conditions for pausing mic NOT met. States: userDesiredAudio=${userDesiredAudioMode}, micStream=${!!localMicStream}, micPaused=${isMicPausedForAgentSpeech}, waitingPlayback=${waitingForAgentPlaybackToFinish}`);
-                    if(isMicPausedForAgentSpeech && !waitingForAgentPlaybackToFinish) {
-                        waitingForAgentPlaybackToFinish = true;
-                        console.log(`[AgentWidgetDebug] websocket.onmessage (audio/pcm): Mic already paused, new audio arriving. Set waitingForAgentPlaybackToFinish=true.`);
-                    }
-                }
-
                 if (typeof parsedData.data === 'string') {
-                    const audioData = base64ToArrayBuffer(parsedData.data);
-                    audioPlayerNode.port.postMessage(audioData);
+                    playAgentAudio(base64ToArrayBuffer(parsedData.data));
                 } else {
                     console.warn("[AgentWidgetDebug] websocket.onmessage: Audio data received from agent is not a string. Cannot play.");
                 }
@@ -616,6 +651,24 @@ let initialGreetingSent = false; // Tracks if the first user message/greeting ha
         };
     }
 
+    function playAgentAudio(audioData) {
+        if (!audioPlayerNode) return;
+        if (userDesiredAudioMode && localMicStream && !isMicPausedForAgentSpeech) {
+            console.log(`[AgentWidgetDebug MIC_ACTION] websocket.onmessage (audio/pcm): Agent audio starting. Pausing mic. States: userDesiredAudio=${userDesiredAudioMode}, micStream=${!!localMicStream}, micPaused=${isMicPausedForAgentSpeech}`);
+            pauseMicrophoneInput(localMicStream);
+            isMicPausedForAgentSpeech = true;
+            waitingForAgentPlaybackToFinish = true;
+        } else {
+             console.log(`[AgentWidgetDebug MIC_ACTION] websocket.onmessage (audio/pcm): Agent audio starting. Conditions for pausing mic NOT met. States: userDesiredAudio=${userDesiredAudioMode}, micStream=${!!localMicStream}, micPaused=${isMicPausedForAgentSpeech}, waitingPlayback=${waitingForAgentPlaybackToFinish}`);
+            if(isMicPausedForAgentSpeech && !waitingForAgentPlaybackToFinish) {
+                waitingForAgentPlaybackToFinish = true;
+                console.log(`[AgentWidgetDebug] websocket.onmessage (audio/pcm): Mic already paused, new audio arriving. Set waitingForAgentPlaybackToFinish=true.`);
+            }
+        }
+
+        audioPlayerNode.port.postMessage(audioData);
+    }
+
     function sendMessageToServer(payload) {
             // console.log(`[AgentWidgetDebug] sendMessageToServer called. Payload preview:`, payload.mime_type || payload.parts || payload.event_type);
             if (!websocket || websocket.readyState !== WebSocket.OPEN) {
@@ -362,7 +362,8 @@ document.addEventListener('DOMContentLoaded', () => {
     // --- Product Display & Recommendations ---
     async function fetchInitialProducts() {
         try {
-            const products = await fetchAPI('/api/products');
+            // Only the fields the product cards use
+            const products = await fetchAPI('/api/products?fields=id,name,price,description,image_url');
             localProductCache = {};
             products.forEach(p => localProductCache[p.id] = p);
             displayProducts(products);
@@ -2,6 +2,10 @@
 
 import sqlite3
 import logging
+from product_catalog import ensure_catalog_version_tracking, bump_catalog_version
+from cart_engine import ensure_cart_index
+from product_search import ensure_product_search_index, drop_product_search_index
+from customer_store import ensure_customer_tables
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -15,6 +19,7 @@ def create_tables():
     # Drop existing products table if it exists, to apply new schema
     # Be CAREFUL with this in a production environment or if you have important data.
     # For MVP development, it's often useful to start fresh with schema changes.
+    drop_product_search_index(conn) # External-content index over products; rebuilt below
     cursor.execute("DROP TABLE IF EXISTS products")
     logger.info("Dropped existing products table (if any).")
     cursor.execute("DROP TABLE IF EXISTS cart_items") # Also drop cart_items due to foreign key
@@ -89,6 +94,17 @@ def create_tables():
     ''')
     logger.info("Products table with new schema created or already exists.")
 
+    # Version counter + triggers used by the app's in-memory catalog snapshot.
+    # Dropping products also dropped its triggers, so recreate them and bump the
+    # version so running servers reload the (now empty) catalog.
+    ensure_catalog_version_tracking(conn)
+    bump_catalog_version(conn)
+    logger.info("Catalog version tracking created or already exists.")
+
+    # FTS5 index (and sync triggers) used for /api/products search and name/plant_type filters.
+    if ensure_product_search_index(conn):
+        logger.info("Products full-text search index created or already exists.")
+
     # Cart Items table (recreate after dropping products)
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS cart_items (
@@ -102,6 +118,16 @@ def create_tables():
     ''')
     logger.info("Cart items table created or already exists.")
 
+    # One line per (customer, product): required by the cart engine's UPSERT and
+    # used by every per-customer cart lookup.
+    ensure_cart_index(conn)
+    logger.info("Cart items (customer_id, product_id) unique index created or already exists.")
+
+    # Customer profiles (read by the customer service agent). Not dropped: they
+    # don't depend on the products schema.
+    ensure_customer_tables(conn)
+    logger.info("Customer profile tables (customers, addresses, purchases, garden_profile) created or already exist.")
+
     conn.commit()
     conn.close()
     logger.info(f"Database '{DATABASE_NAME}' and tables initialized successfully with new schema.")
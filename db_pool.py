@@ -0,0 +1,115 @@
+# cymbal_home_garden_backend/db_pool.py
+
+import sqlite3
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 8
+DEFAULT_BUSY_TIMEOUT_MS = 5000       # How long a writer waits on a lock before SQLITE_BUSY
+DEFAULT_CACHED_STATEMENTS = 256      # Prepared statements kept per connection (sqlite3 default is 128)
+DEFAULT_ACQUIRE_TIMEOUT_SECS = 10
+
+
+class PoolExhaustedError(RuntimeError):
+    """Raised when no connection becomes available within the acquire timeout."""
+
+
+class ConnectionPool:
+    """A small thread-safe pool of SQLite connections tuned for concurrent requests.
+
+    Connections are opened lazily (up to `max_size`), configured once with WAL
+    journaling, a busy timeout and a larger statement cache, and then reused
+    across requests. With WAL, cart writers no longer block product/cart readers.
+    """
+
+    def __init__(self, database, max_size=DEFAULT_POOL_SIZE, busy_timeout_ms=DEFAULT_BUSY_TIMEOUT_MS,
+                 cached_statements=DEFAULT_CACHED_STATEMENTS, acquire_timeout=DEFAULT_ACQUIRE_TIMEOUT_SECS):
+        self.database = database
+        self.max_size = max_size
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+        self.acquire_timeout = acquire_timeout
+        self._idle = queue.LifoQueue()  # LIFO keeps the hottest connections (and their caches) in use
+        self._lock = threading.Lock()
+        self._created = 0
+        self.stats = {"created": 0, "acquired": 0, "waited": 0, "discarded": 0}
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.database,
+            timeout=self.busy_timeout_ms / 1000,
+            cached_statements=self.cached_statements,
+            check_same_thread=False,  # Connections move between Flask worker threads
+        )
+        conn.row_factory = sqlite3.Row  # Access columns by name
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # Safe with WAL; fsync only at checkpoints
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        logger.debug(f"Opened pooled SQLite connection to {self.database}.")
+        return conn
+
+    def acquire(self):
+        """Returns an idle connection, opening a new one if the pool is not full."""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                if self._created < self.max_size:
+                    self._created += 1
+                    self.stats["created"] += 1
+                    create = True
+                else:
+                    create = False
+            if create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                with self._lock:
+                    self.stats["waited"] += 1
+                try:
+                    conn = self._idle.get(timeout=self.acquire_timeout)
+                except queue.Empty:
+                    raise PoolExhaustedError(
+                        f"No SQLite connection available after {self.acquire_timeout}s (pool size {self.max_size})."
+                    )
+        with self._lock:
+            self.stats["acquired"] += 1
+        return conn
+
+    def release(self, conn):
+        """Returns a connection to the pool, rolling back anything left uncommitted."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error as e:
+            logger.warning(f"Discarding pooled SQLite connection after failed rollback: {e}")
+            self._discard(conn)
+            return
+        self._idle.put(conn)
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._created -= 1
+            self.stats["discarded"] += 1
+
+    def close_all(self):
+        """Closes all idle connections (connections currently in use are untouched)."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
@@ -0,0 +1,147 @@
+# cymbal_home_garden_backend/http_caching.py
+
+import gzip
+import logging
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request
+
+try:
+    import brotli  # Optional: enables Content-Encoding: br
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_MIMETYPES = frozenset({
+    'application/json', 'text/html', 'text/css', 'text/plain',
+    'application/javascript', 'text/javascript',
+})
+MIN_COMPRESS_BYTES = 500   # Below this the encoding overhead outweighs the savings
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def catalog_etag(version):
+    """ETag value for any representation derived from catalog `version`.
+
+    Weak, because gzip/brotli/identity encodings of the same body share it.
+    """
+    return f"catalog-{version}"
+
+
+class ResponseBodyCache:
+    """Small thread-safe LRU of encoded response bodies.
+
+    Keys include the catalog ETag, so entries for an old catalog version are
+    simply never asked for again and age out of the LRU.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return body
+
+    def put(self, key, body):
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def catalog_conditional(get_version, cache):
+    """Decorator adding catalog-version ETags, 304 handling and body caching to a JSON view.
+
+    `get_version` returns the current catalog version. A request whose
+    If-None-Match carries the current ETag gets an empty 304 without running the
+    view; otherwise the serialized 200 body (and its headers) is cached per
+    (ETag, full path).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = catalog_etag(get_version())
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                key = (etag, request.full_path)
+                cached = cache.get(key)
+                if cached is not None:
+                    body, headers = cached
+                    response = current_app.response_class(body, headers=headers)
+                else:
+                    response = current_app.make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    # Headers such as X-Next-Cursor/Link are part of the representation.
+                    headers = [(name, value) for name, value in response.headers.items() if name != 'Content-Length']
+                    cache.put(key, (response.get_data(), headers))
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = 'no-cache'  # Always revalidate; 304s are cheap
+            response.vary.add('Accept-Encoding')
+            return response
+        return wrapper
+    return decorator
+
+
+def _choose_encoding():
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return request.accept_encodings.best_match(offered)
+
+
+def _compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+def init_response_compression(app, cache, min_size=MIN_COMPRESS_BYTES):
+    """Registers an after_request hook compressing text/JSON responses with brotli or gzip.
+
+    Bodies carrying a catalog ETag are compressed once per encoding and then
+    served from `cache`.
+    """
+    @app.after_request
+    def compress_response(response):
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = _choose_encoding()
+        if not encoding:
+            return response
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+
+        etag, _ = response.get_etag()
+        key = (etag, request.full_path, encoding) if etag else None
+        compressed = cache.get(key) if key else None
+        if compressed is None:
+            compressed = _compress(data, encoding)
+            if key:
+                cache.put(key, compressed)
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    return compress_response
@@ -0,0 +1,150 @@
+# cymbal_home_garden_backend/local_search.py
+
+import heapq
+import logging
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+# BM25F-style field weights: a term in the name counts three times as much as the
+# same term in the description.
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'plant_type': 2.0,
+    'category': 1.5,
+    'botanical_name': 1.5,
+    'attributes': 1.2,   # List fields and boolean traits, see _product_fields()
+    'description': 1.0,
+}
+LIST_ATTRIBUTE_FIELDS = ('flower_color', 'flowering_season', 'landscape_use', 'pollinator_types')
+# Boolean columns that become searchable phrases when true (e.g. "drought tolerant").
+TRAIT_FIELDS = {
+    'drought_tolerant': 'drought tolerant',
+    'deer_resistant': 'deer resistant',
+    'pet_safe': 'pet safe',
+    'attracts_pollinators': 'attracts pollinators',
+    'fruit_bearing': 'fruit bearing edible',
+}
+BM25_K1 = 1.2
+BM25_B = 0.75
+IN_STOCK_BOOST = 1.05    # Small tie-breaker in favour of products that can be bought now
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _stem(token):
+    """Very light plural folding so 'pots' finds 'pot' and 'berries' finds 'berry'."""
+    if len(token) <= 3 or token.endswith('ss'):
+        return token
+    if token.endswith('ies'):
+        return token[:-3] + 'y'
+    if token.endswith(('ches', 'shes', 'xes', 'oes')):
+        return token[:-2]
+    if token.endswith('s'):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    return [_stem(token) for token in _TOKEN_RE.findall(text.lower())] if text else []
+
+
+def _product_fields(product):
+    """Returns {field: text} for the searchable parts of a decoded product dict."""
+    attribute_parts = []
+    for field in LIST_ATTRIBUTE_FIELDS:
+        values = product.get(field)
+        if isinstance(values, list):
+            attribute_parts.extend(str(value) for value in values)
+    for field, phrase in TRAIT_FIELDS.items():
+        if product.get(field):
+            attribute_parts.append(phrase)
+    fields = {field: product.get(field) or '' for field in FIELD_WEIGHTS if field != 'attributes'}
+    fields['attributes'] = ' '.join(attribute_parts)
+    return fields
+
+
+class LocalSearchIndex:
+    """Immutable inverted index over a list of decoded products.
+
+    BM25 scores are fully precomputed per (term, product) at build time, so a
+    query is a few dict lookups plus a top-k heap over the candidate products.
+    """
+
+    def __init__(self, products):
+        self.products = list(products)
+        field_lengths = defaultdict(list)
+        doc_field_tfs = []
+        for product in self.products:
+            field_tfs = {}
+            for field, text in _product_fields(product).items():
+                tokens = tokenize(str(text))
+                field_lengths[field].append(len(tokens))
+                counts = defaultdict(int)
+                for token in tokens:
+                    counts[token] += 1
+                field_tfs[field] = (len(tokens), counts)
+            doc_field_tfs.append(field_tfs)
+
+        average_lengths = {field: (sum(lengths) / len(lengths)) or 1.0 for field, lengths in field_lengths.items()}
+        # Length-normalised, weighted term frequency per document (BM25F).
+        weighted_tfs = defaultdict(dict)
+        for doc_index, field_tfs in enumerate(doc_field_tfs):
+            for field, (length, counts) in field_tfs.items():
+                norm = 1 - BM25_B + BM25_B * length / average_lengths[field]
+                for term, count in counts.items():
+                    postings = weighted_tfs[term]
+                    postings[doc_index] = postings.get(doc_index, 0.0) + FIELD_WEIGHTS[field] * count / norm
+
+        doc_count = len(self.products)
+        self.postings = {}
+        for term, postings in weighted_tfs.items():
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            self.postings[term] = [
+                (doc_index, idf * tf * (BM25_K1 + 1) / (tf + BM25_K1)) for doc_index, tf in postings.items()
+            ]
+        self.in_stock = [bool(product.get('stock')) for product in self.products]
+
+    def search(self, query, limit=10):
+        """Returns up to `limit` (product, score) pairs, best first."""
+        scores = defaultdict(float)
+        for term in dict.fromkeys(tokenize(query)):
+            for doc_index, score in self.postings.get(term, ()):
+                scores[doc_index] += score
+        if not scores:
+            return []
+        for doc_index in scores:
+            if self.in_stock[doc_index]:
+                scores[doc_index] *= IN_STOCK_BOOST
+        top = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [(self.products[doc_index], score) for doc_index, score in top]
+
+
+class LocalSearchEngine:
+    """Keeps a LocalSearchIndex in step with the catalog snapshot (rebuilt on version change)."""
+
+    def __init__(self):
+        self._current = (None, None)  # (catalog version, index), swapped atomically
+        self._lock = threading.Lock()
+
+    def index_for(self, catalog):
+        version, index = self._current
+        if index is not None and version == catalog.version:
+            return index
+        with self._lock:
+            version, index = self._current
+            if index is None or version != catalog.version:
+                start_time = time.perf_counter()
+                index = LocalSearchIndex(catalog.products)
+                self._current = (catalog.version, index)
+                elapsed_ms = (time.perf_counter() - start_time) * 1000
+                logger.info(f"Built local search index for catalog version {catalog.version} "
+                            f"({len(catalog.products)} products, {len(index.postings)} terms) in {elapsed_ms:.1f} ms.")
+            return index
+
+    def search(self, catalog, query, limit=10):
+        return self.index_for(catalog).search(query, limit=limit)
@@ -0,0 +1,202 @@
+# cymbal_home_garden_backend/product_catalog.py
+
+import sqlite3
+import logging
+import json
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Product columns stored as JSON string arrays in SQLite (see database_setup.py).
+JSON_LIST_FIELDS = (
+    'flower_color', 'flowering_season', 'pollinator_types',
+    'landscape_use', 'companion_plants_ids', 'recommended_soil_ids',
+    'recommended_fertilizer_ids', 'harvest_time',
+)
+
+# Text columns covered by full-text search (see product_search.py).
+SEARCHABLE_FIELDS = ('name', 'description', 'botanical_name', 'plant_type')
+
+# --- Catalog version tracking ---
+# Every write to the products table bumps a single counter via triggers, so any
+# write path (sample_data_importer, admin scripts, future endpoints) invalidates
+# the in-memory snapshot without having to know that the snapshot exists.
+CATALOG_VERSION_DDL = (
+    '''
+    CREATE TABLE IF NOT EXISTS catalog_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )
+    ''',
+    # Seeded randomly so a database file that is deleted and rebuilt does not
+    # replay version numbers a running server already has a snapshot for.
+    "INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, abs(random() % 1000000000))",
+    '''
+    CREATE TRIGGER IF NOT EXISTS products_version_ai AFTER INSERT ON products
+    BEGIN UPDATE catalog_version SET version = version + 1 WHERE id = 1; END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS products_version_au AFTER UPDATE ON products
+    BEGIN UPDATE catalog_version SET version = version + 1 WHERE id = 1; END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS products_version_ad AFTER DELETE ON products
+    BEGIN UPDATE catalog_version SET version = version + 1 WHERE id = 1; END
+    ''',
+)
+
+
+def ensure_catalog_version_tracking(conn):
+    """Creates the catalog_version table and its products triggers if missing."""
+    cursor = conn.cursor()
+    for statement in CATALOG_VERSION_DDL:
+        cursor.execute(statement)
+    conn.commit()
+
+
+def bump_catalog_version(conn):
+    """Marks the catalog as changed (e.g. after the products table is recreated)."""
+    conn.execute("UPDATE catalog_version SET version = version + 1 WHERE id = 1")
+    conn.commit()
+
+
+def get_catalog_version(conn):
+    """Returns the current catalog version counter stored in the database."""
+    row = conn.execute("SELECT version FROM catalog_version WHERE id = 1").fetchone()
+    return row[0] if row else 0
+
+
+def decode_product_row(row):
+    """Converts a products row into an API dict, deserializing JSON list fields.
+
+    Mirrors the per-request decoding the endpoints used to do: JSON strings are
+    decoded, undecodable values and NULLs become empty lists.
+    """
+    product = dict(row)
+    for field in JSON_LIST_FIELDS:
+        if field not in product:
+            continue  # Projected row without this column
+        value = product[field]
+        if value and isinstance(value, str):
+            try:
+                product[field] = json.loads(value)
+            except json.JSONDecodeError:
+                logger.warning(f"Could not decode JSON for field {field} in product {product.get('id')}")
+                product[field] = []
+        elif value is None:
+            product[field] = []
+    return product
+
+
+def project_products(products, fields):
+    """Returns copies of `products` restricted to `fields` (in the requested order)."""
+    return [{field: product.get(field) for field in fields} for product in products]
+
+
+class CatalogSnapshot:
+    """Immutable, fully decoded view of the products table at one catalog version.
+
+    The product dicts are shared between requests; callers must copy a product
+    before modifying it.
+    """
+
+    __slots__ = ('version', 'columns', 'products', 'by_id')
+
+    def __init__(self, version, columns, products):
+        self.version = version
+        self.columns = tuple(columns)
+        self.products = tuple(products)  # Table (rowid) order, as SELECT * returned it
+        self.by_id = {product['id']: product for product in self.products}
+
+    def get(self, product_id):
+        return self.by_id.get(product_id)
+
+    def get_many(self, product_ids):
+        """Looks up several ids at once. Returns (products in request order, missing ids)."""
+        found, missing = [], []
+        for product_id in dict.fromkeys(product_ids):  # De-duplicate, keep order
+            product = self.by_id.get(product_id)
+            if product is None:
+                missing.append(product_id)
+            else:
+                found.append(product)
+        return found, missing
+
+    def filter(self, name=None, category=None, plant_type=None, text=None):
+        """Filters products with the same semantics as the old SQL filters.
+
+        name/plant_type behave like SQLite's case-insensitive LIKE '%term%',
+        category is an exact match. `text` is the unranked fallback for full-text
+        search: every word must occur in one of the searchable fields.
+        """
+        name_needle = name.lower() if name else None
+        plant_type_needle = plant_type.lower() if plant_type else None
+        text_needles = text.lower().split() if text else []
+        results = []
+        for product in self.products:
+            if name_needle and name_needle not in (product.get('name') or '').lower():
+                continue
+            if category and product.get('category') != category:
+                continue
+            if plant_type_needle and plant_type_needle not in (product.get('plant_type') or '').lower():
+                continue
+            if text_needles:
+                haystack = ' '.join((product.get(field) or '') for field in SEARCHABLE_FIELDS).lower()
+                if not all(needle in haystack for needle in text_needles):
+                    continue
+            results.append(product)
+        return results
+
+
+class ProductCatalog:
+    """Serves decoded products from memory, reloading when the catalog version changes.
+
+    Each read costs one single-row version lookup; the full SELECT and JSON
+    decoding only run when the products table was written to since the last load.
+    """
+
+    def __init__(self):
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._tracking_ready = False
+
+    def snapshot(self, conn):
+        """Returns a snapshot that is current for the database behind `conn`."""
+        version = self._current_version(conn)
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.version == version:
+                return snapshot  # Another thread rebuilt it while we waited
+            snapshot = self._load(conn, version)
+            self._snapshot = snapshot
+            return snapshot
+
+    def invalidate(self):
+        """Drops the current snapshot; the next read reloads from the database."""
+        with self._lock:
+            self._snapshot = None
+
+    def _current_version(self, conn):
+        if not self._tracking_ready:
+            ensure_catalog_version_tracking(conn)
+            self._tracking_ready = True
+        try:
+            return get_catalog_version(conn)
+        except sqlite3.OperationalError:
+            # The database was recreated underneath us (e.g. database_setup ran).
+            ensure_catalog_version_tracking(conn)
+            return get_catalog_version(conn)
+
+    def _load(self, conn, version):
+        start_time = time.perf_counter()
+        cursor = conn.execute("SELECT * FROM products ORDER BY rowid")
+        rows = cursor.fetchall()
+        columns = [description[0] for description in cursor.description]
+        snapshot = CatalogSnapshot(version, columns, (decode_product_row(row) for row in rows))
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        logger.info(f"Loaded catalog snapshot version {version} with {len(snapshot.products)} products in {elapsed_ms:.1f} ms.")
+        return snapshot
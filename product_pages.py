@@ -0,0 +1,112 @@
+# cymbal_home_garden_backend/product_pages.py
+
+import base64
+import binascii
+import json
+import logging
+
+from product_catalog import decode_product_row
+from product_search import FTS_TABLE, FTS_COLUMN_WEIGHTS, build_match_expression
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+_BM25 = f"bm25({FTS_TABLE}, {', '.join(str(weight) for weight in FTS_COLUMN_WEIGHTS)})"
+_TEXT_HAYSTACK = (
+    "(p.name || ' ' || IFNULL(p.description, '') || ' ' || "
+    "IFNULL(p.botanical_name, '') || ' ' || IFNULL(p.plant_type, ''))"
+)
+
+
+class InvalidCursorError(ValueError):
+    """The `after` cursor could not be decoded (tampered with, or from another query type)."""
+
+
+def encode_cursor(key):
+    """Encodes a keyset position as an opaque, URL-safe token."""
+    raw = json.dumps(key, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, binascii.Error, UnicodeError) as e:
+        raise InvalidCursorError(f"Malformed cursor: {token!r}") from e
+    if not isinstance(key, dict) or not isinstance(key.get('r'), int):
+        raise InvalidCursorError(f"Malformed cursor: {token!r}")
+    if 's' in key and not isinstance(key['s'], (int, float)):
+        raise InvalidCursorError(f"Malformed cursor: {token!r}")
+    return key
+
+
+def fetch_product_page(conn, columns, limit=DEFAULT_PAGE_SIZE, after=None, category=None,
+                       name=None, plant_type=None, text=None, use_fts=True):
+    """Returns (products, next_cursor) for one keyset page of /api/products.
+
+    Only `columns` are selected (they must already be validated against the
+    products table). Pages are keyed on rowid, which is the catalog's listing
+    order; free-text searches are keyed on (BM25 score, rowid) so ranked results
+    page stably too. `next_cursor` is None on the last page.
+    """
+    select_list = ', '.join(f"p.{column}" for column in columns)
+    where, params = [], []
+    ranked = False
+
+    expression = build_match_expression(text=text, name=name, plant_type=plant_type) if use_fts else None
+    if expression is not None:
+        ranked = bool(text)
+        from_clause = f"{FTS_TABLE} JOIN products p ON p.rowid = {FTS_TABLE}.rowid"
+        where.append(f"{FTS_TABLE} MATCH ?")
+        params.append(expression)
+    else:
+        # Substring fallback with the same semantics as the FTS path.
+        from_clause = "products p"
+        if name:
+            where.append("p.name LIKE ?")
+            params.append(f"%{name}%")
+        if plant_type:
+            where.append("p.plant_type LIKE ?")
+            params.append(f"%{plant_type}%")
+        for word in (text or '').split():
+            where.append(f"{_TEXT_HAYSTACK} LIKE ?")
+            params.append(f"%{word}%")
+    if category:
+        where.append("p.category = ?")
+        params.append(category)
+
+    score_column = f", {_BM25} AS _page_score" if ranked else ""
+    if after is not None:
+        key = decode_cursor(after)
+        if ranked:
+            if 's' not in key:
+                raise InvalidCursorError("Cursor does not belong to a ranked search.")
+            where.append("(_page_score > ? OR (_page_score = ? AND p.rowid > ?))")
+            params.extend([key['s'], key['s'], key['r']])
+        else:
+            where.append("p.rowid > ?")
+            params.append(key['r'])
+
+    order_by = "_page_score, p.rowid" if ranked else "p.rowid"
+    sql = (f"SELECT {select_list}, p.rowid AS _page_rowid{score_column} FROM {from_clause}"
+           f"{' WHERE ' + ' AND '.join(where) if where else ''} ORDER BY {order_by} LIMIT ?")
+    params.append(limit + 1)  # One extra row tells us whether there is a next page
+    rows = conn.execute(sql, params).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        key = {'r': last['_page_rowid']}
+        if ranked:
+            key['s'] = last['_page_score']
+        next_cursor = encode_cursor(key)
+
+    products = []
+    for row in rows:
+        product = {column: row[column] for column in columns}
+        products.append(decode_product_row(product))
+    return products, next_cursor
@@ -0,0 +1,145 @@
+# cymbal_home_garden_backend/product_search.py
+
+import sqlite3
+import logging
+from product_catalog import SEARCHABLE_FIELDS
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'products_fts'
+
+# Indexed columns and their BM25 weights (a hit in the name counts most).
+FTS_COLUMNS = SEARCHABLE_FIELDS
+FTS_COLUMN_WEIGHTS = (10.0, 1.0, 3.0, 4.0)
+
+# The trigram tokenizer makes MATCH "term" behave like LIKE '%term%' (case-insensitive
+# substring), so the existing name/plant_type filter semantics are preserved while
+# the lookup goes through the index instead of scanning every row. Terms shorter than
+# three characters cannot be answered from a trigram index.
+MIN_TERM_LENGTH = 3
+
+# External-content FTS table over products: the text lives only in products, the
+# index is kept in sync by the triggers below (same pattern as catalog_version).
+PRODUCT_SEARCH_DDL = (
+    f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        {', '.join(FTS_COLUMNS)},
+        content='products', content_rowid='rowid', tokenize='trigram'
+    )
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, {', '.join(FTS_COLUMNS)})
+        VALUES (new.rowid, {', '.join('new.' + column for column in FTS_COLUMNS)});
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, {', '.join(FTS_COLUMNS)})
+        VALUES ('delete', old.rowid, {', '.join('old.' + column for column in FTS_COLUMNS)});
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF {', '.join(FTS_COLUMNS)} ON products BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, {', '.join(FTS_COLUMNS)})
+        VALUES ('delete', old.rowid, {', '.join('old.' + column for column in FTS_COLUMNS)});
+        INSERT INTO {FTS_TABLE} (rowid, {', '.join(FTS_COLUMNS)})
+        VALUES (new.rowid, {', '.join('new.' + column for column in FTS_COLUMNS)});
+    END
+    ''',
+)
+
+_RANKED_SEARCH_SQL = (
+    f"SELECT p.id FROM {FTS_TABLE} f JOIN products p ON p.rowid = f.rowid "
+    f"WHERE {FTS_TABLE} MATCH ? "
+    f"ORDER BY bm25({FTS_TABLE}, {', '.join(str(weight) for weight in FTS_COLUMN_WEIGHTS)}), p.rowid"
+)
+_FILTER_SQL = (
+    f"SELECT p.id FROM {FTS_TABLE} f JOIN products p ON p.rowid = f.rowid "
+    f"WHERE {FTS_TABLE} MATCH ? ORDER BY p.rowid"
+)
+
+
+def ensure_product_search_index(conn):
+    """Creates the FTS5 index and its sync triggers, populating it if it was just created.
+
+    Returns False when this SQLite build has no FTS5/trigram support.
+    """
+    cursor = conn.cursor()
+    exists = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+    ).fetchone()
+    try:
+        for statement in PRODUCT_SEARCH_DDL:
+            cursor.execute(statement)
+        if not exists:
+            cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
+            logger.info(f"Built {FTS_TABLE} full-text index from the products table.")
+    except sqlite3.OperationalError as e:
+        conn.rollback()
+        logger.warning(f"Full-text product search unavailable ({e}); falling back to substring filtering.")
+        return False
+    conn.commit()
+    return True
+
+
+def drop_product_search_index(conn):
+    """Drops the FTS5 index (its triggers go away with the products table)."""
+    conn.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    conn.commit()
+
+
+def _phrase(term):
+    """Quotes `term` as a single FTS5 phrase string."""
+    return '"' + term.replace('"', '""') + '"'
+
+
+def build_match_expression(text=None, name=None, plant_type=None):
+    """Builds an FTS5 MATCH expression, or returns None if the index cannot answer it.
+
+    `text` is split on whitespace and every word must appear in one of the indexed
+    columns; `name` and `plant_type` are matched as whole substrings of that column.
+    """
+    clauses = []
+    if name:
+        clauses.append(('name', name.strip()))
+    if plant_type:
+        clauses.append(('plant_type', plant_type.strip()))
+    for word in (text or '').split():
+        clauses.append((None, word))
+    if not clauses or any(len(term) < MIN_TERM_LENGTH for _, term in clauses):
+        return None
+    return ' AND '.join(
+        f"{column} : {_phrase(term)}" if column else _phrase(term) for column, term in clauses
+    )
+
+
+class ProductSearch:
+    """Full-text product search backed by the products_fts index.
+
+    search() returns matching product ids (ranked by BM25 when free text is given,
+    in catalog order otherwise), or None when the query has to be answered by the
+    caller's substring fallback (no FTS5 support, or terms that are too short).
+    """
+
+    def __init__(self):
+        self._index_ready = False
+        self.available = True
+
+    def ensure_index(self, conn):
+        """Returns True when the FTS index exists (creating it on first use)."""
+        if not self._index_ready:
+            self.available = ensure_product_search_index(conn)
+            self._index_ready = True
+        return self.available
+
+    def search(self, conn, text=None, name=None, plant_type=None):
+        expression = build_match_expression(text=text, name=name, plant_type=plant_type)
+        if expression is None or not self.ensure_index(conn):
+            return None
+        sql = _RANKED_SEARCH_SQL if text else _FILTER_SQL
+        try:
+            return [row[0] for row in conn.execute(sql, (expression,))]
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Full-text search failed for {expression!r}: {e}")
+            return None
@@ -0,0 +1,139 @@
+# cymbal_home_garden_backend/retail_search.py
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class LazySearchClient:
+    """Process-wide Retail API client, created on first use and then shared.
+
+    Creating a SearchServiceClient resolves Application Default Credentials and
+    sets up a gRPC channel, which used to happen on every search request. The
+    client is thread-safe, so one instance serves all Flask worker threads. If
+    creation fails (e.g. no credentials yet) nothing is cached and the next
+    request tries again.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        client = self._client
+        if client is not None:
+            return client
+        with self._lock:
+            if self._client is None:
+                self._client = self._factory()
+                logger.info("Created shared Retail API SearchServiceClient.")
+            return self._client
+
+    def reset(self):
+        """Drops the shared client (e.g. after rotating credentials)."""
+        with self._lock:
+            self._client = None
+
+
+def normalize_query(query):
+    """Cache key form of a search query: case-folded with whitespace collapsed."""
+    return ' '.join(str(query).casefold().split())
+
+
+class SearchResultCache:
+    """Bounded TTL/LRU cache for Retail API search results, with stale-while-revalidate.
+
+    Entries are fresh for `ttl` seconds. For another `stale_ttl` seconds they are
+    still served immediately while one background refresh per key fetches a new
+    result; after that they count as misses. Failed refreshes keep the stale entry.
+    `stats` counts hits, stale hits, misses, refreshes, refresh errors and evictions.
+    """
+
+    def __init__(self, max_entries=512, ttl=300, stale_ttl=1800, refresh_workers=2, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (stored_at, value)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix='search-cache-refresh')
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "refresh_errors": 0, "evictions": 0}
+
+    def get_or_fetch(self, key, fetch):
+        """Returns the cached value for `key`, calling `fetch()` on a miss.
+
+        `fetch` may run on a background thread (for stale entries), so it must not
+        depend on request context. Exceptions from a synchronous fetch propagate.
+        """
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = now - entry[0]
+                if age <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return entry[1]
+                if age <= self.ttl + self.stale_ttl:
+                    self._entries.move_to_end(key)
+                    self.stats["stale_hits"] += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        self._executor.submit(self._refresh, key, fetch)
+                    return entry[1]
+            self.stats["misses"] += 1
+        value = fetch()
+        self._store(key, value)
+        return value
+
+    def _refresh(self, key, fetch):
+        try:
+            value = fetch()
+        except Exception as e:
+            with self._lock:
+                self.stats["refresh_errors"] += 1
+            logger.warning(f"Background refresh of search cache entry {key!r} failed: {e}")
+        else:
+            self._store(key, value)
+            with self._lock:
+                self.stats["refreshes"] += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _store(self, key, value):
+        with self._lock:
+            self._entries[key] = (self._clock(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def snapshot_stats(self):
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries))
+
+
+def describe_search_result(product_id, remote_description, catalog):
+    """Builds a search recommendation entry for one Retail API result.
+
+    The name comes from the live catalog (snapshot of the products table);
+    the description prefers the Retail API's copy and falls back to the catalog.
+    """
+    catalog_product = catalog.get(product_id) or {}
+    description = remote_description or catalog_product.get('description')
+    return {
+        "product_id": product_id,
+        "name": catalog_product.get('name') or "Unknown Product",
+        "description": description or "No description available.",
+    }
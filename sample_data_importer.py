@@ -3,6 +3,7 @@
 import sqlite3
 import logging
 import json # For encoding lists as JSON strings
+from customer_store import save_customer
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -380,6 +381,64 @@ SAMPLE_PRODUCTS = [
     },
 ]
 
+# Customer profiles in the agent's Customer JSON shape (see customer_store.save_customer).
+SAMPLE_CUSTOMERS = [
+    {
+        "customer_id": "123", "account_number": "428765091",
+        "customer_first_name": "Alex", "customer_last_name": "Johnson",
+        "email": "alex.johnson@example.com", "phone_number": "+1-702-555-1212",
+        "customer_start_date": "2022-06-10", "years_as_customer": 2,
+        "billing_address": {"street": "123 Main St", "city": "Anytown", "state": "CA", "zip": "12345"},
+        "purchase_history": [
+            {"date": "2023-03-05", "total_amount": 35.98, "items": [
+                {"product_id": "fert-111", "name": "All-Purpose Fertilizer", "quantity": 1},
+                {"product_id": "trowel-222", "name": "Gardening Trowel", "quantity": 1},
+            ]},
+            {"date": "2023-07-12", "total_amount": 42.5, "items": [
+                {"product_id": "seeds-333", "name": "Tomato Seeds (Variety Pack)", "quantity": 2},
+                {"product_id": "pots-444", "name": "Terracotta Pots (6-inch)", "quantity": 4},
+            ]},
+            {"date": "2024-01-20", "total_amount": 55.25, "items": [
+                {"product_id": "gloves-555", "name": "Gardening Gloves (Leather)", "quantity": 1},
+                {"product_id": "pruner-666", "name": "Pruning Shears", "quantity": 1},
+            ]},
+        ],
+        "loyalty_points": 133, "preferred_store": "Anytown Garden Store",
+        "communication_preferences": {"email": True, "sms": False, "push_notifications": True},
+        "garden_profile": {"type": "backyard", "size": "medium", "sun_exposure": "full sun",
+                           "soil_type": "unknown", "interests": ["flowers", "vegetables"]},
+        "scheduled_appointments": {},
+    },
+    {
+        "customer_id": "456", "account_number": "519203847",
+        "customer_first_name": "Priya", "customer_last_name": "Raman",
+        "email": "priya.raman@example.com", "phone_number": "+1-512-555-0199",
+        "customer_start_date": "2020-03-22", "years_as_customer": 5,
+        "billing_address": {"street": "88 Cedar Ave", "city": "Austin", "state": "TX", "zip": "78701"},
+        "purchase_history": [
+            {"date": "2024-04-02", "total_amount": 21.98, "items": [
+                {"product_id": SKU_PEST_NEEM_OIL_CONCENTRATE, "name": "Neem Oil Concentrate (Fungicide/Insecticide/Miticide)", "quantity": 1},
+            ]},
+        ],
+        "loyalty_points": 410, "preferred_store": "Austin Garden Center",
+        "communication_preferences": {"email": True, "sms": True, "push_notifications": False},
+        "garden_profile": {"type": "balcony", "size": "small", "sun_exposure": "partial shade",
+                           "soil_type": "potting mix", "interests": ["herbs", "houseplants"]},
+        "scheduled_appointments": {},
+    },
+]
+
+
+def insert_sample_customers(conn):
+    for customer in SAMPLE_CUSTOMERS:
+        try:
+            save_customer(conn, customer)
+        except sqlite3.Error as e:
+            logger.error(f"Error inserting customer {customer.get('customer_id', 'Unknown ID')}: {e}")
+    conn.commit()
+    logger.info(f"Inserted or updated {len(SAMPLE_CUSTOMERS)} sample customer profiles.")
+
+
 def insert_sample_data():
     conn = sqlite3.connect(DATABASE_NAME)
     cursor = conn.cursor()
@@ -406,6 +465,7 @@ def insert_sample_data():
             logger.error(f"Values: {values}")
 
     conn.commit()
+    insert_sample_customers(conn)
     conn.close()
     logger.info("Sample product data insertion process completed using new schema.")
 
@@ -1,6 +1,7 @@
 import unittest
 import json
 import os
+import sqlite3
 from app import app # Your Flask app instance
 from database_setup import create_tables, DATABASE_NAME
 from sample_data_importer import insert_sample_data, SAMPLE_PRODUCTS
@@ -151,6 +152,119 @@ class TestAPI(unittest.TestCase):
         for product in data_herb:
             self.assertIn('Herb', product.get('plant_type', ''))
             
+    def test_get_products_full_text_search(self):
+        """Test ranked full-text search across name/description/botanical_name/plant_type."""
+        response = self.client.get('/api/products?q=lavender')
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data.decode('utf-8'))
+        self.assertTrue(len(data) >= 1)
+        self.assertEqual(data[0]['id'], 'SKU_PLANT_LAVENDER_001') # Name hit ranks first
+
+        response = self.client.get('/api/products?q=lavender&category=Soil')
+        self.assertEqual(response.status_code, 200)
+        for product in json.loads(response.data.decode('utf-8')):
+            self.assertEqual(product['category'], 'Soil')
+
+        response = self.client.get('/api/products?q=NonExistentProductName123')
+        self.assertEqual(json.loads(response.data.decode('utf-8')), [])
+
+    def test_get_products_search_index_follows_db_writes(self):
+        """Test that the FTS index is kept in sync with the products table by triggers."""
+        product_id = SAMPLE_PRODUCTS[0]['id']
+        self.client.get('/api/products?name=Lavender') # Make sure the index exists
+        conn = sqlite3.connect(DATABASE_NAME)
+        conn.execute("UPDATE products SET name = ? WHERE id = ?", ("Zzyzx Test Plant", product_id))
+        conn.commit()
+        try:
+            response = self.client.get('/api/products?name=zzyzx')
+            data = json.loads(response.data.decode('utf-8'))
+            self.assertEqual([product['id'] for product in data], [product_id])
+        finally:
+            conn.execute("UPDATE products SET name = ? WHERE id = ?", (SAMPLE_PRODUCTS[0]['name'], product_id))
+            conn.commit()
+            conn.close()
+
+        response = self.client.get('/api/products?name=zzyzx')
+        self.assertEqual(json.loads(response.data.decode('utf-8')), [])
+
+    def test_get_products_batch_by_ids_with_fields(self):
+        """Test batch lookup by ids with field projection, preserving request order."""
+        ids = [SAMPLE_PRODUCTS[2]['id'], SAMPLE_PRODUCTS[0]['id'], "SKU_DOES_NOT_EXIST_999"]
+        response = self.client.get(f"/api/products?ids={','.join(ids)}&fields=id,name,price,image_url")
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data.decode('utf-8'))
+        self.assertEqual([product['id'] for product in data], ids[:2]) # Unknown id skipped
+        for product in data:
+            self.assertEqual(set(product.keys()), {'id', 'name', 'price', 'image_url'})
+        self.assertEqual(data[1]['name'], SAMPLE_PRODUCTS[0]['name'])
+
+    def test_get_products_unknown_field_rejected(self):
+        """Test that projecting a non-existent column returns 400."""
+        response = self.client.get('/api/products?fields=id,not_a_column')
+        self.assertEqual(response.status_code, 400)
+        data = json.loads(response.data.decode('utf-8'))
+        self.assertIn('not_a_column', data['message'])
+
+    def test_get_products_keyset_pagination(self):
+        """Test limit/after paging walks the whole catalog once, with projected fields."""
+        seen_ids = []
+        url = '/api/products?limit=7&fields=id,name,price,image_url'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            page = json.loads(response.data.decode('utf-8'))
+            self.assertLessEqual(len(page), 7)
+            for product in page:
+                self.assertEqual(set(product.keys()), {'id', 'name', 'price', 'image_url'})
+            seen_ids.extend(product['id'] for product in page)
+            next_cursor = response.headers.get('X-Next-Cursor')
+            url = f'/api/products?limit=7&fields=id,name,price,image_url&after={next_cursor}' if next_cursor else None
+        self.assertEqual(len(seen_ids), len(SAMPLE_PRODUCTS))
+        self.assertEqual(set(seen_ids), {p['id'] for p in SAMPLE_PRODUCTS})
+
+    def test_get_products_pagination_bad_params(self):
+        """Test that invalid limit and cursor values are rejected with 400."""
+        self.assertEqual(self.client.get('/api/products?limit=0').status_code, 400)
+        self.assertEqual(self.client.get('/api/products?limit=abc').status_code, 400)
+        self.assertEqual(self.client.get('/api/products?limit=5&after=not-a-cursor').status_code, 400)
+
+    def test_get_products_etag_not_modified(self):
+        """Test that catalog responses carry an ETag and revalidate with 304."""
+        response = self.client.get('/api/products')
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers.get('ETag')
+        self.assertIsNotNone(etag)
+
+        response = self.client.get('/api/products', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+
+        product_id = SAMPLE_PRODUCTS[0]['id']
+        response = self.client.get(f'/api/products/{product_id}', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        # A write to the products table changes the catalog version, so the old ETag no longer matches.
+        conn = sqlite3.connect(DATABASE_NAME)
+        conn.execute("UPDATE products SET stock = stock WHERE id = ?", (product_id,))
+        conn.commit()
+        conn.close()
+        response = self.client.get('/api/products', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers.get('ETag'), etag)
+
+    def test_get_products_gzip_compression(self):
+        """Test that JSON catalog responses are gzip-compressed when the client accepts it."""
+        import gzip
+        response = self.client.get('/api/products', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers.get('Content-Encoding'), 'gzip')
+        self.assertIn('Accept-Encoding', response.headers.get('Vary', ''))
+        data = json.loads(gzip.decompress(response.data).decode('utf-8'))
+        self.assertEqual(len(data), len(SAMPLE_PRODUCTS))
+
+        response = self.client.get('/api/products')
+        self.assertIsNone(response.headers.get('Content-Encoding'))
+
     # --- Tests for GET /api/products/<product_id> ---
     def test_get_product_detail_success(self):
         """Test successful retrieval of a single product by ID."""
@@ -213,6 +327,45 @@ class TestAPI(unittest.TestCase):
         self.assertIn('error', data)
         self.assertEqual(data['error'], 'Product not found')
 
+    def test_get_product_detail_reflects_direct_db_write(self):
+        """Test that the in-memory catalog snapshot reloads after the products table changes."""
+        product_id = SAMPLE_PRODUCTS[0]['id']
+        original_price = SAMPLE_PRODUCTS[0]['price']
+        self.client.get(f'/api/products/{product_id}') # Warm the snapshot
+
+        # Write through a separate connection, as sample_data_importer or an admin script would.
+        conn = sqlite3.connect(DATABASE_NAME)
+        conn.execute("UPDATE products SET price = ? WHERE id = ?", (original_price + 1, product_id))
+        conn.commit()
+        try:
+            response = self.client.get(f'/api/products/{product_id}')
+            data = json.loads(response.data.decode('utf-8'))
+            self.assertEqual(data['price'], original_price + 1)
+        finally:
+            conn.execute("UPDATE products SET price = ? WHERE id = ?", (original_price, product_id))
+            conn.commit()
+            conn.close()
+
+        response = self.client.get(f'/api/products/{product_id}')
+        data = json.loads(response.data.decode('utf-8'))
+        self.assertEqual(data['price'], original_price)
+
+    def test_db_pool_reuses_wal_connections(self):
+        """Test that requests share pooled WAL connections instead of connecting each time."""
+        from app import db_pool
+        self.client.get('/api/cart/pool_test_customer')
+        created_before = db_pool.stats['created']
+        for _ in range(5):
+            response = self.client.get('/api/cart/pool_test_customer')
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(db_pool.stats['created'], created_before)
+
+        conn = db_pool.acquire()
+        try:
+            self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0].lower(), 'wal')
+        finally:
+            db_pool.release(conn)
+
     # --- Tests for GET /api/products/availability/<product_id>/<store_id> ---
     def test_get_product_availability_in_stock(self):
         """Test availability for an in-stock product."""
@@ -452,6 +605,32 @@ class TestAPI(unittest.TestCase):
         # Cleanup
         self.client.post(f'/api/cart/modify/{customer_id}', json={"items_to_remove": [{"product_id": product_to_add['id'], "quantity": 1}]})
 
+    def test_cart_modify_same_product_repeated_in_payload(self):
+        """Test that repeated entries for one product are applied in order within one request."""
+        customer_id = "cart_modify_customer_010"
+        product = SAMPLE_PRODUCTS[0] # Lavender
+
+        payload = {
+            "items_to_add": [
+                {"product_id": product['id'], "quantity": 2},
+                {"product_id": product['id'], "quantity": 3},
+            ],
+            "items_to_remove": [{"product_id": product['id'], "quantity": 1}]
+        }
+        response = self.client.post(f'/api/cart/modify/{customer_id}', json=payload)
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data.decode('utf-8'))
+        self.assertTrue(data['items_added'])
+        self.assertTrue(data['items_removed'])
+
+        cart_response = self.client.get(f'/api/cart/{customer_id}')
+        cart_data = json.loads(cart_response.data.decode('utf-8'))
+        self.assertEqual(len(cart_data['items']), 1) # Single line thanks to the (customer_id, product_id) unique index
+        self.assertEqual(cart_data['items'][0]['quantity'], 4) # 2 + 3 - 1
+
+        # Cleanup
+        self.client.delete(f'/api/cart/{customer_id}/clear')
+
     def test_cart_modify_malformed_item_data(self):
         """Test modifying cart with malformed item data (e.g., missing product_id or invalid quantity type)."""
         customer_id = "cart_modify_customer_008"
@@ -903,6 +1082,122 @@ class TestAPI(unittest.TestCase):
         # If it returns items, len(data['recommendations']) could be > 0.
         # For this test, we primarily ensure the endpoint doesn't crash and returns the expected structure.
 
+    def test_retail_search_reuses_client_and_catalog_names(self):
+        """Test that one shared SearchServiceClient is used and names come from the products table."""
+        from unittest import mock
+        import app as app_module
+        from retail_search import LazySearchClient, SearchResultCache
+
+        fake_results = [
+            mock.Mock(id='SKU_PLANT_LAVENDER_001', product=mock.Mock(description='')),
+            mock.Mock(id='SKU_NOT_IN_CATALOG', product=mock.Mock(description='Remote description')),
+        ]
+        fake_client = mock.Mock()
+        fake_client.search.return_value = mock.Mock(results=fake_results)
+        factory = mock.Mock(return_value=fake_client)
+
+        with mock.patch.object(app_module, 'SEARCH_BACKEND', 'retail'), \
+                mock.patch.object(app_module, 'retail_search_client', LazySearchClient(factory)), \
+                mock.patch.object(app_module, 'retail_search_cache', SearchResultCache()):
+            for query in ("lavender", "purple lavender", "lavender soil"):
+                response = self.client.post('/api/retail/search-products', json={"query": query, "visitor_id": "v1"})
+                self.assertEqual(response.status_code, 200)
+
+        factory.assert_called_once()
+        self.assertEqual(fake_client.search.call_count, 3)
+        recommendations = json.loads(response.data.decode('utf-8'))['recommendations']
+        self.assertEqual(recommendations[0]['name'], "English Lavender 'Munstead'")
+        self.assertEqual(recommendations[0]['description'], SAMPLE_PRODUCTS[0]['description'])
+        self.assertEqual(recommendations[1], {"product_id": 'SKU_NOT_IN_CATALOG', "name": "Unknown Product", "description": "Remote description"})
+
+    def test_retail_search_results_are_cached(self):
+        """Test that repeated (normalized) queries are served from the search cache."""
+        from unittest import mock
+        import app as app_module
+        from retail_search import LazySearchClient, SearchResultCache
+
+        fake_client = mock.Mock()
+        fake_client.search.return_value = mock.Mock(results=[mock.Mock(id='SKU_PLANT_LAVENDER_001', product=mock.Mock(description='x'))])
+        cache = SearchResultCache()
+        with mock.patch.object(app_module, 'SEARCH_BACKEND', 'retail'), \
+                mock.patch.object(app_module, 'retail_search_client', LazySearchClient(lambda: fake_client)), \
+                mock.patch.object(app_module, 'retail_search_cache', cache):
+            for query in ("Lavender", "  lavender ", "LAVENDER"):
+                response = self.client.post('/api/retail/search-products', json={"query": query, "visitor_id": "v1"})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(json.loads(response.data.decode('utf-8'))['recommendations'][0]['product_id'], 'SKU_PLANT_LAVENDER_001')
+            stats = json.loads(self.client.get('/api/retail/search-cache/stats').data.decode('utf-8'))
+
+        self.assertEqual(fake_client.search.call_count, 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'], 2)
+
+    def test_search_result_cache_stale_while_revalidate(self):
+        """Test TTL expiry, stale serving with a background refresh, and LRU eviction."""
+        import threading
+        from retail_search import SearchResultCache
+
+        now = [0.0]
+        cache = SearchResultCache(max_entries=2, ttl=10, stale_ttl=100, clock=lambda: now[0])
+        refreshed = threading.Event()
+
+        def fetch_v2():
+            refreshed.set()
+            return 'v2'
+
+        self.assertEqual(cache.get_or_fetch('a', lambda: 'v1'), 'v1')
+        now[0] = 50 # Stale: old value returned immediately, refresh runs in the background
+        self.assertEqual(cache.get_or_fetch('a', fetch_v2), 'v1')
+        self.assertTrue(refreshed.wait(5))
+        cache._executor.shutdown(wait=True)
+        self.assertEqual(cache.get_or_fetch('a', lambda: 'unused'), 'v2')
+
+        now[0] = 500 # Past ttl + stale_ttl: a plain miss
+        self.assertEqual(cache.get_or_fetch('a', lambda: 'v3'), 'v3')
+        cache.get_or_fetch('b', lambda: 'b')
+        cache.get_or_fetch('c', lambda: 'c') # Evicts 'a' (least recently used)
+        self.assertEqual(cache.get_or_fetch('a', lambda: 'v4'), 'v4')
+        stats = cache.snapshot_stats()
+        self.assertEqual(stats['stale_hits'], 1)
+        self.assertEqual(stats['refreshes'], 1)
+        self.assertGreaterEqual(stats['evictions'], 1)
+
+    def test_local_search_backend_ranking(self):
+        """Test the default in-process BM25 search backend."""
+        from unittest import mock
+        import app as app_module
+
+        with mock.patch.object(app_module, 'SEARCH_BACKEND', 'local'):
+            response = self.client.post('/api/retail/search-products', json={"query": "lavender", "visitor_id": "v1"})
+            self.assertEqual(response.status_code, 200)
+            recommendations = json.loads(response.data.decode('utf-8'))['recommendations']
+            self.assertEqual(recommendations[0]['product_id'], 'SKU_PLANT_LAVENDER_001') # Name match ranks first
+            self.assertEqual(recommendations[0]['name'], "English Lavender 'Munstead'")
+            self.assertEqual(recommendations[0]['description'], SAMPLE_PRODUCTS[0]['description'])
+
+            # Plural folding and attribute traits ("drought tolerant" is a boolean column)
+            response = self.client.post('/api/retail/search-products', json={"query": "Pots", "visitor_id": "v1"})
+            ids = [item['product_id'] for item in json.loads(response.data.decode('utf-8'))['recommendations']]
+            self.assertTrue(ids and all(product_id.startswith('SKU_POT_') for product_id in ids[:2]))
+            response = self.client.post('/api/retail/search-products', json={"query": "drought tolerant", "visitor_id": "v1"})
+            self.assertTrue(len(json.loads(response.data.decode('utf-8'))['recommendations']) > 0)
+
+    def test_retail_backend_falls_back_to_local_search(self):
+        """Test that a failing Retail API call is answered from the local index instead of a 500."""
+        from unittest import mock
+        import app as app_module
+        from retail_search import LazySearchClient, SearchResultCache
+
+        fake_client = mock.Mock()
+        fake_client.search.side_effect = RuntimeError("Retail API unavailable")
+        with mock.patch.object(app_module, 'SEARCH_BACKEND', 'retail'), \
+                mock.patch.object(app_module, 'retail_search_client', LazySearchClient(lambda: fake_client)), \
+                mock.patch.object(app_module, 'retail_search_cache', SearchResultCache()):
+            response = self.client.post('/api/retail/search-products', json={"query": "lavender", "visitor_id": "v1"})
+        self.assertEqual(response.status_code, 200)
+        recommendations = json.loads(response.data.decode('utf-8'))['recommendations']
+        self.assertEqual(recommendations[0]['product_id'], 'SKU_PLANT_LAVENDER_001')
+
     def test_retail_search_missing_query_in_payload(self):
         """Test retail search with missing 'query' in payload."""
         # This test does not depend on Retail API configuration itself, but on app.py validation
@@ -941,5 +1236,34 @@ class TestAPI(unittest.TestCase):
         pass # Placeholder, as robustly testing the "unconfigured" state here is complex without mocking app.config
 
 
+    # --- Customer profile tables (read by the customer service agent) ---
+    def test_sample_customers_seeded_and_upserted(self):
+        """Sample customers are stored across the profile tables; saving again replaces child rows."""
+        from customer_store import save_customer
+        from sample_data_importer import SAMPLE_CUSTOMERS
+
+        conn = sqlite3.connect(DATABASE_NAME)
+        try:
+            row = conn.execute("SELECT first_name, loyalty_points, sms_opt_in FROM customers WHERE customer_id = '123'").fetchone()
+            self.assertEqual(row, ('Alex', 133, 0))
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM purchases WHERE customer_id = '123'").fetchone()[0], 3)
+            plan = ' '.join(r[3] for r in conn.execute(
+                "EXPLAIN QUERY PLAN SELECT * FROM purchases WHERE customer_id = '123' ORDER BY purchase_date").fetchall())
+            self.assertIn('idx_purchases_customer_date', plan)
+
+            profile = dict(SAMPLE_CUSTOMERS[0], loyalty_points=150,
+                           purchase_history=SAMPLE_CUSTOMERS[0]['purchase_history'][:1])
+            save_customer(conn, profile)
+            conn.commit()
+            self.assertEqual(conn.execute("SELECT loyalty_points FROM customers WHERE customer_id = '123'").fetchone()[0], 150)
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM purchases WHERE customer_id = '123'").fetchone()[0], 1)
+            self.assertEqual(json.loads(conn.execute(
+                "SELECT interests FROM garden_profile WHERE customer_id = '123'").fetchone()[0]), ['flowers', 'vegetables'])
+        finally:
+            save_customer(conn, SAMPLE_CUSTOMERS[0])
+            conn.commit()
+            conn.close()
+
+
 if __name__ == '__main__':
     unittest.main()